@@ -4,20 +4,59 @@
 # 该模块提供Web界面和API接口，用于展示厂区货物调度系统的功能
 # """
 
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, request, jsonify, render_template, send_from_directory, stream_with_context, g
 from test2.factory_logistics_system import *
+import itertools
 import json
 import uuid
 from datetime import datetime, timedelta
 import os
+import queue
+import threading
+import time
 
 app = Flask(__name__, static_url_path='', static_folder='static')
 
-# 全局系统实例
-system = LogisticsSystem(grid_size=(15, 15))
+# 持久化目录：快照和预写日志保存在这里，重启后从中恢复
+DATA_DIR = os.environ.get('LOGISTICS_DATA_DIR', 'data')
+
+# 每个事件流客户端的待发送队列长度；积压超过该值的慢客户端会收到 resync 事件
+EVENT_QUEUE_SIZE = 1000
+# 事件流心跳间隔（秒）
+SSE_HEARTBEAT_SECONDS = 15
+# 列表接口分页的默认和最大每页条数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# 批量导入每批（一个事务）的行数和单行最大字节数
+BULK_BATCH_SIZE = 500
+BULK_MAX_LINE_BYTES = 1 << 20
+# 请求轨迹文件：设置后把每个 API 请求追加为一行 NDJSON，供 load_generator.py 回放
+TRACE_FILE = os.environ.get('LOGISTICS_TRACE_FILE')
+# 轨迹中保存的请求体上限（字节），超过的请求体（如批量导入）不保存
+TRACE_MAX_BODY_BYTES = 64 * 1024
+
+# 事件流客户端队列
+_event_clients = set()
+_event_clients_lock = threading.Lock()
+
+def broadcast_event(event):
+    """把系统变更事件分发给所有事件流客户端"""
+    with _event_clients_lock:
+        clients = list(_event_clients)
+    for client in clients:
+        try:
+            client.put_nowait(event)
+        except queue.Full:
+            # 客户端跟不上：丢弃积压的事件，让它重新全量加载
+            while True:
+                try:
+                    client.get_nowait()
+                except queue.Empty:
+                    break
+            client.put_nowait({'type': 'resync', 'version': event['version']})
 
 # 初始化一些默认数据
-def initialize_system():
+def initialize_system(system):
     # 创建产品
     products = [
         Product("P001", "钢材", 10.0, 5.0),
@@ -52,8 +91,69 @@ def initialize_system():
     system.add_frame(frame)
     system.add_frame_truck(truck)
 
-# 初始化系统
-initialize_system()
+def create_system():
+    """新建带默认数据的系统并开启持久化"""
+    system = LogisticsSystem(grid_size=(15, 15))
+    initialize_system(system)
+    system.enable_persistence(DATA_DIR)
+    return system
+
+# 初始化系统：已有持久化数据时从快照和预写日志恢复。
+# 系统只由 actor 的写线程修改，请求处理线程通过 actor.call 提交命令，读请求使用 actor.snapshot
+actor = SystemActor(LogisticsSystem.restore(DATA_DIR) if PersistenceStore(DATA_DIR).exists() else create_system())
+actor.subscribe(broadcast_event)
+
+_trace_lock = threading.Lock()
+_trace_output = None
+_trace_origin = None
+
+def _service_gauges():
+    """/api/metrics 的仪表盘指标：最新快照中的资源和队列状态，以及事件流连接数"""
+    gauges = list(actor.snapshot.gauges)
+    with _event_clients_lock:
+        gauges.append(('logistics_event_stream_clients', '事件流连接数', {}, len(_event_clients)))
+    return gauges
+
+METRICS.add_gauge_source(_service_gauges)
+
+@app.before_request
+def _start_request():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_request_metrics(response):
+    """按路由模板（而不是实际路径）统计 API 请求的耗时和状态码，避免实体ID造成标签膨胀"""
+    if not request.path.startswith('/api/') or request.path == '/api/events':
+        return response
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    started = g.get('request_started', time.perf_counter())
+    METRICS.histogram('logistics_http_request_duration_seconds', 'API 请求耗时（秒）',
+                      method=request.method, endpoint=endpoint).observe(time.perf_counter() - started)
+    METRICS.counter('logistics_http_requests_total', 'API 请求数', method=request.method, endpoint=endpoint,
+                    status=response.status_code).inc()
+    return response
+
+@app.after_request
+def _record_trace(response):
+    """记录请求轨迹：相对首个请求的时间偏移、方法、路径（含查询串）、JSON 请求体、状态码和耗时"""
+    global _trace_output, _trace_origin
+    if not TRACE_FILE or not request.path.startswith('/api/') or request.path == '/api/events':
+        return response
+    started = g.get('request_started', time.perf_counter())
+    body = None
+    if request.is_json and (request.content_length or 0) <= TRACE_MAX_BODY_BYTES:
+        body = request.get_data(as_text=True)
+    record = {'method': request.method, 'path': request.full_path.rstrip('?'), 'body': body,
+              'status': response.status_code,
+              'duration_ms': round((time.perf_counter() - started) * 1000, 3)}
+    with _trace_lock:
+        if _trace_output is None:
+            _trace_output = open(TRACE_FILE, 'a', encoding='utf-8')
+            _trace_origin = started
+        record['offset'] = round(max(0.0, started - _trace_origin), 6)
+        _trace_output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        _trace_output.flush()
+    return response
 
 @app.route('/')
 def index():
@@ -67,155 +167,385 @@ def documentation():
         content = f.read()
     return render_template('documentation.html', content=content)
 
+# 按状态版本缓存的系统状态响应体：(ETag, JSON)
+_status_payload = (None, None)
+
+@app.route('/api/metrics')
+def metrics():
+    """Prometheus 文本格式的指标：各调度阶段和 API 的延迟直方图、计数器和仪表盘指标"""
+    return app.response_class(METRICS.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/system_status')
 def get_system_status():
-    """获取系统状态"""
-    return jsonify(system.get_system_status())
+    """获取系统状态，状态未变化时返回 304"""
+    global _status_payload
+    snap = actor.snapshot
+    etag = snap.etag
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        cached_etag, body = _status_payload
+        if cached_etag != etag:
+            body = json.dumps(snap.status, ensure_ascii=False)
+            _status_payload = (etag, body)
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _format_sse(event):
+    return f"id: {event.get('version', 0)}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.route('/api/events')
+def event_stream():
+    """以 Server-Sent Events 推送资源、库存、任务和日志的变更事件"""
+    client = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+    with _event_clients_lock:
+        _event_clients.add(client)
+    
+    def stream():
+        try:
+            # 连接（含断线重连）后客户端据此全量加载一次，之后只应用增量事件
+            snap = actor.snapshot
+            yield _format_sse({'type': 'hello', 'instance_id': snap.instance_id, 'version': snap.version})
+            while True:
+                try:
+                    event = client.get(timeout=SSE_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield _format_sse(event)
+        finally:
+            with _event_clients_lock:
+                _event_clients.discard(client)
+    
+    return app.response_class(stream(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _since_param(snap):
+    """解析 ?since=<version>；instance 参数与快照的系统实例不符时视为需要全量同步"""
+    since = request.args.get('since', type=int)
+    if since is None:
+        return None
+    instance = request.args.get('instance')
+    if instance and instance != snap.instance_id:
+        return -1
+    return since
+
+def _fields_param():
+    """解析 ?fields=a,b,c 字段投影"""
+    fields = request.args.get('fields')
+    return [name for name in fields.split(',') if name] if fields else None
+
+def _project(item, fields):
+    """只保留 fields 中的字段；任务可以请求派生字段 sub_task_count"""
+    if fields is None:
+        return item
+    projected = {name: item[name] for name in fields if name in item}
+    if 'sub_task_count' in fields and 'sub_tasks' in item:
+        projected['sub_task_count'] = len(item['sub_tasks'])
+    return projected
+
+def _enum_param(name, enum_cls):
+    """按枚举值或成员名解析查询参数"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    for member in enum_cls:
+        if value in (member.value, member.name):
+            return member
+    raise ValueError(f'无效的参数 {name}: {value}')
+
+def _int_param(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'无效的参数 {name}: {value}')
+
+def _datetime_param(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+def _limit_param():
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def _bad_request(message):
+    return jsonify({'success': False, 'message': message}), 400
+
+def _delta_response(snap, since, fields):
+    """按版本返回资源增量：changed 为变更后的实体，removed 为已删除的实体ID；无法增量时 full 为 true"""
+    result = {'instance_id': snap.instance_id, 'version': snap.version, 'full': False,
+              'changed': {}, 'removed': {}}
+    for name, records in snap.resources.items():
+        changes = snap.changes_since(name, since) if since >= 0 else None
+        if changes is None:
+            result['full'] = True
+            result['changed'] = {n: {k: _project(v, fields) for k, v in r.items()}
+                                 for n, r in snap.resources.items()}
+            result['removed'] = {}
+            break
+        changed_ids, removed_ids = changes
+        result['changed'][name] = {entity_id: _project(records[entity_id], fields)
+                                   for entity_id in changed_ids if entity_id in records}
+        result['removed'][name] = removed_ids
+    return jsonify(result)
+
+# 出现任一参数时列表接口按分页格式返回
+RESOURCE_LIST_PARAMS = ('type', 'status', 'warehouse_id', 'cursor', 'limit', 'fields')
+TASK_LIST_PARAMS = ('status', 'type', 'warehouse_id', 'start', 'end', 'cursor', 'limit', 'order', 'fields')
 
 @app.route('/api/resources')
 def get_resources():
-    """获取所有资源"""
-    return jsonify({
-        'terminal_warehouses': {k: {'id': v.id, 'name': v.name, 'position': {'x': v.position.x, 'y': v.position.y}, 
-                                   'products': v.products} 
-                               for k, v in system.terminal_warehouses.items()},
-        'product_warehouses': {k: {'id': v.id, 'name': v.name, 'position': {'x': v.position.x, 'y': v.position.y}, 
-                                  'products': v.products} 
-                              for k, v in system.product_warehouses.items()},
-        'cranes': {k: {'id': v.id, 'name': v.name, 'position': {'x': v.position.x, 'y': v.position.y}, 
-                      'status': v.status.value, 'warehouse_id': v.warehouse_id} 
-                  for k, v in system.cranes.items()},
-        'frames': {k: {'id': v.id, 'name': v.name, 'position': {'x': v.position.x, 'y': v.position.y}, 
-                      'status': v.status.value} 
-                  for k, v in system.frames.items()},
-        'frame_trucks': {k: {'id': v.id, 'name': v.name, 'position': {'x': v.position.x, 'y': v.position.y}, 
-                            'status': v.status.value, 'attached_frame_id': v.attached_frame_id} 
-                        for k, v in system.frame_trucks.items()},
-        'products': {k: {'id': v.id, 'name': v.name, 'weight': v.weight, 'volume': v.volume} 
-                    for k, v in system.products.items()}
-    })
+    """获取所有资源
+
+    带 ?since=<version> 时只返回该版本之后的变化；带 type（资源集合）及 status、warehouse_id、
+    cursor、limit、fields 时分页返回 {"items", "next_cursor"}。
+    """
+    snap = actor.snapshot
+    fields = _fields_param()
+    since = _since_param(snap)
+    if since is not None:
+        return _delta_response(snap, since, fields)
+    if not any(name in request.args for name in RESOURCE_LIST_PARAMS):
+        return jsonify(snap.resources)
+    
+    collection = request.args.get('type')
+    if collection not in snap.resources:
+        return _bad_request(f'type 必须是 {", ".join(snap.resources)} 之一')
+    try:
+        status = _enum_param('status', ResourceStatus)
+    except ValueError as e:
+        return _bad_request(str(e))
+    warehouse_id = request.args.get('warehouse_id')
+    if status is not None and collection not in ('cranes', 'frames', 'frame_trucks'):
+        return _bad_request(f'{collection} 不支持按状态过滤')
+    if warehouse_id is not None and collection not in ('cranes', 'terminal_warehouses', 'product_warehouses'):
+        return _bad_request(f'{collection} 不支持按仓库过滤')
+    
+    records, next_cursor = snap.query_resources(collection, status, warehouse_id,
+                                                request.args.get('cursor'), _limit_param())
+    return jsonify({'items': [_project(record, fields) for record in records],
+                    'next_cursor': next_cursor})
 
 @app.route('/api/tasks')
 def get_tasks():
-    """获取所有任务"""
-    return jsonify({
-        task_id: {
-            'id': task.id,
-            'type': task.task_type.value,
-            'status': task.status.value,
-            'start_time': task.start_time.isoformat() if task.start_time else None,
-            'end_time': task.end_time.isoformat() if task.end_time else None,
-            'sub_tasks': [{'id': st.id, 'type': st.task_type.value, 'status': st.status.value} for st in task.sub_tasks]
-        } for task_id, task in system.tasks.items()
-    })
+    """获取所有任务
 
-@app.route('/api/add_product', methods=['POST'])
-def add_product():
-    """添加产品"""
-    data = request.json
-    product = Product(
+    带 ?since=<version> 时只返回该版本之后的变化；带 status、type、warehouse_id、start、end、
+    cursor、limit、order（asc/desc）、fields 时按创建顺序分页返回 {"items", "next_cursor"}。
+    """
+    snap = actor.snapshot
+    fields = _fields_param()
+    since = _since_param(snap)
+    if since is None:
+        if any(name in request.args for name in TASK_LIST_PARAMS):
+            return _task_page(snap, fields)
+        return jsonify(snap.tasks)
+    
+    changes = snap.changes_since('tasks', since) if since >= 0 else None
+    if changes is None:
+        return jsonify({'instance_id': snap.instance_id, 'version': snap.version, 'full': True,
+                        'changed': {task_id: _project(task, fields) for task_id, task in snap.tasks.items()},
+                        'removed': []})
+    changed_ids, removed_ids = changes
+    changed = {}
+    for task_id in changed_ids:
+        task = snap.get_task(task_id)
+        if task is not None:
+            changed[task_id] = _project(task, fields)
+    return jsonify({'instance_id': snap.instance_id, 'version': snap.version, 'full': False,
+                    'changed': changed, 'removed': removed_ids})
+
+def _task_page(snap, fields):
+    try:
+        status = _enum_param('status', ResourceStatus)
+        task_type = _enum_param('type', TaskType)
+        start = _datetime_param('start')
+        end = _datetime_param('end')
+        cursor = _int_param('cursor')
+    except ValueError as e:
+        return _bad_request(str(e))
+    tasks, next_cursor = snap.query_tasks(status, task_type, request.args.get('warehouse_id'), start, end,
+                                          cursor, _limit_param(), request.args.get('order') == 'desc')
+    return jsonify({'items': [_project(task, fields) for task in tasks],
+                    'next_cursor': str(next_cursor) if next_cursor is not None else None})
+
+@app.route('/api/tasks/<task_id>')
+def get_task(task_id):
+    """获取单个任务（含归档任务），任务自上次请求后未变化时返回 304"""
+    snap = actor.snapshot
+    task = snap.get_task(task_id)
+    if task is None:
+        return jsonify({'success': False, 'message': '找不到指定任务'}), 404
+    etag = snap.entity_etag('tasks', task_id)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(_project(task, _fields_param()))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _product_from(data):
+    return Product(
         id=data.get('id', ''),
         name=data['name'],
         weight=float(data['weight']),
         volume=float(data['volume'])
     )
-    system.add_product(product)
-    return jsonify({'success': True, 'product': {'id': product.id, 'name': product.name}})
 
-@app.route('/api/add_terminal_warehouse', methods=['POST'])
-def add_terminal_warehouse():
-    """添加末端库"""
-    data = request.json
-    warehouse = TerminalWarehouse(
+def _terminal_warehouse_from(data):
+    return TerminalWarehouse(
         id=data.get('id', ''),
         name=data['name'],
         position=Position(int(data['position_x']), int(data['position_y'])),
         capacity=float(data['capacity'])
     )
-    system.add_terminal_warehouse(warehouse)
-    return jsonify({'success': True, 'warehouse': {'id': warehouse.id, 'name': warehouse.name}})
 
-@app.route('/api/add_product_warehouse', methods=['POST'])
-def add_product_warehouse():
-    """添加成品库"""
-    data = request.json
-    warehouse = ProductWarehouse(
+def _product_warehouse_from(data):
+    return ProductWarehouse(
         id=data.get('id', ''),
         name=data['name'],
         position=Position(int(data['position_x']), int(data['position_y'])),
         capacity=float(data['capacity'])
     )
-    system.add_product_warehouse(warehouse)
-    return jsonify({'success': True, 'warehouse': {'id': warehouse.id, 'name': warehouse.name}})
 
-@app.route('/api/add_crane', methods=['POST'])
-def add_crane():
-    """添加行车"""
-    data = request.json
-    crane = Crane(
+def _crane_from(data):
+    return Crane(
         id=data.get('id', ''),
         name=data['name'],
         position=Position(int(data['position_x']), int(data['position_y'])),
         warehouse_id=data['warehouse_id']
     )
-    system.add_crane(crane)
-    return jsonify({'success': True, 'crane': {'id': crane.id, 'name': crane.name}})
 
-@app.route('/api/add_frame', methods=['POST'])
-def add_frame():
-    """添加框架"""
-    data = request.json
-    frame = Frame(
+def _frame_from(data):
+    return Frame(
         id=data.get('id', ''),
         name=data['name'],
-        position=Position(int(data['position_x']), int(data['position_y']))
+        position=Position(int(data['position_x']), int(data['position_y'])),
+        capacity=float(data.get('capacity', 50.0)),
+        volume_capacity=float(data.get('volume_capacity', 0.0))
     )
-    system.add_frame(frame)
-    return jsonify({'success': True, 'frame': {'id': frame.id, 'name': frame.name}})
 
-@app.route('/api/add_frame_truck', methods=['POST'])
-def add_frame_truck():
-    """添加框架车头"""
-    data = request.json
-    truck = FrameTruck(
+def _frame_truck_from(data):
+    return FrameTruck(
         id=data.get('id', ''),
         name=data['name'],
         position=Position(int(data['position_x']), int(data['position_y']))
     )
-    system.add_frame_truck(truck)
-    return jsonify({'success': True, 'truck': {'id': truck.id, 'name': truck.name}})
 
-@app.route('/api/create_ship_plan', methods=['POST'])
-def create_ship_plan():
-    """创建船运计划"""
-    data = request.json
-    plan = ShipPlan(
+def _ship_plan_from(data):
+    return ShipPlan(
         id=data.get('id', ''),
         products=data['products'],
         deadline=datetime.fromisoformat(data['deadline']) if data.get('deadline') else datetime.now() + timedelta(hours=2),
         priority=int(data.get('priority', 1))
     )
-    system.add_ship_plan(plan)
+
+@app.route('/api/add_product', methods=['POST'])
+def add_product():
+    """添加产品"""
+    product = _product_from(request.json)
+    actor.call(lambda s: s.add_product(product))
+    return jsonify({'success': True, 'product': {'id': product.id, 'name': product.name}})
+
+@app.route('/api/add_terminal_warehouse', methods=['POST'])
+def add_terminal_warehouse():
+    """添加末端库"""
+    warehouse = _terminal_warehouse_from(request.json)
+    actor.call(lambda s: s.add_terminal_warehouse(warehouse))
+    return jsonify({'success': True, 'warehouse': {'id': warehouse.id, 'name': warehouse.name}})
+
+@app.route('/api/add_product_warehouse', methods=['POST'])
+def add_product_warehouse():
+    """添加成品库"""
+    warehouse = _product_warehouse_from(request.json)
+    actor.call(lambda s: s.add_product_warehouse(warehouse))
+    return jsonify({'success': True, 'warehouse': {'id': warehouse.id, 'name': warehouse.name}})
+
+@app.route('/api/add_crane', methods=['POST'])
+def add_crane():
+    """添加行车"""
+    crane = _crane_from(request.json)
+    actor.call(lambda s: s.add_crane(crane))
+    return jsonify({'success': True, 'crane': {'id': crane.id, 'name': crane.name}})
+
+@app.route('/api/add_frame', methods=['POST'])
+def add_frame():
+    """添加框架"""
+    frame = _frame_from(request.json)
+    actor.call(lambda s: s.add_frame(frame))
+    return jsonify({'success': True, 'frame': {'id': frame.id, 'name': frame.name}})
+
+@app.route('/api/add_frame_truck', methods=['POST'])
+def add_frame_truck():
+    """添加框架车头"""
+    truck = _frame_truck_from(request.json)
+    actor.call(lambda s: s.add_frame_truck(truck))
+    return jsonify({'success': True, 'truck': {'id': truck.id, 'name': truck.name}})
+
+@app.route('/api/create_ship_plan', methods=['POST'])
+def create_ship_plan():
+    """创建船运计划"""
+    plan = _ship_plan_from(request.json)
+    actor.call(lambda s: s.add_ship_plan(plan))
     return jsonify({'success': True, 'plan': {'id': plan.id}})
 
 @app.route('/api/create_ship_transport_task', methods=['POST'])
 def create_ship_transport_task():
-    """创建船运任务"""
+    """创建船运任务；split 为 true 时按框架载重和容积把超载的计划拆分为多趟"""
     data = request.json
-    task = system.create_ship_transport_task(data['plan_id'])
+    if data.get('split'):
+        tasks = actor.call(lambda s: s.create_ship_transport_trips(data['plan_id']))
+        if tasks:
+            return jsonify({'success': True, 'task': {'id': tasks[0].id},
+                            'tasks': [{'id': task.id} for task in tasks]})
+        return jsonify({'success': False, 'message': '船运任务创建失败'})
+    task = actor.call(lambda s: s.create_ship_transport_task(data['plan_id']))
     if task:
         return jsonify({'success': True, 'task': {'id': task.id}})
     return jsonify({'success': False, 'message': '船运任务创建失败'})
 
+@app.route('/api/book_ship_plan', methods=['POST'])
+def book_ship_plan():
+    """把船运计划预约到资源日历中最早可行的时段，到时自动开始执行"""
+    data = request.json
+    earliest = datetime.fromisoformat(data['earliest']) if data.get('earliest') else None
+    task = actor.call(lambda s: s.book_ship_plan(data['plan_id'], earliest))
+    if task:
+        return jsonify({'success': True, 'task': {'id': task.id,
+                                                  'scheduled_start': task.details['scheduled_start'].isoformat()}})
+    return jsonify({'success': False, 'message': '截止时间前没有可预约的时段'})
+
+@app.route('/api/reservations/first_window')
+def first_reservation_window():
+    """查询某类资源最早的空闲时段，例如 ?type=frame_truck&minutes=20&after=2024-01-01T14:00"""
+    resource_type = request.args.get('type', 'frame_truck')
+    if resource_type not in ('crane', 'frame', 'frame_truck'):
+        return _bad_request(f'无效的资源类型: {resource_type}')
+    try:
+        duration = timedelta(minutes=float(request.args.get('minutes', 20)))
+        after, before = _datetime_param('after'), _datetime_param('before')
+    except ValueError as exc:
+        return _bad_request(str(exc))
+    window = actor.call(lambda s: s.find_first_window(resource_type, duration, after, before))
+    if window is None:
+        return jsonify({'success': False, 'message': '没有满足条件的空闲时段'})
+    return jsonify({'success': True, 'start': window[0].isoformat(), 'resource_id': window[1]})
+
 @app.route('/api/create_internal_transfer_task', methods=['POST'])
 def create_internal_transfer_task():
     """创建内转任务"""
     data = request.json
-    task = system.create_internal_transfer_task(
+    task = actor.call(lambda s: s.create_internal_transfer_task(
         data['source_warehouse_id'],
         data['target_warehouse_id'],
         data['products']
-    )
+    ))
     if task:
         return jsonify({'success': True, 'task': {'id': task.id}})
     return jsonify({'success': False, 'message': '内转任务创建失败'})
@@ -224,38 +554,140 @@ def create_internal_transfer_task():
 def execute_task():
     """执行任务"""
     data = request.json
-    success = system.execute_task(data['task_id'])
-    return jsonify({'success': success, 'logs': system.execution_log[-10:]})
+    success, logs = actor.call(lambda s: (s.execute_task(data['task_id']), s.event_log.recent(10)))
+    return jsonify({'success': success, 'logs': logs})
 
-@app.route('/api/update_warehouse_product', methods=['POST'])
-def update_warehouse_product():
-    """更新仓库产品"""
-    data = request.json
-    warehouse_id = data['warehouse_id']
-    product_id = data['product_id']
-    quantity = int(data['quantity'])
-    
+def _update_inventory(system, warehouse_id, product_id, quantity):
+    """调整仓库库存，quantity 为负时出库；返回 (是否成功, 失败原因)"""
     # 判断是末端库还是成品库
     if warehouse_id in system.terminal_warehouses:
         warehouse = system.terminal_warehouses[warehouse_id]
     elif warehouse_id in system.product_warehouses:
         warehouse = system.product_warehouses[warehouse_id]
     else:
-        return jsonify({'success': False, 'message': '找不到指定仓库'})
+        return False, '找不到指定仓库'
     
     if quantity >= 0:
         success = warehouse.add_product(product_id, quantity)
     else:
         success = warehouse.remove_product(product_id, abs(quantity))
+    return success, None if success else '库存不足或超出容量'
+
+@app.route('/api/update_warehouse_product', methods=['POST'])
+def update_warehouse_product():
+    """更新仓库产品"""
+    data = request.json
+    warehouse_id, product_id, quantity = data['warehouse_id'], data['product_id'], int(data['quantity'])
+    success, message = actor.call(lambda s: _update_inventory(s, warehouse_id, product_id, quantity))
+    response = {'success': success}
+    if message:
+        response['message'] = message
+    return jsonify(response)
+
+# 批量导入：NDJSON 每行的 type -> (构造函数, 添加函数)
+BULK_ENTITY_TYPES = {
+    'product': (_product_from, LogisticsSystem.add_product),
+    'terminal_warehouse': (_terminal_warehouse_from, LogisticsSystem.add_terminal_warehouse),
+    'product_warehouse': (_product_warehouse_from, LogisticsSystem.add_product_warehouse),
+    'crane': (_crane_from, LogisticsSystem.add_crane),
+    'frame': (_frame_from, LogisticsSystem.add_frame),
+    'frame_truck': (_frame_truck_from, LogisticsSystem.add_frame_truck),
+    'ship_plan': (_ship_plan_from, LogisticsSystem.add_ship_plan)
+}
+
+def _bulk_operation(data):
+    """把一行数据解析为 (实体ID, 执行函数)，字段不合法时抛出异常；执行函数以系统为参数，返回 (是否成功, 失败原因)"""
+    entity_type = data.get('type')
+    if entity_type == 'inventory':
+        warehouse_id, product_id, quantity = data['warehouse_id'], data['product_id'], int(data['quantity'])
+        return warehouse_id, lambda s: _update_inventory(s, warehouse_id, product_id, quantity)
+    if entity_type not in BULK_ENTITY_TYPES:
+        raise ValueError(f'未知的类型: {entity_type}')
+    build, add = BULK_ENTITY_TYPES[entity_type]
+    entity = build(data)
+    return entity.id, lambda s: (add(s, entity), (True, None))[1]
+
+def _read_ndjson(stream):
+    """逐行读取 NDJSON，产出 (行号, 数据, 错误)；单行长度受限，整体内存占用与上传大小无关"""
+    line_no = 0
+    while True:
+        line = stream.readline(BULK_MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        line_no += 1
+        if len(line) > BULK_MAX_LINE_BYTES:
+            # 丢弃超长行的剩余部分
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(BULK_MAX_LINE_BYTES)
+            yield line_no, None, '行过长'
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f'JSON 解析失败: {e}'
+            continue
+        if not isinstance(data, dict):
+            yield line_no, None, '每行必须是 JSON 对象'
+            continue
+        yield line_no, data, None
+
+def _apply_bulk_batch(system, batch):
+    """校验并在一个事务中应用一批记录，返回按行号排列的结果（在写线程中执行）"""
+    results = {}
+    operations = []
+    for line_no, data, error in batch:
+        if error is None:
+            try:
+                entity_id, apply = _bulk_operation(data)
+                operations.append((line_no, entity_id, apply))
+                continue
+            except (KeyError, ValueError, TypeError) as e:
+                error = f'字段错误: {e}'
+        results[line_no] = {'line': line_no, 'success': False, 'error': error}
     
-    return jsonify({'success': success})
+    with system.transaction():
+        for line_no, entity_id, apply in operations:
+            success, message = apply(system)
+            result = {'line': line_no, 'success': success, 'id': entity_id}
+            if message:
+                result['error'] = message
+            results[line_no] = result
+    return [results[line_no] for line_no in sorted(results)]
+
+@app.route('/api/bulk', methods=['POST'])
+def bulk_import():
+    """批量导入：请求体为 NDJSON（产品、仓库、设备、船运计划、库存调整混合），按批次事务化应用，
+    以 NDJSON 流式返回每行的结果，最后一行为汇总"""
+    lines = _read_ndjson(request.stream)
+    
+    def stream():
+        succeeded = failed = 0
+        while True:
+            batch = list(itertools.islice(lines, BULK_BATCH_SIZE))
+            if not batch:
+                break
+            for result in actor.call(lambda s: _apply_bulk_batch(s, batch)):
+                if result['success']:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+        yield json.dumps({'summary': {'succeeded': succeeded, 'failed': failed}}, ensure_ascii=False) + '\n'
+    
+    return app.response_class(stream_with_context(stream()), mimetype='application/x-ndjson')
 
 @app.route('/api/reset_system', methods=['POST'])
 def reset_system():
     """重置系统"""
-    global system
-    system = LogisticsSystem(grid_size=(15, 15))
-    initialize_system()
+    def replace(old_system):
+        # 在写线程中替换：之前排队的命令已作用于旧系统，之后的命令都作用于新系统
+        if old_system.persistence is not None:
+            old_system.persistence.close()
+        return create_system()
+    actor.replace_system(replace)
     return jsonify({'success': True})
 
 if __name__ == '__main__':
@@ -264,4 +696,4 @@ if __name__ == '__main__':
         if not os.path.exists(folder):
             os.makedirs(folder)
     
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True, threaded=True)
\ No newline at end of file
@@ -4,7 +4,20 @@
 """
 
 from factory_logistics_system import *
+from zone_scheduling import ZoneCoordinator
+import atexit
+import heapq
+import importlib
+import itertools
 import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import types
 from datetime import datetime, timedelta
 
 
@@ -350,8 +363,1027 @@ def test_scenario_6_system_monitoring():
     return scenario
 
 
+def test_scenario_7_parallel_executor_failures():
+    """测试场景7：并行执行器的失败路径"""
+    scenario = TestScenario("并行执行失败处理", "测试资源永远无法获得时并行执行器的清理")
+    system = create_complex_system()
+    scenario.system = system
+    
+    for i in range(2):
+        system.add_ship_plan(ShipPlan(f"SP00{i}", {"P001": 10}, datetime.now() + timedelta(hours=1)))
+    tasks = [system.create_ship_transport_task(f"SP00{i}") for i in range(2)]
+    truck_id = tasks[0].sub_tasks[0].assigned_resources["frame_truck"]
+    system.frame_trucks[truck_id].status = ResourceStatus.MAINTENANCE
+    
+    results = system.execute_tasks([task.id for task in tasks] + ["missing_task"], pipelined=True)
+    scenario.log_result("维护中车头的任务失败", not any(results.values()), f"执行结果: {results}")
+    scenario.log_result("失败任务状态重置",
+                        all(task.status == ResourceStatus.UNAVAILABLE for task in tasks),
+                        "任务不应停留在执行中")
+    scenario.log_result("等待队列清空", not system._waiting_sub_tasks,
+                        f"等待中的子任务: {len(system._waiting_sub_tasks)}")
+    
+    system.frame_trucks[truck_id].status = ResourceStatus.IDLE
+    system.add_ship_plan(ShipPlan("SP002", {"P001": 10}, datetime.now() + timedelta(hours=1)))
+    task = system.create_ship_transport_task("SP002")
+    results = system.execute_tasks([task.id])
+    scenario.log_result("资源恢复后继续执行", results[task.id], "失败任务不应残留资源锁或占用")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_8_repeated_task_archive():
+    """测试场景8：重复执行相同路线的任务并归档"""
+    scenario = TestScenario("重复任务归档", "测试同一路线多次内转时任务ID唯一且每次执行都被归档")
+    system = create_complex_system()
+    scenario.system = system
+    
+    task_ids = []
+    for _ in range(2):
+        task = system.create_internal_transfer_task("TW001", "PW001", {"P001": 5})
+        task_ids.append(task.id)
+        system.execute_task(task.id)
+    
+    scenario.log_result("任务ID唯一", len(set(task_ids)) == 2, f"任务ID: {task_ids}")
+    scenario.log_result("两次执行均已归档", all(task_id in system.task_archive for task_id in task_ids)
+                        and not any(task_id in system.tasks for task_id in task_ids), "")
+    completed = system.get_system_status()["completed_task_count"]
+    scenario.log_result("完成任务计数", completed == 2, f"完成任务数: {completed}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_9_change_log_since():
+    """测试场景9：增量查询的版本下限"""
+    scenario = TestScenario("增量查询", "测试变更记录截断后 since 查询的下限和实体版本")
+    
+    change_log = ChangeLog(max_entries=10)
+    for version in range(1, 11):
+        change_log.append(version, "frames", f"F{version:03d}")
+    old_view = change_log.view()
+    change_log.append(11, "frames", "F011")  # 超出容量，保留较新的一半
+    change_log.append(12, "frames", "F007", removed=True)
+    view = change_log.view()
+    scenario.log_result("截断后记录下限", view.floor == 6, f"floor: {view.floor}")
+    scenario.log_result("早于下限的查询需要全量同步", view.since("frames", 5, 12) is None, "")
+    changed, removed = view.since("frames", 6, 12)
+    scenario.log_result("下限处的查询", changed == [f"F{v:03d}" for v in range(8, 12)] and removed == ["F007"],
+                        f"changed: {changed}, removed: {removed}")
+    old_changes = old_view.since("frames", 0, 10)
+    scenario.log_result("截断前的视图不受影响", old_changes is not None and len(old_changes[0]) == 10, "")
+    scenario.log_result("未来版本无效", view.since("frames", 13, 12) is None, "")
+    
+    system = create_complex_system()
+    scenario.system = system
+    version = system.version
+    system.frames["F002"].status = ResourceStatus.MAINTENANCE
+    changes = system.changes_since("frames", version)
+    scenario.log_result("资源修改计入增量", changes == (["F002"], []), f"增量: {changes}")
+    scenario.log_result("实体最后修改版本", system.entity_versions["frames"]["F002"] == system.version
+                        and system.entity_versions["frames"]["F001"] <= version, "")
+    
+    snapshot = SystemSnapshot.capture(system)
+    etag = snapshot.entity_etag("frames", "F001")
+    system.frames["F002"].status = ResourceStatus.IDLE
+    snapshot = SystemSnapshot.capture(system, snapshot)
+    scenario.log_result("其他实体变化不影响实体 ETag", snapshot.entity_etag("frames", "F001") == etag
+                        and snapshot.entity_etag("frames", "F002") != etag, "")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_10_zone_routing():
+    """测试场景10：分区调度的计划路由和跨区内转"""
+    scenario = TestScenario("分区调度", "测试没有成品库的分区不接收船运计划、重复跨区内转的ID唯一")
+    
+    with ZoneCoordinator((20, 10), columns=2, processes=False) as coordinator:
+        coordinator.add_product(Product("P001", "钢材", 10.0, 5.0))
+        west = TerminalWarehouse("TW001", "末端库1", Position(1, 1), 1000.0)
+        west.add_product("P001", 100)
+        coordinator.add_terminal_warehouse(west)
+        coordinator.add_product_warehouse(ProductWarehouse("PW001", "成品库1", Position(18, 8), 2000.0))
+        coordinator.add_crane(Crane("C001", "末端库行车1", Position(1, 1), warehouse_id="TW001"))
+        coordinator.add_crane(Crane("C002", "成品库行车1", Position(18, 8), warehouse_id="PW001"))
+        for k in range(2):
+            coordinator.add_frame(Frame(f"F00{k + 1}", f"框架{k + 1}", Position(3 + k, 5)))
+            coordinator.add_frame_truck(FrameTruck(f"T00{k + 1}", f"车头{k + 1}", Position(3 + k, 4)))
+        coordinator.add_ship_plan(ShipPlan("SP001", {"P001": 10}, datetime.now() + timedelta(hours=2)))
+        
+        scheduled = coordinator.schedule_ship_plans()
+        scenario.log_result("库存只在没有成品库的分区时不分配计划",
+                            scheduled == {} and "SP001" in coordinator.ship_plans, f"调度结果: {scheduled}")
+        
+        transfer_ids = []
+        for _ in range(2):
+            transfer_id = coordinator.create_internal_transfer_task("TW001", "PW001", {"P001": 5})
+            transfer_ids.append(transfer_id)
+            scenario.log_result(f"跨区内转 {transfer_id} 执行成功", coordinator.execute_task(transfer_id), "")
+        transfers = [coordinator.transfers[transfer_id] for transfer_id in transfer_ids if transfer_id]
+        leg_ids = [task_id for transfer in transfers
+                   for task_id in (transfer.outbound_task_id, transfer.inbound_task_id)]
+        scenario.log_result("跨区内转和分段任务ID唯一",
+                            len(set(transfer_ids)) == 2 and len(set(leg_ids)) == 4, f"分段任务: {leg_ids}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def _pipeline_makespan(pipelined: bool, task_count: int, quantity: int) -> float:
+    """1 个车头、3 个框架轮流执行 task_count 个 P001 船运任务的总完工时间（秒）"""
+    system = create_complex_system()
+    for frame_id in ("F004", "F005"):
+        system.frames[frame_id].status = ResourceStatus.MAINTENANCE
+    for truck_id in ("T002", "T003", "T004", "T005"):
+        system.frame_trucks[truck_id].status = ResourceStatus.MAINTENANCE
+    task_ids = []
+    for i in range(task_count):
+        system.add_ship_plan(ShipPlan(f"SP{i:03d}", {"P001": quantity}, datetime.now() + timedelta(hours=8)))
+        task = system.create_ship_transport_task(f"SP{i:03d}")
+        task_ids.append(task.id)
+        # 每三个任务轮流使用三个框架
+        frame = system.frames[task.sub_tasks[0].assigned_resources["frame"]]
+        frame.status = ResourceStatus.BUSY if i % 3 < 2 else ResourceStatus.IDLE
+        if i % 3 == 2:
+            for frame_id in ("F001", "F002", "F003"):
+                system.frames[frame_id].status = ResourceStatus.IDLE
+    start = system.clock.now
+    results = system.execute_tasks(task_ids, pipelined=pipelined)
+    assert all(results.values())
+    return (system.clock.now - start).total_seconds()
+
+
+def test_scenario_19_zone_fleet_balancing():
+    """测试场景19：分区车队平衡的行驶时间"""
+    scenario = TestScenario("分区车队平衡", "测试交接的框架和车头在到达后才能在目标分区使用")
+    
+    with ZoneCoordinator((20, 10), columns=2, processes=False) as coordinator:
+        coordinator.add_product(Product("P001", "钢材", 10.0, 5.0))
+        west = TerminalWarehouse("TW001", "末端库1", Position(1, 1), 1000.0)
+        west.add_product("P001", 100)
+        coordinator.add_terminal_warehouse(west)
+        coordinator.add_product_warehouse(ProductWarehouse("PW002", "成品库2", Position(8, 8), 2000.0))
+        coordinator.add_crane(Crane("C001", "末端库行车1", Position(1, 1), warehouse_id="TW001"))
+        coordinator.add_crane(Crane("C003", "成品库行车2", Position(8, 8), warehouse_id="PW002"))
+        coordinator.add_frame(Frame("F001", "框架1", Position(15, 5)))
+        coordinator.add_frame_truck(FrameTruck("T001", "车头1", Position(15, 4)))
+        coordinator.add_ship_plan(ShipPlan("SP001", {"P001": 10}, datetime.now() + timedelta(hours=2)))
+        
+        east_system = coordinator.workers["Z0-1"].system
+        west_system = coordinator.workers["Z0-0"].system
+        truck = east_system.frame_trucks["T001"]
+        truck_seconds = east_system._travel_time(east_system.travel_distance(truck.position, Position(9, 4)), truck)
+        frame_seconds = (east_system._travel_time(east_system.travel_distance(Position(15, 5), Position(9, 5)), None)
+                         + FRAME_COUPLING_TIME)
+        arrival = east_system.clock.now + timedelta(seconds=max(truck_seconds, frame_seconds))
+        
+        tasks = coordinator.schedule_ship_plans()
+        task = west_system.tasks.get(tasks.get("SP001", ""))
+        scenario.log_result("资源交接到计划所在分区", task is not None
+                            and coordinator.entity_zones["frame_trucks"]["T001"] == "Z0-0", f"任务: {tasks}")
+        scenario.log_result("资源停在目标分区边界", west_system.frame_trucks["T001"].position == Position(9, 4)
+                            and west_system.frames["F001"].position == Position(9, 5), "")
+        scenario.log_result("目标分区时钟推进到资源到达时间", west_system.clock.now >= arrival
+                            and west_system.clock.now - east_system.clock.now >= timedelta(seconds=frame_seconds),
+                            f"到达: {arrival}, 西区时钟: {west_system.clock.now}")
+        scenario.log_result("任务在资源到达后执行",
+                            coordinator.execute_tasks(list(tasks.values())).get(task.id if task else "")
+                            and task.start_time >= arrival, "")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_20_histogram_buckets():
+    """测试场景20：直方图分桶与桶上界一致"""
+    scenario = TestScenario("直方图分桶", "测试桶下标与 bounds 的暴力查找一致，且仿真耗时落入有限桶")
+    
+    rng = random.Random(20)
+    for min_seconds, octaves in ((HISTOGRAM_MIN_SECONDS, HISTOGRAM_OCTAVES),
+                                 (SIMULATED_HISTOGRAM_MIN_SECONDS, SIMULATED_HISTOGRAM_OCTAVES)):
+        histogram = LatencyHistogram(min_seconds, octaves)
+        samples = list(histogram.bounds) + [min_seconds * 2 ** rng.uniform(-3, octaves + 3) for _ in range(2000)]
+        mismatches = []
+        for seconds in samples:
+            expected = next((index for index, bound in enumerate(histogram.bounds) if seconds <= bound),
+                            len(histogram.bounds))
+            if histogram._bucket(seconds) != expected:
+                mismatches.append((seconds, histogram._bucket(seconds), expected))
+        scenario.log_result(f"桶下标与暴力查找一致（最小 {min_seconds}s）", not mismatches, f"不一致: {mismatches[:3]}")
+    
+    histogram = SUB_TASK_SIMULATED_DURATIONS[SubTaskType.TERMINAL_LOADING]
+    index = histogram._bucket(180.0)
+    scenario.log_result("180 秒仿真耗时落入有限桶", index < len(histogram.bounds)
+                        and histogram.bounds[index - 1] < 180.0 <= histogram.bounds[index],
+                        f"桶下标: {index}/{len(histogram.bounds)}")
+    
+    registry = MetricsRegistry()
+    registry.histogram("test_simulated_seconds", "测试", min_seconds=SIMULATED_HISTOGRAM_MIN_SECONDS,
+                       octaves=SIMULATED_HISTOGRAM_OCTAVES, type="crane").observe(180.0)
+    rendered = registry.render()
+    scenario.log_result("输出按实例的桶上界", 'le="192"} 1' in rendered and 'le="160"} 0' in rendered,
+                        rendered.splitlines()[:4])
+    scenario.log_result("分位数按实例的桶上界", registry.histogram(
+        "test_simulated_seconds", "测试", type="crane").quantile(0.5) == 192.0, "")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_21_event_log_backpressure():
+    """测试场景21：事件日志写出队列有界且写线程出错后继续运行"""
+    scenario = TestScenario("事件日志背压", "测试写出跟不上时丢弃并计数，写出失败后后台线程继续工作")
+    
+    directory = tempfile.mkdtemp(prefix="logistics_log_")
+    try:
+        release = threading.Event()
+        blocked = EventLog(echo=False, sink_path=os.path.join(directory, "blocked.jsonl"), queue_size=2)
+        write_batch = blocked._write_batch
+        blocked._write_batch = lambda records: (release.wait(), write_batch(records))
+        dropped = LOG_RECORDS_DROPPED.value
+        for index in range(6):
+            blocked.emit("INFO", "事件 %d", (index,))
+        dropped = LOG_RECORDS_DROPPED.value - dropped
+        release.set()
+        blocked.close()
+        with open(os.path.join(directory, "blocked.jsonl"), encoding="utf-8") as f:
+            written = len(f.readlines())
+        scenario.log_result("队列满时丢弃并计数", dropped >= 3 and written + dropped == 6,
+                            f"丢弃: {dropped}, 写出: {written}")
+        scenario.log_result("环形缓冲区保留全部记录", len(blocked.records) == 6, "")
+        
+        sink_path = os.path.join(directory, "missing", "events.jsonl")
+        failing = EventLog(echo=False, sink_path=sink_path)
+        errors = LOG_WRITE_ERRORS.value
+        failing.emit("INFO", "目录不存在")
+        failing.flush()
+        scenario.log_result("写出失败计数且写线程存活", LOG_WRITE_ERRORS.value == errors + 1
+                            and failing._writer.is_alive(), "")
+        os.makedirs(os.path.dirname(sink_path))
+        failing.emit("INFO", "目录已创建")
+        failing.close()
+        with open(sink_path, encoding="utf-8") as f:
+            messages = [json.loads(line)["message"] for line in f]
+        scenario.log_result("出错后继续写出后续记录", messages == ["目录已创建"], f"文件内容: {messages}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_22_reset_closes_event_log():
+    """测试场景22：重置系统时关闭旧系统的事件日志"""
+    scenario = TestScenario("重置释放事件日志", "测试反复重置不会累积事件日志写线程和退出钩子")
+    module = load_app()
+    client = module.app.test_client()
+    
+    def writer_threads():
+        return sum(1 for thread in threading.enumerate() if thread.name == "event-log-writer" and thread.is_alive())
+    
+    module.actor.call(lambda s: s.log_event("INFO", "重置前的日志"))
+    before = writer_threads()
+    old_logs = []
+    for _ in range(3):
+        old_logs.append(module.actor.call(lambda s: s.event_log))
+        client.post("/api/reset_system")
+        module.actor.call(lambda s: s.log_event("INFO", "重置后的日志"))
+    scenario.log_result("旧事件日志的写线程已停止", all(log._writer is None for log in old_logs), "")
+    scenario.log_result("旧事件日志的退出钩子已注销", not any(log._exit_hook_registered for log in old_logs), "")
+    scenario.log_result("写线程数不随重置增长", writer_threads() <= before,
+                        f"重置前: {before}, 重置后: {writer_threads()}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_23_task_index_paging():
+    """测试场景23：任务索引分页与暴力过滤一致"""
+    scenario = TestScenario("任务索引分页", "测试随机条件下游标分页结果与按创建顺序暴力过滤一致")
+    
+    rng = random.Random(23)
+    system = LogisticsSystem()
+    system.task_archive = TaskArchive(max_tasks=20)
+    origin = datetime(2026, 1, 1)
+    warehouses = ["TW001", "TW002", "PW001", "PW002"]
+    created = []  # 按创建顺序的任务对象，归档和丢弃后仍保留原始属性
+    
+    def mutate(steps):
+        for _ in range(steps):
+            action = rng.random()
+            if action < 0.4 or not created:
+                task = Task(f"TI{len(created):04d}", rng.choice(list(TaskType)),
+                            details={"source_warehouse_id": rng.choice(warehouses),
+                                     "target_warehouse_id": rng.choice(warehouses)})
+                created.append(task)
+                system._register_task(task)
+                continue
+            active = [task for task in created if task.id in system.tasks]
+            if not active:
+                continue
+            task = rng.choice(active)
+            if action < 0.6:
+                task.status = rng.choice([ResourceStatus.BUSY, ResourceStatus.MAINTENANCE])
+                task.start_time = origin + timedelta(minutes=rng.randrange(0, 20 * 60))
+                task.end_time = None
+            elif action < 0.85:
+                task.status = ResourceStatus.IDLE
+                task.start_time = origin + timedelta(minutes=rng.randrange(0, 20 * 60))
+                task.end_time = task.start_time + timedelta(minutes=rng.randrange(0, 180))
+            else:
+                if task.end_time is not None and task.status == ResourceStatus.IDLE:
+                    system._archive_task(task)
+                continue
+            system._journal_task_state(task)
+    
+    def expected(status, task_type, warehouse_id, start, end, descending):
+        results = []
+        for task in created:
+            record = system.get_task_dict(task.id)
+            if record is None:
+                continue
+            if task_type is not None and task.task_type != task_type:
+                continue
+            if warehouse_id is not None and warehouse_id not in task.details.values():
+                continue
+            if status is not None and task.status != status:
+                continue
+            if start is not None or end is not None:
+                if task.start_time is None or (end is not None and task.start_time > end):
+                    continue
+                if start is not None and task.end_time is not None and task.end_time < start:
+                    continue
+            results.append(task.id)
+        return results[::-1] if descending else results
+    
+    def check_queries(label, rounds):
+        mismatches = []
+        for _ in range(rounds):
+            status = rng.choice([None, None] + list(ResourceStatus))
+            task_type = rng.choice([None, None] + list(TaskType))
+            warehouse_id = rng.choice([None, None] + warehouses)
+            start = end = None
+            if rng.random() < 0.5:
+                start = origin + timedelta(minutes=rng.randrange(-60, 22 * 60))
+                end = start + timedelta(minutes=rng.randrange(0, 8 * 60))
+                start, end = rng.choice([(start, end), (start, None), (None, end)])
+            descending = rng.random() < 0.5
+            limit = rng.randint(1, 7)
+            pages, cursor = [], None
+            while True:
+                items, cursor = system.query_tasks(status, task_type, warehouse_id, start, end, cursor, limit,
+                                                   descending)
+                pages.extend(item["id"] for item in items)
+                if cursor is None:
+                    break
+            want = expected(status, task_type, warehouse_id, start, end, descending)
+            if pages != want:
+                mismatches.append((status, task_type, warehouse_id, start, end, descending, limit))
+        scenario.log_result(label, not mismatches, f"不一致的查询: {mismatches[:2]}")
+    
+    mutate(150)
+    check_queries("初始分页与暴力过滤一致", 150)
+    mutate(400)
+    for task in created[:60]:
+        # 结束并归档最早的任务，使索引开头出现成段的空位
+        if task.id in system.tasks:
+            task.status = ResourceStatus.IDLE
+            task.start_time = task.start_time or origin
+            task.end_time = task.start_time + timedelta(minutes=30)
+            system._journal_task_state(task)
+            system._archive_task(task)
+    archived = sum(1 for task in created if task.id in system.task_archive)
+    dropped = sum(1 for task in created if system.get_task_dict(task.id) is None)
+    check_queries("含归档和已丢弃任务时一致", 150)
+    system.task_index._compact()
+    scenario.log_result("索引已丢弃开头空位", system.task_index.base > 0 and archived > 0 and dropped > 0,
+                        f"base: {system.task_index.base}, 归档: {archived}, 丢弃: {dropped}")
+    check_queries("压缩后分页一致", 150)
+    mutate(100)
+    check_queries("压缩后继续变更仍一致", 100)
+    
+    client = load_app().app.test_client()
+    response = client.get("/api/tasks?cursor=abc")
+    scenario.log_result("非法游标返回 400", response.status_code == 400, f"状态码: {response.status_code}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_24_task_queue_order():
+    """测试场景24：待执行队列的出队顺序"""
+    scenario = TestScenario("待执行队列", "测试随机入队、删除和修改计划后出队顺序与按策略键排序一致")
+    
+    for policy_name in SCHEDULING_POLICIES:
+        rng = random.Random(policy_name)
+        system = LogisticsSystem()
+        now = system.clock.now
+        for index in range(6):
+            system.add_ship_plan(ShipPlan(f"QP{index}", {"P001": 1}, now + timedelta(hours=rng.randrange(1, 6)),
+                                          rng.randint(1, 5)))
+        sequence = {}  # 任务ID -> 入队序号，与队列的同键次序一致
+        created = 0
+        
+        def push_task():
+            nonlocal created
+            plan_id = rng.choice(list(system.ship_plans) + [None])
+            task = Task(f"Q{created:04d}", TaskType.SHIP_TRANSPORT if plan_id else TaskType.INTERNAL_TRANSFER,
+                        details={"plan_id": plan_id} if plan_id else {})
+            created += 1
+            sequence[task.id] = created
+            system._register_task(task)
+        
+        def expected_order():
+            policy = system.task_queue.policy
+            return sorted(sequence, key=lambda task_id: (policy(system, system.tasks[task_id]), sequence[task_id]))
+        
+        system.set_scheduling_policy(policy_name)
+        mismatches = []
+        rebuilds = updates = 0
+        for step in range(600):
+            action = rng.random()
+            if action < 0.4 or not sequence:
+                push_task()
+            elif action < 0.55:
+                task_id = rng.choice(list(sequence))
+                system.task_queue.remove(task_id)
+                del sequence[task_id]
+            elif action < 0.75:
+                plan_id = rng.choice(list(system.ship_plans))
+                system.update_ship_plan(plan_id, rng.choice([None, now + timedelta(hours=rng.randrange(1, 6))]),
+                                        rng.choice([None, rng.randint(1, 5)]))
+                updates += 1
+            elif action < 0.8:
+                # 切换到其他策略再切回，两次都重建堆
+                system.set_scheduling_policy(rng.choice([name for name in SCHEDULING_POLICIES if name != policy_name]))
+                if system.task_queue.ordered() != expected_order():
+                    mismatches.append((step, "switch"))
+                system.set_scheduling_policy(policy_name)
+                rebuilds += 1
+            else:
+                want = expected_order()[0]
+                got = system.pop_next_task()
+                del sequence[want]
+                if got != want:
+                    mismatches.append((step, got, want))
+        drained = []
+        want = expected_order()
+        while len(system.task_queue):
+            drained.append(system.pop_next_task())
+        scenario.log_result(f"{policy_name} 出队顺序与排序一致", not mismatches and drained == want
+                            and system.pop_next_task() is None,
+                            f"不一致: {mismatches[:3]}, 重建 {rebuilds} 次, 修改计划 {updates} 次")
+    
+    system = LogisticsSystem()
+    system.set_scheduling_policy("edf")
+    now = system.clock.now
+    system.add_ship_plan(ShipPlan("QLATE", {"P001": 1}, now + timedelta(hours=5)))
+    system.add_ship_plan(ShipPlan("QSOON", {"P001": 1}, now + timedelta(hours=1)))
+    system._register_task(Task("QT-LATE", TaskType.SHIP_TRANSPORT, details={"plan_id": "QLATE"}))
+    system._register_task(Task("QT-SOON", TaskType.SHIP_TRANSPORT, details={"plan_id": "QSOON"}))
+    before = system.task_queue.peek()
+    system.update_ship_plan("QLATE", deadline=now + timedelta(minutes=30))
+    scenario.log_result("提前截止时间后任务移到队首", before == "QT-SOON" and system.pop_next_task() == "QT-LATE", "")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_25_spatial_index_nearest():
+    """测试场景25：空间索引最近邻与暴力排序一致"""
+    scenario = TestScenario("空间索引最近邻", "测试插入、移动和删除后 k 近邻与按距离排序的结果一致")
+    
+    rng = random.Random(25)
+    for grid_size, buckets_per_axis in (((20, 20), 1), ((50, 30), 4), ((120, 80), SPATIAL_BUCKETS_PER_AXIS)):
+        index = SpatialIndex(grid_size, buckets_per_axis)
+        positions = {}
+        mismatches = []
+        queries = 0
+        for step in range(1500):
+            action = rng.random()
+            if action < 0.35 or not positions:
+                item_id = f"S{rng.randrange(200):03d}"  # 已存在的ID相当于移动
+                positions[item_id] = Position(rng.randrange(grid_size[0]), rng.randrange(grid_size[1]))
+                index.insert(item_id, positions[item_id])
+            elif action < 0.5:
+                item_id = rng.choice(list(positions))
+                positions[item_id] = Position(rng.randrange(grid_size[0]), rng.randrange(grid_size[1]))
+                index.insert(item_id, positions[item_id])
+            elif action < 0.65:
+                item_id = rng.choice(list(positions) + ["S-missing"])
+                positions.pop(item_id, None)
+                index.remove(item_id)
+            else:
+                query = Position(rng.randrange(-5, grid_size[0] + 5), rng.randrange(-5, grid_size[1] + 5))
+                k = rng.randint(0, len(positions) + 2)
+                want = [item_id for _, item_id in
+                        sorted((query.distance_to(position), item_id) for item_id, position in positions.items())][:k]
+                got = index.nearest(query, k)
+                queries += 1
+                if got != want:
+                    mismatches.append((step, query, k, got[:3], want[:3]))
+        scenario.log_result(f"{grid_size} 每边 {buckets_per_axis} 桶时与暴力排序一致",
+                            not mismatches and len(index) == len(positions)
+                            and all(item_id in index for item_id in positions),
+                            f"查询 {queries} 次, 不一致: {mismatches[:2]}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_26_path_planner_routes():
+    """测试场景26：路径规划与朴素 Dijkstra 一致"""
+    scenario = TestScenario("路径规划", "测试随机障碍网格上 A* 和地标路径表与朴素 Dijkstra 的距离一致且路径合法")
+    
+    def reference(width, height, blocked, start, goal):
+        """朴素 Dijkstra：八邻域，阻挡格子只能作为终点，斜向不切过阻挡格子的角"""
+        best = {start: 0.0}
+        queue = [(0.0, start)]
+        while queue:
+            cost, cell = heapq.heappop(queue)
+            if cell == goal:
+                return cost
+            if cost > best[cell] or (cell != start and cell in blocked):
+                continue
+            x, y = cell
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbor = (x + dx, y + dy)
+                    if (dx, dy) == (0, 0) or not (0 <= neighbor[0] < width and 0 <= neighbor[1] < height):
+                        continue
+                    if neighbor in blocked and neighbor != goal:
+                        continue
+                    if dx and dy and ((x + dx, y) in blocked or (x, y + dy) in blocked):
+                        continue
+                    new_cost = cost + (math.sqrt(2) if dx and dy else 1.0)
+                    if new_cost < best.get(neighbor, math.inf):
+                        best[neighbor] = new_cost
+                        heapq.heappush(queue, (new_cost, neighbor))
+        return math.inf
+    
+    def route_problem(blocked, start, goal, distance, route):
+        """路径不合法时返回原因"""
+        if math.isinf(distance):
+            return None if route == () else "不可达时路径应为空"
+        if route[0] != start or route[-1] != goal:
+            return "路径首尾不是起点和终点"
+        if any(cell in blocked for cell in route[1:-1]):
+            return "路径穿过阻挡格子"
+        length = 0.0
+        for (x, y), (nx, ny) in zip(route, route[1:]):
+            dx, dy = nx - x, ny - y
+            if max(abs(dx), abs(dy)) != 1:
+                return "路径步长不是相邻格子"
+            if dx and dy and ((nx, y) in blocked or (x, ny) in blocked):
+                return "斜向切过阻挡格子的角"
+            length += math.sqrt(2) if dx and dy else 1.0
+        return None if abs(length - distance) < 1e-9 else "路径长度与距离不一致"
+    
+    rng = random.Random(26)
+    search_errors, table_errors = [], []
+    searches = table_entries = 0
+    for trial in range(12):
+        width, height = rng.randint(6, 16), rng.randint(6, 16)
+        cells = [(x, y) for x in range(width) for y in range(height)]
+        blocked = {cell for cell in cells if rng.random() < rng.choice([0.1, 0.25, 0.4])}
+        planner = PathPlanner((width, height), blocked)
+        for _ in range(40):
+            start, goal = rng.choice(cells), rng.choice(cells)
+            distance, route = planner._search(start, goal)
+            want = reference(width, height, blocked, start, goal)
+            problem = route_problem(blocked, start, goal, distance, route)
+            searches += 1
+            if not (distance == want or abs(distance - want) < 1e-9) or problem:
+                search_errors.append((trial, start, goal, distance, want, problem))
+        
+        # 地标包含被阻挡的仓库格子和空闲的停放位
+        landmarks = rng.sample(sorted(blocked), min(4, len(blocked))) + rng.sample(cells, 4)
+        planner.precompute(landmarks)
+        for start in set(landmarks):
+            for goal in set(landmarks):
+                distance, route = planner.route(start, goal)
+                want = reference(width, height, blocked, start, goal)
+                problem = route_problem(blocked, start, goal, distance, route)
+                table_entries += 1
+                if not (distance == want or abs(distance - want) < 1e-9) or problem:
+                    table_errors.append((trial, start, goal, distance, want, problem))
+    scenario.log_result("A* 与朴素 Dijkstra 一致", not search_errors,
+                        f"查询 {searches} 次, 不一致: {search_errors[:2]}")
+    scenario.log_result("地标路径表与朴素 Dijkstra 一致", not table_errors,
+                        f"表项 {table_entries} 个, 不一致: {table_errors[:2]}")
+    
+    planner = PathPlanner((5, 3), set())
+    planner.precompute([(0, 1), (4, 1)])
+    before = planner.route((0, 1), (4, 1))[0]
+    planner.set_blocked({(2, 0), (2, 1)})
+    after = planner.route((0, 1), (4, 1))
+    scenario.log_result("更新障碍后路径表失效", before == 4.0 and after[0] == reference(5, 3, {(2, 0), (2, 1)}, (0, 1), (4, 1))
+                        and (2, 1) not in after[1], f"更新前: {before}, 更新后: {after}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_11_pipelined_makespan():
+    """测试场景11：流水线执行只在缩短总完工时间时借出车头"""
+    scenario = TestScenario("流水线执行", "测试一个车头服务多个框架时流水线与独占执行的总完工时间")
+    
+    light = (_pipeline_makespan(True, 30, 5), _pipeline_makespan(False, 30, 5))
+    scenario.log_result("装卸时间短时不慢于独占执行", light[0] <= light[1],
+                        f"流水线 {light[0]:.1f}s, 独占 {light[1]:.1f}s")
+    heavy = (_pipeline_makespan(True, 12, 40), _pipeline_makespan(False, 12, 40))
+    scenario.log_result("装卸时间长时缩短完工时间", heavy[0] < heavy[1],
+                        f"流水线 {heavy[0]:.1f}s, 独占 {heavy[1]:.1f}s")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_12_reservations():
+    """测试场景12：预约日历、预约与正在执行的任务、重启后的预约"""
+    scenario = TestScenario("资源预约", "测试区间树空档查询、预约避开执行中任务的资源以及恢复后的预约")
+    
+    rng = random.Random(7)
+    tree = IntervalTree()
+    intervals = {}
+    for k in range(300):
+        start = rng.uniform(0, 1000)
+        intervals[k] = (start, start + rng.uniform(1, 20))
+        try:
+            if not tree.overlapping(*intervals[k]):
+                tree.add(*intervals[k], k)
+            else:
+                del intervals[k]
+        except ValueError:
+            del intervals[k]
+    for k in list(intervals)[::3]:
+        tree.remove(k)
+        del intervals[k]
+    
+    def brute_gap(after, duration, before=None):
+        start = after
+        for interval_start, interval_end in sorted(intervals.values()):
+            if interval_end <= start:
+                continue
+            if interval_start - start >= duration:
+                break
+            start = max(start, interval_end)
+        return start if before is None or start + duration <= before else None
+    
+    queries = [(rng.uniform(0, 1000), rng.uniform(1, 30), rng.choice([None, rng.uniform(0, 1100)]))
+               for _ in range(200)]
+    mismatches = [query for query in queries if tree.first_gap(*query) != brute_gap(*query)]
+    scenario.log_result("区间树空档与逐个检查一致", not mismatches, f"不一致的查询: {mismatches[:3]}")
+    
+    calendar = ReservationCalendar()
+    base = datetime(2024, 1, 1, 8)
+    calendar.reserve("frame_truck", "T001", base, base + timedelta(minutes=30), "A")
+    calendar.reserve("frame_truck", "T002", base, base + timedelta(minutes=10), "B")
+    calendar.reserve("frame_truck", "T002", base + timedelta(minutes=25), base + timedelta(hours=1), "B")
+    window = calendar.first_window("frame_truck", ["T001", "T002"], base, timedelta(minutes=15))
+    scenario.log_result("多个资源中最早的空档", window == (base + timedelta(minutes=10), "T002"), f"空档: {window}")
+    window = calendar.first_window("frame_truck", ["T001", "T002"], base, timedelta(minutes=20))
+    scenario.log_result("空档不足时顺延", window == (base + timedelta(minutes=30), "T001"), f"空档: {window}")
+    calendar.cancel("A")
+    scenario.log_result("取消预约后资源空闲",
+                        calendar.is_free("frame_truck", "T001", base, base + timedelta(hours=1)), "")
+    
+    # 只有一个可用车头和框架：预约需排在正在执行的任务之后
+    system = create_complex_system()
+    scenario.system = system
+    for truck_id in ("T002", "T003", "T004", "T005"):
+        system.frame_trucks[truck_id].status = ResourceStatus.MAINTENANCE
+    for frame_id in ("F002", "F003", "F004", "F005"):
+        system.frames[frame_id].status = ResourceStatus.MAINTENANCE
+    system.add_ship_plan(ShipPlan("SP100", {"P001": 10}, system.clock.now + timedelta(hours=4)))
+    running = system.create_ship_transport_task("SP100")
+    system.submit_task(running.id)
+    system.clock.step()
+    system.add_ship_plan(ShipPlan("SP101", {"P001": 10}, system.clock.now + timedelta(hours=4)))
+    booked = system.book_ship_plan("SP101")
+    scheduled = booked.details["scheduled_start"] if booked else None
+    scenario.log_result("预约避开执行中任务占用的车头", scheduled is not None and scheduled > system.clock.now,
+                        f"预约开始: {scheduled}, 当前: {system.clock.now}")
+    scenario.log_result("查找后撤销临时占用", not system.reservations.owner_reservations(LIVE_HOLD_OWNER), "")
+    system.run_simulation()
+    scenario.log_result("两个任务依次完成",
+                        running.status == ResourceStatus.IDLE and booked.status == ResourceStatus.IDLE, "")
+    
+    # 重启：执行中的任务被中断并取消预约，未开始的自动开始预约重新安排
+    with tempfile.TemporaryDirectory() as directory:
+        system = create_complex_system()
+        system.enable_persistence(directory)
+        for i, product_id in enumerate(("P001", "P003")):
+            system.add_ship_plan(ShipPlan(f"SP20{i}", {product_id: 10}, system.clock.now + timedelta(hours=6)))
+        first = system.book_ship_plan("SP200")
+        second = system.book_ship_plan("SP201", earliest=system.clock.now + timedelta(hours=1))
+        system.clock.run(stop_condition=lambda: first.start_time is not None)
+        system.clock.step()
+        restored = LogisticsSystem.restore(directory)
+        scenario.log_result("中断任务的预约已取消",
+                            restored.tasks[first.id].status == ResourceStatus.UNAVAILABLE
+                            and not restored.reservations.owner_reservations(first.id), "")
+        scenario.log_result("未开始的预约保留", len(restored.reservations.owner_reservations(second.id)) > 0, "")
+        restored.archive_completed_tasks = False
+        restored.run_simulation()
+        second_task = restored.tasks.get(second.id)
+        scenario.log_result("恢复后预约任务按时自动开始",
+                            second_task is not None and second_task.start_time == second.details["scheduled_start"]
+                            and second_task.status == ResourceStatus.IDLE,
+                            f"开始时间: {second_task.start_time if second_task else None}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_13_solve_assignment():
+    """测试场景13：最小费用指派"""
+    scenario = TestScenario("最小费用指派", "测试匈牙利算法与穷举结果一致")
+    
+    rng = random.Random(13)
+    mismatches = []
+    for _ in range(200):
+        n = rng.randint(1, 5)
+        m = rng.randint(n, 6)
+        cost = [[rng.choice([rng.uniform(0, 100), float(rng.randint(0, 5))]) for _ in range(m)] for _ in range(n)]
+        columns = solve_assignment(cost)
+        total = sum(cost[i][j] for i, j in enumerate(columns))
+        best = min(sum(cost[i][j] for i, j in enumerate(chosen))
+                   for chosen in itertools.permutations(range(m), n))
+        if len(set(columns)) != n or abs(total - best) > 1e-6:
+            mismatches.append((cost, columns))
+    scenario.log_result("总费用等于穷举最优且列不重复", not mismatches, f"不一致: {len(mismatches)}")
+    scenario.log_result("空矩阵", solve_assignment([]) == [], "")
+    try:
+        solve_assignment([[1.0], [2.0]])
+        rejected = False
+    except ValueError:
+        rejected = True
+    scenario.log_result("行数多于列数时拒绝", rejected, "")
+    
+    scenario.print_results()
+    return scenario
+
+
+def _persisted_state(system: LogisticsSystem) -> dict:
+    """用于比较恢复结果的状态：库存、资源状态和位置、任务状态"""
+    return {
+        "inventory": {warehouse_id: dict(warehouse.products)
+                      for warehouse_id, warehouse in system.terminal_warehouses.items()},
+        "resources": {resource.id: (resource.status, resource.position.x, resource.position.y)
+                      for collection in (system.cranes, system.frames, system.frame_trucks)
+                      for resource in collection.values()},
+        "tasks": {task_id: task.status for task_id, task in system.tasks.items()},
+        "archived": sorted(task_id for task_id in ("ship_task_SP300", "ship_task_SP301")
+                           if task_id in system.task_archive),
+    }
+
+
+def test_scenario_14_persistence_recovery():
+    """测试场景14：预写日志和快照恢复"""
+    scenario = TestScenario("持久化恢复", "测试预写日志末尾不完整记录的截断、事务原子性和快照恢复")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        system = create_complex_system()
+        system.enable_persistence(directory)
+        system.terminal_warehouses["TW001"].add_product("P001", 7)
+        system.frames["F005"].status = ResourceStatus.MAINTENANCE
+        for i in range(2):
+            system.add_ship_plan(ShipPlan(f"SP30{i}", {"P001": 5}, datetime.now() + timedelta(hours=2)))
+            system.execute_task(system.create_ship_transport_task(f"SP30{i}").id)
+        expected = _persisted_state(system)
+        system.persistence.close()
+        
+        wal_path = os.path.join(directory, WAL_FILE_PATTERN.format(system.persistence.generation))
+        valid_size = os.path.getsize(wal_path)
+        with open(wal_path, "ab") as f:
+            f.write(PersistenceStore._HEADER.pack(1000, 0) + b"torn")  # 崩溃时写了一半的记录
+        restored = LogisticsSystem.restore(directory)
+        scenario.log_result("截掉末尾不完整的记录后恢复", _persisted_state(restored) == expected, "")
+        scenario.log_result("日志文件截断到最后一条完整记录", os.path.getsize(wal_path) == valid_size,
+                            f"{os.path.getsize(wal_path)} / {valid_size}")
+        
+        # 事务写了一半：整批丢弃
+        with restored.transaction():
+            restored.terminal_warehouses["TW001"].add_product("P002", 3)
+            restored.terminal_warehouses["TW002"].add_product("P003", 4)
+        restored.persistence.close()
+        with open(wal_path, "r+b") as f:
+            f.truncate(os.path.getsize(wal_path) - 5)
+        restored = LogisticsSystem.restore(directory)
+        scenario.log_result("不完整的事务整批丢弃", _persisted_state(restored) == expected, "")
+        restored.persistence.close()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        system = create_complex_system()
+        system.enable_persistence(directory, snapshot_interval=5)
+        for quantity in range(1, 13):
+            system.terminal_warehouses["TW001"].add_product("P002", quantity)
+        system.add_ship_plan(ShipPlan("SP300", {"P001": 5}, datetime.now() + timedelta(hours=2)))
+        system.execute_task(system.create_ship_transport_task("SP300").id)
+        while system.persistence.records_since_snapshot == 0:
+            system.terminal_warehouses["TW001"].add_product("P002", 1)
+        expected = _persisted_state(system)
+        system.persistence.close()
+        wal_files = sorted(name for name in os.listdir(directory) if name.startswith("wal-"))
+        scenario.log_result("快照覆盖的日志已清理", len(wal_files) == 1, f"日志文件: {wal_files}")
+        restored = LogisticsSystem.restore(directory)
+        scenario.log_result("从快照和其后的日志恢复", _persisted_state(restored) == expected
+                            and restored.persistence.records_since_snapshot > 0, "")
+        restored.persistence.close()
+    
+    scenario.print_results()
+    return scenario
+
+
+_app_module = None
+
+
+def load_app():
+    """加载 Web 服务（app.py），数据目录为临时目录
+
+    app.py 按部署时的包路径 test2 导入核心模块；在仓库目录内运行测试时把本目录注册为 test2 包，
+    并让 test2.factory_logistics_system 指向已导入的核心模块。
+    """
+    global _app_module
+    if _app_module is None:
+        directory = tempfile.mkdtemp(prefix="logistics-test-")
+        atexit.register(shutil.rmtree, directory, True)
+        os.environ["LOGISTICS_DATA_DIR"] = directory
+        package = types.ModuleType("test2")
+        package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules.setdefault("test2", package)
+        sys.modules.setdefault("test2.factory_logistics_system", sys.modules[LogisticsSystem.__module__])
+        _app_module = importlib.import_module("test2.app")
+        _app_module.app.logger.disabled = True
+    return _app_module
+
+
+def test_scenario_15_etag():
+    """测试场景15：系统状态和单个任务的 ETag/304"""
+    scenario = TestScenario("ETag 缓存", "测试状态未变化时返回 304、变化后返回新 ETag")
+    client = load_app().app.test_client()
+    
+    first = client.get("/api/system_status")
+    etag = first.headers.get("ETag", "")
+    scenario.log_result("状态响应带 ETag", first.status_code == 200 and etag != "", f"ETag: {etag}")
+    cached = client.get("/api/system_status", headers={"If-None-Match": etag})
+    scenario.log_result("状态未变化时返回 304", cached.status_code == 304 and not cached.data, "")
+    client.post("/api/update_warehouse_product", json={"warehouse_id": "TW001", "product_id": "P001", "quantity": 1})
+    changed = client.get("/api/system_status", headers={"If-None-Match": etag})
+    scenario.log_result("状态变化后返回新内容", changed.status_code == 200 and changed.headers.get("ETag") != etag, "")
+    
+    client.post("/api/create_ship_plan", json={"id": "SPETAG", "products": {"P001": 1}, "priority": 1})
+    task_id = client.post("/api/create_ship_transport_task", json={"plan_id": "SPETAG"}).get_json()["task"]["id"]
+    task_etag = client.get(f"/api/tasks/{task_id}").headers.get("ETag", "")
+    client.post("/api/update_warehouse_product", json={"warehouse_id": "TW001", "product_id": "P002", "quantity": 1})
+    unchanged = client.get(f"/api/tasks/{task_id}", headers={"If-None-Match": task_etag})
+    scenario.log_result("其他实体变化时任务仍返回 304", unchanged.status_code == 304, "")
+    client.post("/api/execute_task", json={"task_id": task_id})
+    executed = client.get(f"/api/tasks/{task_id}", headers={"If-None-Match": task_etag})
+    scenario.log_result("任务变化后返回新内容", executed.status_code == 200
+                        and executed.headers.get("ETag") != task_etag
+                        and executed.get_json()["status"] == ResourceStatus.IDLE.value,
+                        f"状态码: {executed.status_code}")
+    scenario.log_result("不存在的任务返回 404", client.get("/api/tasks/no_such_task").status_code == 404, "")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_16_bulk_import():
+    """测试场景16：NDJSON 批量导入的逐行结果"""
+    scenario = TestScenario("批量导入", "测试跨批次的逐行结果、错误行不影响其他行以及汇总")
+    module = load_app()
+    client = module.app.test_client()
+    
+    lines = [
+        json.dumps({"type": "product", "id": "BP001", "name": "批量产品", "weight": 2.0, "volume": 1.0}),
+        "{不是 JSON",
+        "",
+        json.dumps(["不是对象"]),
+        json.dumps({"type": "unknown"}),
+        json.dumps({"type": "frame", "id": "BF001"}),
+        json.dumps({"type": "inventory", "warehouse_id": "TW001", "product_id": "BP001", "quantity": 5}),
+        json.dumps({"type": "inventory", "warehouse_id": "TW001", "product_id": "BP001", "quantity": -50}),
+        json.dumps({"type": "inventory", "warehouse_id": "NOWH", "product_id": "BP001", "quantity": 1}),
+    ]
+    batch_size, module.BULK_BATCH_SIZE = module.BULK_BATCH_SIZE, 3  # 让结果跨越多个批次
+    try:
+        response = client.post("/api/bulk", data="\n".join(lines) + "\n", content_type="application/x-ndjson")
+        results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    finally:
+        module.BULK_BATCH_SIZE = batch_size
+    
+    summary = results.pop()
+    by_line = {result["line"]: result for result in results}
+    scenario.log_result("每个非空行一条结果且按行号排列",
+                        [result["line"] for result in results] == [1, 2, 4, 5, 6, 7, 8, 9],
+                        f"行号: {[result['line'] for result in results]}")
+    scenario.log_result("合法行成功", by_line[1]["success"] and by_line[7]["success"]
+                        and by_line[1]["id"] == "BP001", "")
+    scenario.log_result("解析和字段错误逐行报告",
+                        not any(by_line[line]["success"] for line in (2, 4, 5, 6))
+                        and "JSON" in by_line[2]["error"] and "字段错误" in by_line[6]["error"], "")
+    scenario.log_result("执行失败的行带失败原因",
+                        not by_line[8]["success"] and not by_line[9]["success"] and by_line[9]["error"], "")
+    scenario.log_result("汇总", summary == {"summary": {"succeeded": 2, "failed": 6}}, f"汇总: {summary}")
+    stock = client.get("/api/resources?type=terminal_warehouses").get_json()
+    warehouse = next(item for item in stock["items"] if item["id"] == "TW001")
+    scenario.log_result("成功的行已生效", warehouse["products"].get("BP001") == 5, f"库存: {warehouse['products']}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_17_pack_frame_loads():
+    """测试场景17：按载重和容积拆分框架装载"""
+    scenario = TestScenario("框架装载拆分", "测试拆分结果守恒、不超限且趟数接近下界")
+    
+    catalog = {f"X{k}": Product(f"X{k}", f"产品{k}", weight, volume)
+               for k, (weight, volume) in enumerate([(10.0, 1.0), (1.0, 8.0), (4.0, 4.0), (7.5, 2.5), (0.5, 0.5)])}
+    scenario.log_result("单一产品按整件装满", pack_frame_loads({"X0": 10}, catalog, 35.0)
+                        == [{"X0": 3}, {"X0": 3}, {"X0": 3}, {"X0": 1}], "")
+    scenario.log_result("空订单", pack_frame_loads({}, catalog, 35.0) == [{}], "")
+    try:
+        pack_frame_loads({"X0": 1}, catalog, 5.0)
+        rejected = False
+    except ValueError:
+        rejected = True
+    scenario.log_result("单件超限时拒绝", rejected, "")
+    
+    rng = random.Random(17)
+    problems = []
+    for _ in range(300):
+        order = {product_id: rng.randint(1, 40) for product_id in rng.sample(sorted(catalog), rng.randint(1, 5))}
+        max_weight, max_volume = rng.uniform(10, 120), rng.choice([math.inf, rng.uniform(8, 80)])
+        loads = pack_frame_loads(order, catalog, max_weight, max_volume)
+        merged = {}
+        for load in loads:
+            for product_id, quantity in load.items():
+                merged[product_id] = merged.get(product_id, 0) + quantity
+        sizes = [load_size(load, catalog) for load in loads]
+        weight, volume = load_size(order, catalog)
+        lower_bound = max(math.ceil(weight / max_weight - 1e-9), math.ceil(volume / max_volume - 1e-9))
+        if (merged != order or any(w > max_weight + 1e-6 or v > max_volume + 1e-6 for w, v in sizes)
+                or len(loads) > 2 * lower_bound + 1):
+            problems.append((order, max_weight, max_volume, loads))
+    scenario.log_result("件数守恒、每趟不超限、趟数不超过下界的两倍加一", not problems, f"问题: {problems[:1]}")
+    
+    scenario.print_results()
+    return scenario
+
+
+def test_scenario_18_min_cost_flow():
+    """测试场景18：最小费用流"""
+    scenario = TestScenario("最小费用流", "测试逐次最短增广路与穷举所有整数流的结果一致")
+    
+    def brute_force(node_count, edges, source, sink, required):
+        """穷举每条边的整数流量，返回 (最大可行流量, 该流量下的最小费用)"""
+        best = (0, 0.0)
+        for flows in itertools.product(*(range(capacity + 1) for _, _, capacity, _ in edges)):
+            balance = [0] * node_count
+            for (u, v, _, _), flow in zip(edges, flows):
+                balance[u] -= flow
+                balance[v] += flow
+            value = balance[sink]
+            if value > required or any(balance[node] for node in range(node_count) if node not in (source, sink)):
+                continue
+            cost = sum(flow * edge[3] for edge, flow in zip(edges, flows))
+            if value > best[0] or (value == best[0] and cost < best[1] - 1e-9):
+                best = (value, cost)
+        return best
+    
+    rng = random.Random(23)
+    mismatches = []
+    for _ in range(150):
+        node_count = rng.randint(3, 5)
+        edges = []
+        for _ in range(rng.randint(2, 6)):
+            u, v = rng.sample(range(node_count), 2)
+            edges.append((u, v, rng.randint(1, 2), float(rng.randint(0, 9))))
+        required = rng.randint(1, 4)
+        flow, cost, edge_flows = solve_min_cost_flow(node_count, edges, 0, node_count - 1, required)
+        balance = [0] * node_count
+        for (u, v, capacity, _), edge_flow in zip(edges, edge_flows):
+            balance[u] -= edge_flow
+            balance[v] += edge_flow
+        consistent = (all(0 <= edge_flow <= edge[2] for edge, edge_flow in zip(edges, edge_flows))
+                      and balance[node_count - 1] == flow
+                      and abs(sum(f * edge[3] for edge, f in zip(edges, edge_flows)) - cost) < 1e-6)
+        expected = brute_force(node_count, edges, 0, node_count - 1, required)
+        if not consistent or flow != expected[0] or abs(cost - expected[1]) > 1e-6:
+            mismatches.append((edges, required, (flow, cost), expected))
+    scenario.log_result("流量和费用与穷举一致，边流量满足容量和守恒", not mismatches, f"不一致: {mismatches[:1]}")
+    
+    scenario.print_results()
+    return scenario
+
+
 def run_performance_test():
-    """运行性能测试"""
+    """运行性能测试（冒烟级别；按规模计时和回退检测见 scheduler_benchmark.py）"""
     print(f"\n{'='*50}")
     print("性能测试")
     print(f"{'='*50}")
@@ -407,7 +1439,27 @@ def main():
         test_scenario_3_internal_transfer(),
         test_scenario_4_resource_shortage(),
         test_scenario_5_complex_mixed_tasks(),
-        test_scenario_6_system_monitoring()
+        test_scenario_6_system_monitoring(),
+        test_scenario_7_parallel_executor_failures(),
+        test_scenario_8_repeated_task_archive(),
+        test_scenario_9_change_log_since(),
+        test_scenario_10_zone_routing(),
+        test_scenario_11_pipelined_makespan(),
+        test_scenario_12_reservations(),
+        test_scenario_13_solve_assignment(),
+        test_scenario_14_persistence_recovery(),
+        test_scenario_15_etag(),
+        test_scenario_16_bulk_import(),
+        test_scenario_17_pack_frame_loads(),
+        test_scenario_18_min_cost_flow(),
+        test_scenario_19_zone_fleet_balancing(),
+        test_scenario_20_histogram_buckets(),
+        test_scenario_21_event_log_backpressure(),
+        test_scenario_22_reset_closes_event_log(),
+        test_scenario_23_task_index_paging(),
+        test_scenario_24_task_queue_order(),
+        test_scenario_25_spatial_index_nearest(),
+        test_scenario_26_path_planner_routes()
     ]
     
     # 运行性能测试
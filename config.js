@@ -129,7 +129,9 @@ function addProduct() {
         if (data.success) {
             alert('产品添加成功');
             document.getElementById('product-form').reset();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                loadSystemResources();
+            }
         } else {
             alert('产品添加失败');
         }
@@ -175,7 +177,9 @@ function addTerminalWarehouse() {
         if (data.success) {
             alert('末端库添加成功');
             document.getElementById('terminal-warehouse-form').reset();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                loadSystemResources();
+            }
         } else {
             alert('末端库添加失败');
         }
@@ -221,7 +225,9 @@ function addProductWarehouse() {
         if (data.success) {
             alert('成品库添加成功');
             document.getElementById('product-warehouse-form').reset();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                loadSystemResources();
+            }
         } else {
             alert('成品库添加失败');
         }
@@ -267,7 +273,9 @@ function addCrane() {
         if (data.success) {
             alert('行车添加成功');
             document.getElementById('crane-form').reset();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                loadSystemResources();
+            }
         } else {
             alert('行车添加失败');
         }
@@ -311,7 +319,9 @@ function addFrame() {
         if (data.success) {
             alert('框架添加成功');
             document.getElementById('frame-form').reset();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                loadSystemResources();
+            }
         } else {
             alert('框架添加失败');
         }
@@ -355,7 +365,9 @@ function addFrameTruck() {
         if (data.success) {
             alert('车头添加成功');
             document.getElementById('truck-form').reset();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                loadSystemResources();
+            }
         } else {
             alert('车头添加失败');
         }
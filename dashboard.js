@@ -13,6 +13,9 @@ document.addEventListener('DOMContentLoaded', function() {
  * 初始化仪表盘
  */
 function initDashboard() {
+    // 已连接事件流时由 hello 事件触发全量加载，之后增量更新
+    if (eventSource) return;
+    
     // 加载系统状态
     updateSystemStatus();
     
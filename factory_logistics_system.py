@@ -13,11 +13,72 @@ Factory Logistics Scheduling System
 """
 
 from enum import Enum
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Callable
 from dataclasses import dataclass, field
 import uuid
 from datetime import datetime, timedelta
+import heapq
+import array
+import atexit
+import os
+import pickle
+import queue
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+import itertools
+import math
 import json
+from bisect import bisect_left, bisect_right
+
+
+# 任务和子任务数量巨大，Python 3.10+ 上使用 __slots__ 去掉实例 __dict__
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# 仿真参数
+GRID_CELL_LENGTH = 50.0  # 每个网格单元对应的实际距离（米）
+DEFAULT_TRANSPORT_SPEED = 10.0  # 未指定车头时的运输速度（米/秒）
+FRAME_COUPLING_TIME = 60.0  # 车头挂接框架耗时（秒）
+CRANE_CYCLE_TIME = 90.0  # 行车单次吊运耗时（秒）
+SPATIAL_BUCKETS_PER_AXIS = 16  # 空间索引每个坐标轴上的分桶数
+ROUTE_CACHE_SIZE = 4096  # 临时路径查询的 LRU 缓存容量
+SLACK_REFERENCE = 3600.0  # 计算紧急度时的参考松弛时间（秒）
+SLACK_FLOOR = 60.0  # 松弛时间下限（秒），已超期的计划按此计算
+INFEASIBLE_COST = 1e12  # 指派问题中不可行组合的代价
+SOURCING_BUSY_CRANE_PENALTY = 10.0  # 多库取货时行车全部忙碌的末端库的附加距离（网格单位）
+DEFAULT_TASK_PRIORITY = 1  # 未关联船运计划的任务的优先级
+BOOKING_CANDIDATES = 3  # 预约时为每个末端库考虑的最近框架数和每个框架考虑的最近车头数
+LIVE_HOLD_OWNER = "__live__"  # 预约查找期间正在执行的未预约任务临时占用日历的预约者
+
+# 日志参数
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+LOG_BUFFER_SIZE = 1000  # 内存中保留的最近日志条数
+LOG_BATCH_SIZE = 256  # 后台写线程每批最多写入的日志条数
+LOG_QUEUE_SIZE = 10000  # 等待后台线程写出的日志条数上限，写出跟不上时丢弃新日志
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件的最大字节数
+LOG_BACKUP_COUNT = 5  # 轮转保留的历史日志文件数
+ARCHIVE_MAX_TASKS = 100000  # 归档中保留的已完成任务数上限
+CHANGE_LOG_LIMIT = 200000  # 保留的实体变更记录数上限，更早的增量查询需全量同步
+TASK_TIME_BUCKET_SECONDS = 3600.0  # 任务执行时段索引的分桶宽度（秒）
+
+# 指标参数
+HISTOGRAM_SUB_BUCKETS = 4  # 延迟直方图每个 2 倍区间的线性子桶数（相对误差约 1/4）
+HISTOGRAM_MIN_SECONDS = 1e-6  # 延迟直方图第一个桶的上界
+HISTOGRAM_OCTAVES = 27  # 延迟直方图覆盖的 2 倍区间数（约 1 微秒 ~ 134 秒）
+SIMULATED_HISTOGRAM_MIN_SECONDS = 1.0  # 仿真耗时直方图第一个桶的上界
+SIMULATED_HISTOGRAM_OCTAVES = 15  # 仿真耗时直方图覆盖的 2 倍区间数（约 1 秒 ~ 9 小时）
+
+# 持久化参数
+SNAPSHOT_INTERVAL = 10000  # 每写入多少条预写日志生成一次快照
+SNAPSHOT_FILE = "snapshot.bin"
+WAL_FILE_PATTERN = "wal-{:06d}.log"
 
 
 class ResourceStatus(Enum):
@@ -88,6 +149,7 @@ class Warehouse:
         """添加产品"""
         if self.current_load < self.capacity:
             self.products[product_id] = self.products.get(product_id, 0) + quantity
+            self._notify_inventory(product_id, quantity)
             return True
         return False
     
@@ -97,8 +159,20 @@ class Warehouse:
             self.products[product_id] -= quantity
             if self.products[product_id] == 0:
                 del self.products[product_id]
+            self._notify_inventory(product_id, -quantity)
             return True
         return False
+    
+    def _notify_inventory(self, product_id: str, delta: int):
+        """库存变化时通知所属调度系统"""
+        listener = self.__dict__.get("_inventory_listener")
+        if listener is not None and delta:
+            listener(self, product_id, delta)
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_inventory_listener", None)
+        return state
 
 
 @dataclass
@@ -114,8 +188,28 @@ class ProductWarehouse(Warehouse):
     storage_positions: Dict[str, Position] = field(default_factory=dict)  # 堆位信息
 
 
+class ObservableResource:
+    """资源混入类：被监听字段变化时通知所属调度系统"""
+    _observed_fields: Tuple[str, ...] = ("status", "position")
+    
+    def __setattr__(self, name, value):
+        if name not in self._observed_fields or name not in self.__dict__:
+            object.__setattr__(self, name, value)
+            return
+        old_value = self.__dict__[name]
+        object.__setattr__(self, name, value)
+        listener = self.__dict__.get("_listener")
+        if listener is not None and old_value != value:
+            listener(self, name, old_value, value)
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_listener", None)
+        return state
+
+
 @dataclass
-class Crane:
+class Crane(ObservableResource):
     """行车"""
     id: str
     name: str
@@ -125,21 +219,24 @@ class Crane:
     current_load: float = 0.0
     warehouse_id: str = ""  # 所属仓库ID
     
+    _observed_fields = ("status", "position", "warehouse_id")
+    
     def __post_init__(self):
         if not self.id:
             self.id = str(uuid.uuid4())[:8]
 
 
 @dataclass
-class Frame:
+class Frame(ObservableResource):
     """框架"""
     id: str
     name: str
     position: Position
     status: ResourceStatus = ResourceStatus.IDLE
-    capacity: float = 50.0
+    capacity: float = 50.0  # 载重上限，与产品重量同单位
     current_load: float = 0.0
     loaded_products: Dict[str, int] = field(default_factory=dict)
+    volume_capacity: float = 0.0  # 容积上限，与产品体积同单位，0 表示不限
     
     def __post_init__(self):
         if not self.id:
@@ -147,14 +244,16 @@ class Frame:
 
 
 @dataclass
-class FrameTruck:
+class FrameTruck(ObservableResource):
     """框架车头"""
     id: str
     name: str
     position: Position
     status: ResourceStatus = ResourceStatus.IDLE
     attached_frame_id: str = ""  # 当前拉的框架ID
-    speed: float = 10.0  # 移动速度
+    speed: float = 10.0  # 移动速度（米/秒）
+    
+    _observed_fields = ("status", "position", "attached_frame_id")
     
     def __post_init__(self):
         if not self.id:
@@ -174,7 +273,7 @@ class ShipPlan:
             self.id = str(uuid.uuid4())[:8]
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class SubTask:
     """子任务"""
     id: str
@@ -188,9 +287,12 @@ class SubTask:
     def __post_init__(self):
         if not self.id:
             self.id = str(uuid.uuid4())[:8]
+        # 资源类型和资源ID大量重复，驻留后所有子任务共享同一份字符串
+        self.assigned_resources = {sys.intern(resource_type): sys.intern(resource_id)
+                                   for resource_type, resource_id in self.assigned_resources.items()}
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class Task:
     """主任务"""
     id: str
@@ -206,220 +308,2783 @@ class Task:
             self.id = str(uuid.uuid4())[:8]
 
 
-class LogisticsSystem:
-    """物流调度系统"""
+def solve_assignment(cost: List[List[float]]) -> List[int]:
+    """最小费用指派（匈牙利算法，O(n²m)）
+
+    cost 为 n×m 矩阵且 n <= m，返回每一行分配到的列下标。
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    if n > m:
+        raise ValueError("行数不能多于列数")
     
-    def __init__(self, grid_size: Tuple[int, int] = (10, 10)):
-        self.grid_size = grid_size
-        self.terminal_warehouses: Dict[str, TerminalWarehouse] = {}
-        self.product_warehouses: Dict[str, ProductWarehouse] = {}
-        self.cranes: Dict[str, Crane] = {}
-        self.frames: Dict[str, Frame] = {}
-        self.frame_trucks: Dict[str, FrameTruck] = {}
-        self.products: Dict[str, Product] = {}
-        self.ship_plans: Dict[str, ShipPlan] = {}
-        self.tasks: Dict[str, Task] = {}
-        self.execution_log: List[Dict[str, Any]] = []
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    match = [0] * (m + 1)  # 列 -> 行（从 1 开始，0 表示未匹配）
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        match[0] = i
+        j0 = 0
+        min_slack = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = match[j0]
+            row = cost[i0 - 1]
+            delta = math.inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    current = row[j - 1] - u[i0] - v[j]
+                    if current < min_slack[j]:
+                        min_slack[j] = current
+                        way[j] = j0
+                    if min_slack[j] < delta:
+                        delta = min_slack[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
     
-    def add_terminal_warehouse(self, warehouse: TerminalWarehouse):
-        """添加末端库"""
-        self.terminal_warehouses[warehouse.id] = warehouse
+    result = [-1] * n
+    for j in range(1, m + 1):
+        if match[j]:
+            result[match[j] - 1] = j - 1
+    return result
+
+
+def solve_min_cost_flow(node_count: int, edges: List[Tuple[int, int, int, float]], source: int, sink: int,
+                        required: int) -> Tuple[int, float, List[int]]:
+    """最小费用流（逐次最短增广路，SPFA 求残量网络中的最短路）
+
+    edges 为 (起点, 终点, 容量, 单位费用)，容量为整数。从 source 向 sink 最多送出 required
+    单位流量，返回 (实际流量, 总费用, 每条边的流量)。
+    """
+    heads: List[List[int]] = [[] for _ in range(node_count)]
+    targets: List[int] = []
+    capacities: List[int] = []
+    costs: List[float] = []
+    for u, v, capacity, cost in edges:
+        # 正向弧下标为偶数，反向弧为其后一个
+        heads[u].append(len(targets))
+        targets.append(v)
+        capacities.append(capacity)
+        costs.append(cost)
+        heads[v].append(len(targets))
+        targets.append(u)
+        capacities.append(0)
+        costs.append(-cost)
     
-    def add_product_warehouse(self, warehouse: ProductWarehouse):
-        """添加成品库"""
-        self.product_warehouses[warehouse.id] = warehouse
+    flow, total = 0, 0.0
+    while flow < required:
+        distance = [math.inf] * node_count
+        via = [-1] * node_count  # 到达节点的弧
+        queued = [False] * node_count
+        distance[source] = 0.0
+        pending = deque([source])
+        while pending:
+            u = pending.popleft()
+            queued[u] = False
+            for arc in heads[u]:
+                if capacities[arc] > 0 and distance[u] + costs[arc] < distance[targets[arc]] - 1e-12:
+                    v = targets[arc]
+                    distance[v] = distance[u] + costs[arc]
+                    via[v] = arc
+                    if not queued[v]:
+                        queued[v] = True
+                        pending.append(v)
+        if via[sink] < 0:
+            break
+        push = required - flow
+        v = sink
+        while v != source:
+            push = min(push, capacities[via[v]])
+            v = targets[via[v] ^ 1]
+        v = sink
+        while v != source:
+            capacities[via[v]] -= push
+            capacities[via[v] ^ 1] += push
+            v = targets[via[v] ^ 1]
+        flow += push
+        total += push * distance[sink]
+    return flow, total, [capacities[2 * i + 1] for i in range(len(edges))]
+
+
+def frame_load_limits(frame: Frame) -> Tuple[float, float]:
+    """框架的 (载重上限, 容积上限)，容积不限时为无穷大"""
+    return frame.capacity, frame.volume_capacity if frame.volume_capacity > 0 else math.inf
+
+
+def load_size(products: Dict[str, int], catalog: Dict[str, Product]) -> Tuple[float, float]:
+    """一批货物的 (总重量, 总体积)，未登记的产品按 0 计"""
+    weight = volume = 0.0
+    for product_id, quantity in products.items():
+        product = catalog.get(product_id)
+        if product is not None:
+            weight += product.weight * quantity
+            volume += product.volume * quantity
+    return weight, volume
+
+
+def pack_frame_loads(products: Dict[str, int], catalog: Dict[str, Product],
+                     max_weight: float, max_volume: float = math.inf) -> List[Dict[str, int]]:
+    """按重量和体积把订单拆分为多趟框架装载（二维首次适应递减装箱）
+
+    同一产品的件数成批放入：产品按单件占载重或容积上限的较大比例从大到小排列，
+    依次尽量多地放入已开的第一个能装下的框架，剩余件数开新框架。单件超过上限时抛出 ValueError。
+    """
+    def fits(size: float, room: float) -> int:
+        return math.floor((room + 1e-9) / size) if size > 0 and room < math.inf else math.inf
     
-    def add_crane(self, crane: Crane):
-        """添加行车"""
-        self.cranes[crane.id] = crane
+    def footprint(item: Tuple[str, int]) -> float:
+        product = catalog.get(item[0])
+        if product is None:
+            return 0.0
+        return max(product.weight / max_weight if max_weight > 0 else math.inf,
+                   product.volume / max_volume if max_volume > 0 else math.inf)
     
-    def add_frame(self, frame: Frame):
-        """添加框架"""
-        self.frames[frame.id] = frame
+    bins: List[List[Any]] = []  # [剩余载重, 剩余容积, 装载]
+    for product_id, quantity in sorted(products.items(), key=footprint, reverse=True):
+        product = catalog.get(product_id)
+        weight, volume = (product.weight, product.volume) if product is not None else (0.0, 0.0)
+        per_frame = min(fits(weight, max_weight), fits(volume, max_volume))
+        if per_frame < 1:
+            raise ValueError(f"产品 {product_id} 单件超过框架载重或容积上限")
+        for load_bin in bins:
+            if quantity <= 0:
+                break
+            count = min(quantity, fits(weight, load_bin[0]), fits(volume, load_bin[1]))
+            if count > 0:
+                load_bin[0] -= weight * count
+                load_bin[1] -= volume * count
+                load_bin[2][product_id] = load_bin[2].get(product_id, 0) + count
+                quantity -= count
+        while quantity > 0:
+            count = min(quantity, per_frame)
+            bins.append([max_weight - weight * count, max_volume - volume * count, {product_id: count}])
+            quantity -= count
+    return [load_bin[2] for load_bin in bins] or [{}]
+
+
+class SpatialIndex:
+    """网格分桶空间索引
+
+    将坐标按固定边长划分到桶中，最近邻查询从查询点所在的桶开始逐圈向外扩展，
+    当下一圈的最小可能距离已超过当前第 k 近的距离时停止。
+    """
+
+    def __init__(self, grid_size: Tuple[int, int], buckets_per_axis: int = SPATIAL_BUCKETS_PER_AXIS):
+        self.bucket_size = max(1, math.ceil(max(grid_size) / buckets_per_axis))
+        self._buckets: Dict[Tuple[int, int], Dict[str, Position]] = {}
+        self._locations: Dict[str, Tuple[int, int]] = {}
+        self._bounds: Optional[List[int]] = None  # [min_bx, min_by, max_bx, max_by]
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._locations
+
+    def _bucket_of(self, position: Position) -> Tuple[int, int]:
+        return position.x // self.bucket_size, position.y // self.bucket_size
+
+    def insert(self, item_id: str, position: Position):
+        """插入或移动条目"""
+        bucket = self._bucket_of(position)
+        old_bucket = self._locations.get(item_id)
+        if old_bucket is not None and old_bucket != bucket:
+            self._discard(item_id, old_bucket)
+        self._buckets.setdefault(bucket, {})[item_id] = position
+        self._locations[item_id] = bucket
+        if self._bounds is None:
+            self._bounds = [bucket[0], bucket[1], bucket[0], bucket[1]]
+        else:
+            self._bounds[0] = min(self._bounds[0], bucket[0])
+            self._bounds[1] = min(self._bounds[1], bucket[1])
+            self._bounds[2] = max(self._bounds[2], bucket[0])
+            self._bounds[3] = max(self._bounds[3], bucket[1])
+
+    def remove(self, item_id: str):
+        """移除条目（不存在时忽略）"""
+        bucket = self._locations.pop(item_id, None)
+        if bucket is not None:
+            self._discard(item_id, bucket)
+
+    def _discard(self, item_id: str, bucket: Tuple[int, int]):
+        items = self._buckets[bucket]
+        del items[item_id]
+        if not items:
+            del self._buckets[bucket]
+
+    def nearest(self, position: Position, k: int = 1) -> List[str]:
+        """返回距离 position 最近的 k 个条目ID（由近到远）"""
+        if k <= 0 or not self._locations:
+            return []
+        cx, cy = self._bucket_of(position)
+        min_bx, min_by, max_bx, max_by = self._bounds
+        max_ring = max(cx - min_bx, max_bx - cx, cy - min_by, max_by - cy, 0)
+        
+        candidates: List[Tuple[float, str]] = []
+        for ring in range(max_ring + 1):
+            for bucket in self._ring_buckets(cx, cy, ring):
+                for item_id, item_position in self._buckets.get(bucket, {}).items():
+                    candidates.append((position.distance_to(item_position), item_id))
+            if len(candidates) >= k:
+                candidates.sort()
+                del candidates[k:]
+                # 下一圈中的条目距离至少为 ring * bucket_size
+                if candidates[-1][0] <= ring * self.bucket_size:
+                    break
+        candidates.sort()
+        return [item_id for _, item_id in candidates[:k]]
+
+    @staticmethod
+    def _ring_buckets(cx: int, cy: int, ring: int):
+        """以 (cx, cy) 为中心、切比雪夫距离为 ring 的一圈桶"""
+        if ring == 0:
+            yield cx, cy
+            return
+        for bx in range(cx - ring, cx + ring + 1):
+            yield bx, cy - ring
+            yield bx, cy + ring
+        for by in range(cy - ring + 1, cy + ring):
+            yield cx - ring, by
+            yield cx + ring, by
+
+
+Cell = Tuple[int, int]
+
+_SQRT2 = math.sqrt(2)
+_NEIGHBOR_STEPS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+                   (1, 1, _SQRT2), (1, -1, _SQRT2), (-1, 1, _SQRT2), (-1, -1, _SQRT2)]
+
+
+class PathPlanner:
+    """网格路径规划器
+
+    在 grid_size 网格上做八邻域 A* 搜索，被阻挡的格子（如仓库占地）不可穿行，
+    但可以作为起点或终点。地标（仓库、框架停放位）之间的距离和路径用 Dijkstra
+    预先计算成表，其余查询走 LRU 缓存。起点或终点在网格外时退化为直线距离。
+    """
+
+    def __init__(self, grid_size: Tuple[int, int], blocked: Optional[set] = None,
+                 cache_size: int = ROUTE_CACHE_SIZE):
+        self.width, self.height = grid_size
+        self.blocked: set = set(blocked or ())
+        self._table: Dict[Tuple[Cell, Cell], Tuple[float, Tuple[Cell, ...]]] = {}
+        self._cached_search = lru_cache(maxsize=cache_size)(self._search)
+
+    def set_blocked(self, cells):
+        """更新阻挡格子，已有的路径表和缓存全部失效"""
+        self.blocked = set(cells)
+        self._table.clear()
+        self._cached_search.cache_clear()
+
+    def in_grid(self, cell: Cell) -> bool:
+        return 0 <= cell[0] < self.width and 0 <= cell[1] < self.height
+
+    def _neighbors(self, cell: Cell, endpoints):
+        """可达的相邻格子；被阻挡的格子只有属于 endpoints 时才可进入"""
+        x, y = cell
+        for dx, dy, cost in _NEIGHBOR_STEPS:
+            neighbor = (x + dx, y + dy)
+            if not self.in_grid(neighbor) or (neighbor in self.blocked and neighbor not in endpoints):
+                continue
+            # 斜向移动不允许切过被阻挡格子的角
+            if dx and dy and ((x + dx, y) in self.blocked or (x, y + dy) in self.blocked):
+                continue
+            yield neighbor, cost
+
+    @staticmethod
+    def _octile(a: Cell, b: Cell) -> float:
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        return max(dx, dy) + (_SQRT2 - 1) * min(dx, dy)
+
+    @staticmethod
+    def _build_route(came_from: Dict[Cell, Cell], goal: Cell) -> Tuple[Cell, ...]:
+        route = [goal]
+        while route[-1] in came_from:
+            route.append(came_from[route[-1]])
+        route.reverse()
+        return tuple(route)
+
+    def _search(self, start: Cell, goal: Cell) -> Tuple[float, Tuple[Cell, ...]]:
+        """A* 搜索，不可达时返回 (inf, ())"""
+        if start == goal:
+            return 0.0, (start,)
+        if not (self.in_grid(start) and self.in_grid(goal)):
+            return math.hypot(start[0] - goal[0], start[1] - goal[1]), (start, goal)
+        
+        best = {start: 0.0}
+        came_from: Dict[Cell, Cell] = {}
+        queue = [(self._octile(start, goal), 0.0, start)]
+        while queue:
+            _, cost, cell = heapq.heappop(queue)
+            if cell == goal:
+                return cost, self._build_route(came_from, goal)
+            if cost > best[cell]:
+                continue
+            for neighbor, step in self._neighbors(cell, (start, goal)):
+                new_cost = cost + step
+                if new_cost < best.get(neighbor, math.inf):
+                    best[neighbor] = new_cost
+                    came_from[neighbor] = cell
+                    heapq.heappush(queue, (new_cost + self._octile(neighbor, goal), new_cost, neighbor))
+        return math.inf, ()
+
+    def _dijkstra(self, source: Cell, targets: set) -> Dict[Cell, Tuple[float, Tuple[Cell, ...]]]:
+        """单源 Dijkstra，找到全部目标后提前结束"""
+        best = {source: 0.0}
+        came_from: Dict[Cell, Cell] = {}
+        remaining = targets - {source}
+        queue = [(0.0, source)]
+        while queue and remaining:
+            cost, cell = heapq.heappop(queue)
+            if cost > best[cell]:
+                continue
+            remaining.discard(cell)
+            if cell != source and cell in self.blocked:
+                continue  # 阻挡格子只能作为终点
+            for neighbor, step in self._neighbors(cell, targets):
+                new_cost = cost + step
+                if new_cost < best.get(neighbor, math.inf):
+                    best[neighbor] = new_cost
+                    came_from[neighbor] = cell
+                    heapq.heappush(queue, (new_cost, neighbor))
+        return {target: (best[target], self._build_route(came_from, target))
+                for target in targets if target in best}
+
+    def precompute(self, landmarks) -> int:
+        """预计算地标两两之间的距离和路径，返回表项数量"""
+        cells = {cell for cell in landmarks if self.in_grid(cell)}
+        self._table.clear()
+        for source in cells:
+            for target, entry in self._dijkstra(source, cells).items():
+                self._table[(source, target)] = entry
+        return len(self._table)
+
+    def route(self, start: Cell, goal: Cell) -> Tuple[float, Tuple[Cell, ...]]:
+        """查询两格之间的最短距离和路径（优先查表，其次 LRU 缓存）"""
+        entry = self._table.get((start, goal))
+        if entry is None:
+            entry = self._cached_search(start, goal)
+        return entry
+
+    def distance(self, start: Cell, goal: Cell) -> float:
+        return self.route(start, goal)[0]
+
+
+@dataclass(order=True)
+class SimulationEvent:
+    """仿真事件"""
+    time: datetime
+    sequence: int
+    action: Callable[[], None] = field(compare=False)
+    description: str = field(default="", compare=False)
+
+
+class SimulationClock:
+    """离散事件仿真时钟
+
+    时间只在处理事件时推进，事件按 (时间, 序号) 从优先队列中依次取出，
+    同一时刻的事件按调度顺序执行。
+    """
+
+    def __init__(self, start_time: Optional[datetime] = None):
+        self.now = start_time or datetime.now()
+        self._queue: List[SimulationEvent] = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def schedule_at(self, when: datetime, action: Callable[[], None],
+                    description: str = "") -> SimulationEvent:
+        """在指定仿真时间调度事件"""
+        event = SimulationEvent(max(when, self.now), next(self._sequence), action, description)
+        heapq.heappush(self._queue, event)
+        return event
+
+    def schedule(self, delay: float, action: Callable[[], None],
+                 description: str = "") -> SimulationEvent:
+        """在当前仿真时间之后 delay 秒调度事件"""
+        return self.schedule_at(self.now + timedelta(seconds=delay), action, description)
+
+    def step(self) -> bool:
+        """处理下一个事件，队列为空时返回 False"""
+        if not self._queue:
+            return False
+        event = heapq.heappop(self._queue)
+        self.now = event.time
+        event.action()
+        return True
+
+    def run(self, until: Optional[datetime] = None,
+            stop_condition: Optional[Callable[[], bool]] = None) -> int:
+        """运行仿真直到队列为空、到达 until 或满足 stop_condition，返回处理的事件数"""
+        processed = 0
+        while self._queue:
+            if stop_condition is not None and stop_condition():
+                break
+            if until is not None and self._queue[0].time > until:
+                self.now = until
+                break
+            self.step()
+            processed += 1
+        return processed
+
+
+class _IntervalNode:
+    __slots__ = ("start", "end", "order", "value", "priority", "left", "right", "max_end")
     
-    def add_frame_truck(self, truck: FrameTruck):
-        """添加框架车头"""
-        self.frame_trucks[truck.id] = truck
+    def __init__(self, start, end, order: int, value: Any, priority: float):
+        self.start, self.end, self.order, self.value, self.priority = start, end, order, value, priority
+        self.left: Optional['_IntervalNode'] = None
+        self.right: Optional['_IntervalNode'] = None
+        self.max_end = end
     
-    def add_product(self, product: Product):
-        """添加产品"""
-        self.products[product.id] = product
+    def update(self):
+        self.max_end = self.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > self.max_end:
+                self.max_end = child.max_end
+
+
+class IntervalTree:
+    """区间树：按 (起点, 插入序号) 排序的 treap，每个节点记录子树内的最大终点
+
+    插入和删除为期望 O(log n)。按起点顺序遍历终点晚于某时刻的区间时，跳过最大终点不晚于
+    该时刻的整棵子树，因此查询某时刻之后的第一个空档只访问 O(log n + k) 个节点（k 为跨过
+    该时刻到空档之间的区间数）。端点可以是任何可比较、可相减的类型（如 datetime、float）。
+    """
     
-    def add_ship_plan(self, plan: ShipPlan):
-        """添加船运计划"""
-        self.ship_plans[plan.id] = plan
+    def __init__(self, seed: int = 0):
+        self._root: Optional[_IntervalNode] = None
+        self._keys: Dict[Any, Tuple[Any, int]] = {}  # 区间键 -> (起点, 插入序号)
+        self._order = itertools.count()
+        self._random = random.Random(seed)
     
-    def get_resource_status(self) -> Dict[str, Dict[str, ResourceStatus]]:
-        """获取所有资源状态"""
-        return {
-            "terminal_cranes": {crane.id: crane.status for crane in self.cranes.values() 
-                               if any(crane.warehouse_id == tw.id for tw in self.terminal_warehouses.values())},
-            "product_cranes": {crane.id: crane.status for crane in self.cranes.values() 
-                              if any(crane.warehouse_id == pw.id for pw in self.product_warehouses.values())},
-            "frame_trucks": {truck.id: truck.status for truck in self.frame_trucks.values()},
-            "frames": {frame.id: frame.status for frame in self.frames.values()},
-            "storage_positions": {pos_id: "occupied" if pos_id in pw.storage_positions else "available" 
-                                 for pw in self.product_warehouses.values() for pos_id in pw.storage_positions}
-        }
+    def __len__(self) -> int:
+        return len(self._keys)
     
-    def validate_ship_plan(self, plan_id: str) -> bool:
-        """验证船运计划是否有效"""
-        if plan_id not in self.ship_plans:
+    @staticmethod
+    def _split(node: Optional[_IntervalNode], start, order: int):
+        """拆分为排序键小于 (start, order) 和不小于它的两棵树"""
+        if node is None:
+            return None, None
+        if (node.start, node.order) < (start, order):
+            node.right, right = IntervalTree._split(node.right, start, order)
+            node.update()
+            return node, right
+        left, node.left = IntervalTree._split(node.left, start, order)
+        node.update()
+        return left, node
+    
+    @staticmethod
+    def _merge(left: Optional[_IntervalNode], right: Optional[_IntervalNode]) -> Optional[_IntervalNode]:
+        if left is None or right is None:
+            return left or right
+        if left.priority > right.priority:
+            left.right = IntervalTree._merge(left.right, right)
+            left.update()
+            return left
+        right.left = IntervalTree._merge(left, right.left)
+        right.update()
+        return right
+    
+    def add(self, start, end, key: Any):
+        """加入区间 [start, end)，key 在树内唯一，已存在时先删除旧区间"""
+        if not start < end:
+            raise ValueError("区间终点必须晚于起点")
+        self.remove(key)
+        order = next(self._order)
+        node = _IntervalNode(start, end, order, key, self._random.random())
+        left, right = self._split(self._root, start, order)
+        self._root = self._merge(self._merge(left, node), right)
+        self._keys[key] = (start, order)
+    
+    def remove(self, key: Any) -> bool:
+        position = self._keys.pop(key, None)
+        if position is None:
             return False
-        
-        plan = self.ship_plans[plan_id]
-        
-        # 检查末端库是否有足够的产品
-        for product_id, required_qty in plan.products.items():
-            total_available = 0
-            for warehouse in self.terminal_warehouses.values():
-                total_available += warehouse.products.get(product_id, 0)
-            
-            if total_available < required_qty:
-                return False
-        
+        start, order = position
+        left, rest = self._split(self._root, start, order)
+        _, right = self._split(rest, start, order + 1)
+        self._root = self._merge(left, right)
         return True
     
-    def find_available_resources(self) -> Dict[str, List[str]]:
-        """查找可用资源"""
-        available = {
-            "terminal_cranes": [],
-            "product_cranes": [],
-            "frame_trucks": [],
-            "frames": []
-        }
-        
-        for crane in self.cranes.values():
-            if crane.status == ResourceStatus.IDLE:
-                # 判断是末端库还是成品库的行车
-                if any(crane.warehouse_id == tw.id for tw in self.terminal_warehouses.values()):
-                    available["terminal_cranes"].append(crane.id)
-                elif any(crane.warehouse_id == pw.id for pw in self.product_warehouses.values()):
-                    available["product_cranes"].append(crane.id)
-        
-        for truck in self.frame_trucks.values():
-            if truck.status == ResourceStatus.IDLE:
-                available["frame_trucks"].append(truck.id)
-        
-        for frame in self.frames.values():
-            if frame.status == ResourceStatus.IDLE:
-                available["frames"].append(frame.id)
-        
-        return available
+    def iter_from(self, time):
+        """按起点顺序产出终点晚于 time 的区间 (起点, 终点, 键)"""
+        stack: List[_IntervalNode] = []
+        node = self._root
+        while True:
+            while node is not None and node.max_end > time:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.end > time:
+                yield node.start, node.end, node.value
+            node = node.right
     
-    def create_ship_transport_task(self, plan_id: str) -> Optional[Task]:
-        """创建船运发货任务"""
-        if not self.validate_ship_plan(plan_id):
-            self.log_event("ERROR", f"船运计划 {plan_id} 验证失败")
-            return None
-        
-        plan = self.ship_plans[plan_id]
-        available_resources = self.find_available_resources()
-        
-        # 检查是否有足够的资源
-        if (not available_resources["terminal_cranes"] or 
-            not available_resources["frame_trucks"] or 
-            not available_resources["frames"]):
-            self.log_event("ERROR", "没有足够的资源执行船运任务")
+    def overlapping(self, start, end) -> List[Tuple[Any, Any, Any]]:
+        """与 [start, end) 相交的区间"""
+        result = []
+        for interval in self.iter_from(start):
+            if not interval[0] < end:
+                break
+            result.append(interval)
+        return result
+    
+    def first_gap(self, after, duration, before=None):
+        """after 之后第一个长度不小于 duration、不与任何区间相交的空档起点；
+        空档需在 before 之前结束，没有时返回 None"""
+        start = after
+        for interval_start, interval_end, _ in self.iter_from(after):
+            if interval_start - start >= duration:
+                break
+            if interval_end > start:
+                start = interval_end
+            if before is not None and start + duration > before:
+                return None
+        if before is not None and start + duration > before:
             return None
-        
-        # 创建主任务
-        task = Task(
-            id=f"ship_task_{plan_id}",
-            task_type=TaskType.SHIP_TRANSPORT,
-            details={"plan_id": plan_id}
-        )
-        
-        # 分配资源
-        assigned_crane = available_resources["terminal_cranes"][0]
-        assigned_truck = available_resources["frame_trucks"][0]
-        assigned_frame = available_resources["frames"][0]
-        
-        # 创建子任务
-        # 1. 框架车头拉框
-        pull_task = SubTask(
-            id=f"pull_{task.id}",
-            task_type=SubTaskType.FRAME_PULLING,
-            assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
-            details={"source_pos": self.frames[assigned_frame].position, 
-                    "target_pos": self.frame_trucks[assigned_truck].position}
-        )
-        
-        # 2. (新增) 运输到末端库
-        transport_to_terminal_task = SubTask(
-            id=f"transport_to_terminal_{task.id}",
-            task_type=SubTaskType.TRANSPORT,
-            assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
-            details={"source_position": self.frames[assigned_frame].position.__dict__, "target_position": self.terminal_warehouses[assigned_crane].position.__dict__}
-        )
-        
-        # 3. 末端库装货
-        loading_task = SubTask(
-            id=f"load_{task.id}",
-            task_type=SubTaskType.TERMINAL_LOADING,
-            assigned_resources={"crane": assigned_crane, "frame": assigned_frame},
-            details={"source_warehouse_id": assigned_crane, "products": plan.products}
-        )
-        
-        # 4. 运输到成品库
-        transport_to_product_task = SubTask(
-            id=f"transport_to_product_{task.id}",
-            task_type=SubTaskType.TRANSPORT,
-            assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
-            details={"source_position": self.terminal_warehouses[assigned_crane].position.__dict__, "target_position": self.product_warehouses[assigned_crane].position.__dict__}
-        )
-        
-        # 5. 成品库卸货
-        unloading_task = SubTask(
-            id=f"unload_{task.id}",
-            task_type=SubTaskType.PRODUCT_UNLOADING,
-            assigned_resources={"crane": assigned_crane, "frame": assigned_frame},
-            details={"target_warehouse_id": assigned_crane}
-        )
-        
-        # 6. 空框架定位
-        frame_parking_pos = self._find_parking_position(assigned_frame)
-        positioning_task = SubTask(
-            id=f"position_{task.id}",
-            task_type=SubTaskType.FRAME_POSITIONING,
-            assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
-            details={"target_position": frame_parking_pos.__dict__}
-        )
-        
-        task.sub_tasks = [pull_task, transport_to_terminal_task, loading_task, transport_to_product_task, unloading_task, positioning_task]
-        self.tasks[task.id] = task
-        
-        self.log_event("INFO", f"创建船运任务 {task.id}，分配资源：行车{assigned_crane}, 车头{assigned_truck}, 框架{assigned_frame}")
-        
-        return task
+        return start
+
+
+@dataclass(frozen=True)
+class Reservation:
+    """资源预约：资源在 [start, end) 内由 owner（通常为任务ID）占用"""
+    resource_type: str  # 与子任务 assigned_resources 的键一致："crane"、"frame"、"frame_truck"
+    resource_id: str
+    start: datetime
+    end: datetime
+    owner: str
+
+
+class ReservationCalendar:
+    """按资源划分的预约日历，每个资源一棵区间树，同一资源的预约互不重叠"""
     
-    def create_internal_transfer_task(self, source_warehouse_id: str, 
-                                    target_warehouse_id: str, 
-                                    products: Dict[str, int]) -> Optional[Task]:
-        """创建内转任务"""
-        self.log_event("INFO", f"创建内转任务: 从 {source_warehouse_id} 到 {target_warehouse_id}")
+    def __init__(self):
+        self._trees: Dict[Tuple[str, str], IntervalTree] = {}
+        self._by_owner: Dict[str, List[Reservation]] = {}
+    
+    def __len__(self) -> int:
+        return sum(len(tree) for tree in self._trees.values())
+    
+    def reserve(self, resource_type: str, resource_id: str, start: datetime, end: datetime,
+                owner: str) -> Reservation:
+        """登记预约，与已有预约冲突时抛出 ValueError"""
+        tree = self._trees.setdefault((resource_type, resource_id), IntervalTree())
+        conflicts = tree.overlapping(start, end)
+        if conflicts:
+            raise ValueError(f"资源 {resource_type}:{resource_id} 在 {start} ~ {end} 已被 {conflicts[0][2].owner} 预约")
+        reservation = Reservation(resource_type, resource_id, start, end, owner)
+        tree.add(start, end, reservation)
+        self._by_owner.setdefault(owner, []).append(reservation)
+        return reservation
+    
+    def cancel(self, owner: str) -> int:
+        """取消 owner 的全部预约，返回取消的条数"""
+        reservations = self._by_owner.pop(owner, [])
+        for reservation in reservations:
+            tree = self._trees[(reservation.resource_type, reservation.resource_id)]
+            tree.remove(reservation)
+            if not len(tree):
+                del self._trees[(reservation.resource_type, reservation.resource_id)]
+        return len(reservations)
+    
+    def owner_reservations(self, owner: str) -> List[Reservation]:
+        return list(self._by_owner.get(owner, []))
+    
+    def reservations(self, resource_type: str, resource_id: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> List[Reservation]:
+        """资源在 [start, end) 内的预约，按开始时间排序"""
+        tree = self._trees.get((resource_type, resource_id))
+        if tree is None:
+            return []
+        result = []
+        for interval_start, _, reservation in tree.iter_from(start or datetime.min):
+            if end is not None and not interval_start < end:
+                break
+            result.append(reservation)
+        return result
+    
+    def is_free(self, resource_type: str, resource_id: str, start: datetime, end: datetime) -> bool:
+        tree = self._trees.get((resource_type, resource_id))
+        return tree is None or not tree.overlapping(start, end)
+    
+    def first_free(self, resource_type: str, resource_id: str, after: datetime, duration: timedelta,
+                   before: Optional[datetime] = None) -> Optional[datetime]:
+        """资源在 after 之后第一个长度为 duration 的空闲时段的开始时间"""
+        tree = self._trees.get((resource_type, resource_id))
+        if tree is None:
+            return after if before is None or after + duration <= before else None
+        return tree.first_gap(after, duration, before)
+    
+    def first_window(self, resource_type: str, resource_ids: List[str], after: datetime, duration: timedelta,
+                     before: Optional[datetime] = None) -> Optional[Tuple[datetime, str]]:
+        """若干同类资源中最早出现长度为 duration 的空闲时段：返回 (开始时间, 资源ID)"""
+        best = None
+        for resource_id in resource_ids:
+            bound = before
+            if best is not None:
+                # 只需找比当前最早时段更早开始的空档
+                bound = best[0] + duration if before is None else min(before, best[0] + duration)
+            start = self.first_free(resource_type, resource_id, after, duration, bound)
+            if start is not None and (best is None or start < best[0]):
+                best = (start, resource_id)
+                if start == after:
+                    break
+        return best
 
-        # 创建主任务
-        task = Task(
-            id=f"internal_{source_warehouse_id}_{target_warehouse_id}",
-            task_type=TaskType.INTERNAL_TRANSFER,
-            details={
-                'source_warehouse_id': source_warehouse_id,
-                'target_warehouse_id': target_warehouse_id,
-                'products': products
-            }
-        )
 
-        # 分配资源
-        source_warehouse = self.terminal_warehouses.get(source_warehouse_id)
-        target_warehouse = self.product_warehouses.get(target_warehouse_id)
-        
-        # 假设每个仓库有且仅有一个关联的行车
-        source_crane = next((c for c in self.cranes.values() if c.warehouse_id == source_warehouse_id), None)
-        target_crane = next((c for c in self.cranes.values() if c.warehouse_id == target_warehouse_id), None)
+def _task_deadline(system: 'LogisticsSystem', task: Task) -> datetime:
+    """任务截止时间，未关联船运计划的任务视为无截止时间"""
+    plan = system.ship_plans.get(task.details.get("plan_id", ""))
+    return plan.deadline if plan else datetime.max
 
-        if not all([source_warehouse, target_warehouse, source_crane, target_crane]):
-            self.log_event("ERROR", "创建内转任务失败: 找不到仓库或关联的行车")
+
+def _task_priority(system: 'LogisticsSystem', task: Task) -> int:
+    plan = system.ship_plans.get(task.details.get("plan_id", ""))
+    return plan.priority if plan else DEFAULT_TASK_PRIORITY
+
+
+def edf_policy(system: 'LogisticsSystem', task: Task) -> tuple:
+    """最早截止时间优先（EDF），截止时间相同时按计划优先级"""
+    return (_task_deadline(system, task), _task_priority(system, task))
+
+
+def weighted_slack_policy(system: 'LogisticsSystem', task: Task) -> tuple:
+    """加权松弛优先：最晚开工时间（截止时间减去预计耗时）乘以优先级数值"""
+    deadline = _task_deadline(system, task)
+    if deadline == datetime.max:
+        return (math.inf,)
+    duration = sum(system.estimate_sub_task_duration(sub_task) for sub_task in task.sub_tasks)
+    slack = (deadline - system.clock.now).total_seconds() - duration
+    # 优先级数值越大，正松弛被放大、负松弛被缩小，排序越靠后
+    weight = max(_task_priority(system, task), 1)
+    return (slack * weight if slack > 0 else slack / weight,)
+
+
+def priority_class_policy(system: 'LogisticsSystem', task: Task) -> tuple:
+    """优先级分级：船运任务优先于内转任务，同类按计划优先级，再按截止时间"""
+    task_class = 1 if task.task_type == TaskType.SHIP_TRANSPORT else 2
+    return (task_class, _task_priority(system, task), _task_deadline(system, task))
+
+
+SCHEDULING_POLICIES: Dict[str, Callable[['LogisticsSystem', Task], tuple]] = {
+    "edf": edf_policy,
+    "weighted_slack": weighted_slack_policy,
+    "priority_class": priority_class_policy,
+}
+
+
+class TaskQueue:
+    """待执行任务的索引堆
+
+    堆中每项为 (策略键, 入队序号, 任务ID)，并记录任务ID在堆中的下标，因此插入、
+    弹出和删除都是 O(log n)，截止时间或优先级变化时可以原地调整位置。
+    """
+
+    def __init__(self, system: 'LogisticsSystem',
+                 policy: Callable[['LogisticsSystem', Task], tuple] = priority_class_policy):
+        self.system = system
+        self.policy = policy
+        self._heap: List[Tuple[tuple, int, str]] = []
+        self._index: Dict[str, int] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._index
+
+    def _key(self, task_id: str) -> tuple:
+        return self.policy(self.system, self.system.tasks[task_id])
+
+    def push(self, task_id: str):
+        """加入任务，已在队列中时按新键调整位置"""
+        if task_id in self._index:
+            self.update(task_id)
+            return
+        self._heap.append((self._key(task_id), next(self._sequence), task_id))
+        self._index[task_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def peek(self) -> Optional[str]:
+        return self._heap[0][2] if self._heap else None
+
+    def pop(self) -> Optional[str]:
+        """弹出最优先的任务ID"""
+        if not self._heap:
+            return None
+        task_id = self._heap[0][2]
+        self.remove(task_id)
+        return task_id
+
+    def remove(self, task_id: str) -> bool:
+        """删除任务（不存在时返回 False）"""
+        position = self._index.pop(task_id, None)
+        if position is None:
+            return False
+        last = self._heap.pop()
+        if position < len(self._heap):
+            self._heap[position] = last
+            self._index[last[2]] = position
+            self._sift_down(position)
+            self._sift_up(position)
+        return True
+
+    def update(self, task_id: str) -> bool:
+        """重新计算任务的策略键并原地调整位置"""
+        position = self._index.get(task_id)
+        if position is None:
+            return False
+        _, sequence, _ = self._heap[position]
+        self._heap[position] = (self._key(task_id), sequence, task_id)
+        self._sift_down(position)
+        self._sift_up(position)
+        return True
+
+    def set_policy(self, policy: Callable[['LogisticsSystem', Task], tuple]):
+        """切换调度策略并以 O(n) 重建堆"""
+        self.policy = policy
+        self._heap = [(self._key(task_id), sequence, task_id) for _, sequence, task_id in self._heap]
+        heapq.heapify(self._heap)
+        self._index = {entry[2]: position for position, entry in enumerate(self._heap)}
+
+    def ordered(self) -> List[str]:
+        """按优先顺序返回全部任务ID（不修改队列）"""
+        return [entry[2] for entry in sorted(self._heap)]
+
+    def _swap(self, i: int, j: int):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._index[heap[i][2]] = i
+        self._index[heap[j][2]] = j
+
+    def _sift_up(self, position: int):
+        while position > 0:
+            parent = (position - 1) // 2
+            if self._heap[position] >= self._heap[parent]:
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position: int):
+        size = len(self._heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self._heap[child] < self._heap[smallest]:
+                    smallest = child
+            if smallest == position:
+                return
+            self._swap(position, smallest)
+            position = smallest
+
+
+class EventLog:
+    """有界的异步结构化事件日志
+
+    低于 level 的事件在构造记录前即被丢弃。记录保存在固定容量的环形缓冲区中供状态
+    查询使用；需要输出到控制台或文件时，记录交给后台线程批量写出，文件按 JSON Lines
+    格式写入并按大小轮转。待写队列有界，写出跟不上时丢弃新记录并计入
+    logistics_log_records_dropped_total；写出出错时报告到 stderr 并继续处理后续批次。
+    """
+
+    def __init__(self, level: str = "INFO", capacity: int = LOG_BUFFER_SIZE,
+                 sink_path: Optional[str] = None, echo: bool = True,
+                 max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT,
+                 queue_size: int = LOG_QUEUE_SIZE):
+        self.level = LOG_LEVELS[level]
+        self.records: deque = deque(maxlen=capacity)
+        self.sink_path = sink_path
+        self.echo = echo
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._exit_hook_registered = False
+        self._file = None
+
+    def enabled(self, level: str) -> bool:
+        return LOG_LEVELS.get(level, 0) >= self.level
+
+    def emit(self, level: str, message: str, args: tuple = (), **fields) -> Optional[Dict[str, Any]]:
+        """记录事件，message 中的 % 占位符在通过级别过滤后才格式化"""
+        if not self.enabled(level):
+            return None
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "level": level,
+            "message": message % args if args else message
+        }
+        if fields:
+            record.update(fields)
+        self.records.append(record)
+        if self.echo or self.sink_path:
+            self._ensure_writer()
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                LOG_RECORDS_DROPPED.inc()
+        return record
+
+    def recent(self, count: int = 10) -> List[Dict[str, Any]]:
+        """最近 count 条日志（由旧到新）"""
+        if count <= 0:
+            return []
+        return list(itertools.islice(self.records, max(len(self.records) - count, 0), None))
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="event-log-writer", daemon=True)
+                self._writer.start()
+                if not self._exit_hook_registered:
+                    atexit.register(self.flush)
+                    self._exit_hook_registered = True
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            try:
+                self._write_batch(records)
+            except Exception as e:
+                # 写线程退出后队列会被填满、flush 永远等不到，因此只报告错误并丢弃这一批
+                LOG_WRITE_ERRORS.inc()
+                sys.stderr.write(f"事件日志写出失败，丢弃 {len(records)} 条记录: {e!r}\n")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                self._close_file()
+                return
+
+    def _write_batch(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        if self.echo:
+            sys.stdout.write("".join(f"[{record['level']}] {record['message']}\n" for record in records))
+            sys.stdout.flush()
+        if self.sink_path:
+            data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+            data = data.encode("utf-8")
+            if self._file is None:
+                self._file = open(self.sink_path, "ab")
+            if self._file.tell() and self._file.tell() + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+
+    def _rotate(self):
+        """轮转日志文件：path -> path.1 -> path.2 ..."""
+        self._close_file()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.sink_path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.sink_path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.sink_path, f"{self.sink_path}.1")
+        else:
+            os.remove(self.sink_path)
+        self._file = open(self.sink_path, "ab")
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def flush(self):
+        """等待后台线程写完已提交的日志"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """写完剩余日志并停止后台线程；之后再记录日志会重新启动后台线程"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._writer = None
+        self._close_file()
+        if self._exit_hook_registered:
+            atexit.unregister(self.flush)
+            self._exit_hook_registered = False
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class LatencyHistogram:
+    """HDR 风格的延迟直方图（单位：秒）
+
+    桶按 2 倍区间划分，每个区间再线性分为 HISTOGRAM_SUB_BUCKETS 个子桶，因此任意量级
+    的延迟都保持相同的相对精度；记录一次只需 frexp 计算桶下标和一次加锁计数。
+    覆盖范围为 min_seconds ~ min_seconds * 2 ** octaves，超出部分计入溢出桶。
+    """
+
+    def __init__(self, min_seconds: float = HISTOGRAM_MIN_SECONDS, octaves: int = HISTOGRAM_OCTAVES):
+        self.min_seconds = min_seconds
+        self.bounds: List[float] = [min_seconds * 2 ** octave * (1 + (sub + 1) / HISTOGRAM_SUB_BUCKETS)
+                                    for octave in range(octaves) for sub in range(HISTOGRAM_SUB_BUCKETS)]
+        self.counts = [0] * (len(self.bounds) + 1)  # 最后一个为溢出桶
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.min_seconds:
+            return 0
+        # seconds / 最小值 = (1 + fraction) * 2 ** octave；恰好为 2 的幂时落入前一区间的最后一个子桶
+        mantissa, exponent = math.frexp(seconds / self.min_seconds)
+        index = (exponent - 1) * HISTOGRAM_SUB_BUCKETS + math.ceil((mantissa * 2 - 1) * HISTOGRAM_SUB_BUCKETS) - 1
+        return min(index, len(self.bounds))
+
+    def observe(self, seconds: float):
+        index = self._bucket(seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数"""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if count == 0:
+            return 0.0
+        rank = max(1, math.ceil(count * q))
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else math.inf
+        return math.inf
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = ['%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+             for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_metric_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """计数器、延迟直方图和仪表盘指标的注册表，按 Prometheus 文本格式输出
+
+    计数器和直方图按 (指标名, 标签) 在首次使用时创建并一直保留；仪表盘指标在输出时
+    调用已注册的来源函数实时计算，来源函数返回 (指标名, 说明, 标签字典, 数值) 序列。
+    """
+
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, str, Dict[Tuple[Tuple[str, str], ...], Any]]] = {}
+        self._gauge_sources: List[Callable[[], Any]] = []
+        self._lock = threading.Lock()
+
+    def _metric(self, kind: str, name: str, help_text: str, labels: Dict[str, Any], factory):
+        key = tuple(sorted((label, str(value)) for label, value in labels.items()))
+        family = self._families.get(name)
+        if family is None or key not in family[2]:
+            with self._lock:
+                family = self._families.setdefault(name, (kind, help_text, {}))
+                family[2].setdefault(key, factory())
+        return family[2][key]
+
+    def counter(self, name: str, help_text: str, **labels) -> Counter:
+        return self._metric("counter", name, help_text, labels, Counter)
+
+    def histogram(self, name: str, help_text: str, min_seconds: float = HISTOGRAM_MIN_SECONDS,
+                  octaves: int = HISTOGRAM_OCTAVES, **labels) -> LatencyHistogram:
+        """同一指标名下的各组标签应使用相同的桶范围"""
+        return self._metric("histogram", name, help_text, labels, lambda: LatencyHistogram(min_seconds, octaves))
+
+    def add_gauge_source(self, source: Callable[[], Any]):
+        self._gauge_sources.append(source)
+
+    def remove_gauge_source(self, source: Callable[[], Any]):
+        if source in self._gauge_sources:
+            self._gauge_sources.remove(source)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.items()))
+                        for name, (kind, help_text, metrics) in sorted(self._families.items())]
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if kind == "counter":
+                    lines.append(f"{name}{_label_text(labels)} {_format_metric_value(metric.value)}")
+                    continue
+                with metric._lock:
+                    counts, total, count = list(metric.counts), metric.total, metric.count
+                cumulative = 0
+                for bound, bucket_count in zip(metric.bounds, counts):
+                    cumulative += bucket_count
+                    lines.append("%s_bucket%s %d" % (name, _label_text(labels, 'le="%.9g"' % bound), cumulative))
+                lines.append("%s_bucket%s %d" % (name, _label_text(labels, 'le="+Inf"'), count))
+                lines.append(f"{name}_sum{_label_text(labels)} {_format_metric_value(total)}")
+                lines.append(f"{name}_count{_label_text(labels)} {count}")
+
+        gauges: Dict[str, Tuple[str, List[Tuple[Dict[str, Any], float]]]] = {}
+        for source in list(self._gauge_sources):
+            for name, help_text, labels, value in source():
+                gauges.setdefault(name, (help_text, []))[1].append((labels, value))
+        for name, (help_text, samples) in sorted(gauges.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                label_key = tuple(sorted((label, str(v)) for label, v in labels.items()))
+                lines.append(f"{name}{_label_text(label_key)} {_format_metric_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()  # 进程内共享的指标注册表，系统重置后计数继续累计
+LOG_RECORDS_DROPPED = METRICS.counter("logistics_log_records_dropped_total", "写出队列已满时丢弃的事件日志条数")
+LOG_WRITE_ERRORS = METRICS.counter("logistics_log_write_errors_total", "事件日志写出失败的批次数")
+
+
+def timed_phase(phase: str):
+    """装饰器：把方法的耗时记录到 logistics_phase_duration_seconds{phase=...}"""
+    histogram = METRICS.histogram("logistics_phase_duration_seconds", "调度各阶段的耗时（秒）", phase=phase)
+
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+# 预先创建热点路径上的指标，避免每次按标签查找
+TASK_CREATION_FAILURES = {reason: METRICS.counter("logistics_task_creation_failures_total", "任务创建失败次数",
+                                                  reason=reason)
+                          for reason in ("plan_invalid", "insufficient_resources", "warehouse_or_crane_missing",
+                                                 "oversized_item", "no_slot")}
+TASKS_CREATED = {task_type: METRICS.counter("logistics_tasks_created_total", "创建的任务数",
+                                            type=task_type.name.lower())
+                 for task_type in TaskType}
+TASKS_FINISHED = {success: METRICS.counter("logistics_tasks_finished_total", "结束的任务数",
+                                           result="success" if success else "failure")
+                  for success in (True, False)}
+SUB_TASK_SIMULATED_DURATIONS = {sub_type: METRICS.histogram("logistics_sub_task_simulated_seconds",
+                                                            "子任务的仿真耗时（秒）",
+                                                            min_seconds=SIMULATED_HISTOGRAM_MIN_SECONDS,
+                                                            octaves=SIMULATED_HISTOGRAM_OCTAVES,
+                                                            type=sub_type.name.lower())
+                                for sub_type in SubTaskType}
+STATUS_BUILD_DURATION = METRICS.histogram("logistics_phase_duration_seconds", "调度各阶段的耗时（秒）",
+                                          phase="status_build")
+
+
+_TASK_TYPES = list(TaskType)
+_SUB_TASK_TYPES = list(SubTaskType)
+_STATUSES = list(ResourceStatus)
+_TASK_TYPE_CODES = {member: code for code, member in enumerate(_TASK_TYPES)}
+_SUB_TASK_TYPE_CODES = {member: code for code, member in enumerate(_SUB_TASK_TYPES)}
+_STATUS_CODES = {member: code for code, member in enumerate(_STATUSES)}
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    return value.timestamp() if value is not None else math.nan
+
+
+def _from_timestamp(value: float) -> Optional[datetime]:
+    return None if math.isnan(value) else datetime.fromtimestamp(value)
+
+
+def task_to_dict(task: Task) -> Dict[str, Any]:
+    """任务的 API 表示（与归档记录格式一致）"""
+    return {
+        "id": task.id,
+        "type": task.task_type.value,
+        "status": task.status.value,
+        "plan_id": task.details.get("plan_id"),
+        "start_time": task.start_time.isoformat() if task.start_time else None,
+        "end_time": task.end_time.isoformat() if task.end_time else None,
+        "sub_tasks": [{"id": st.id, "type": st.task_type.value, "status": st.status.value}
+                      for st in task.sub_tasks]
+    }
+
+
+def resource_to_dict(entity: Any) -> Dict[str, Any]:
+    """仓库、设备或产品的 API 表示"""
+    if isinstance(entity, Product):
+        return {"id": entity.id, "name": entity.name, "weight": entity.weight, "volume": entity.volume}
+    record = {"id": entity.id, "name": entity.name,
+              "position": {"x": entity.position.x, "y": entity.position.y}}
+    if isinstance(entity, Warehouse):
+        record["products"] = dict(entity.products)
+        return record
+    record["status"] = entity.status.value
+    if isinstance(entity, Crane):
+        record["warehouse_id"] = entity.warehouse_id
+    elif isinstance(entity, Frame):
+        record["capacity"] = entity.capacity
+        record["volume_capacity"] = entity.volume_capacity
+    elif isinstance(entity, FrameTruck):
+        record["attached_frame_id"] = entity.attached_frame_id
+    return record
+
+
+def _task_warehouses(task: Task) -> List[str]:
+    """任务涉及的仓库ID"""
+    warehouse_ids = []
+    for details in itertools.chain((task.details,), (sub_task.details for sub_task in task.sub_tasks)):
+        for key in ("source_warehouse_id", "target_warehouse_id"):
+            warehouse_id = details.get(key)
+            if warehouse_id and warehouse_id not in warehouse_ids:
+                warehouse_ids.append(warehouse_id)
+    return warehouse_ids
+
+
+def _json_value(value: Any) -> Any:
+    """把资源字段值转换为可 JSON 序列化的形式"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Position):
+        return {"x": value.x, "y": value.y}
+    return value
+
+
+class TaskArchive:
+    """已完成任务的列式归档
+
+    每个字段按列存放：类型和状态为 1 字节枚举编码，时间为 8 字节时间戳，子任务
+    按任务顺序连续存放并用偏移量关联。超过 max_tasks 时丢弃最早的 10% 任务，
+    因此长时间运行时内存占用有上限。
+    """
+
+    def __init__(self, max_tasks: int = ARCHIVE_MAX_TASKS):
+        self.max_tasks = max_tasks
+        self.task_ids: List[str] = []
+        self.plan_ids: List[str] = []
+        self.task_types = array.array("b")
+        self.statuses = array.array("b")
+        self.start_times = array.array("d")
+        self.end_times = array.array("d")
+        self.sub_task_offsets = array.array("q")  # 每个任务第一个子任务在子任务列中的位置
+        self.sub_task_ids: List[str] = []
+        self.sub_task_types = array.array("b")
+        self.sub_task_statuses = array.array("b")
+        self.sub_task_start_times = array.array("d")
+        self.sub_task_end_times = array.array("d")
+        self._rows: Dict[str, int] = {}
+        self._base = 0  # 已丢弃的任务数，用于把全局行号换算为列下标
+
+    def __len__(self) -> int:
+        return len(self.task_ids)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._rows
+
+    def append(self, task: Task) -> List[str]:
+        """归档任务，返回因超出容量被丢弃的任务ID"""
+        if task.id in self._rows:
+            return []
+        self._rows[task.id] = self._base + len(self.task_ids)
+        self.task_ids.append(task.id)
+        self.plan_ids.append(sys.intern(task.details.get("plan_id", "")))
+        self.task_types.append(_TASK_TYPE_CODES[task.task_type])
+        self.statuses.append(_STATUS_CODES[task.status])
+        self.start_times.append(_timestamp(task.start_time))
+        self.end_times.append(_timestamp(task.end_time))
+        self.sub_task_offsets.append(len(self.sub_task_ids))
+        for sub_task in task.sub_tasks:
+            self.sub_task_ids.append(sub_task.id)
+            self.sub_task_types.append(_SUB_TASK_TYPE_CODES[sub_task.task_type])
+            self.sub_task_statuses.append(_STATUS_CODES[sub_task.status])
+            self.sub_task_start_times.append(_timestamp(sub_task.start_time))
+            self.sub_task_end_times.append(_timestamp(sub_task.end_time))
+        if len(self.task_ids) > self.max_tasks:
+            return self._trim(max(1, self.max_tasks // 10))
+        return []
+
+    def _trim(self, count: int) -> List[str]:
+        """丢弃最早归档的 count 个任务"""
+        sub_count = self.sub_task_offsets[count] if count < len(self.task_ids) else len(self.sub_task_ids)
+        dropped = self.task_ids[:count]
+        for task_id in dropped:
+            del self._rows[task_id]
+        for column in (self.task_ids, self.plan_ids, self.task_types, self.statuses,
+                       self.start_times, self.end_times, self.sub_task_offsets):
+            del column[:count]
+        for column in (self.sub_task_ids, self.sub_task_types, self.sub_task_statuses,
+                       self.sub_task_start_times, self.sub_task_end_times):
+            del column[:sub_count]
+        self.sub_task_offsets = array.array("q", (offset - sub_count for offset in self.sub_task_offsets))
+        self._base += count
+        return dropped
+
+    def _row_dict(self, row: int) -> Dict[str, Any]:
+        start = self.sub_task_offsets[row]
+        end = self.sub_task_offsets[row + 1] if row + 1 < len(self.task_ids) else len(self.sub_task_ids)
+        start_time = _from_timestamp(self.start_times[row])
+        end_time = _from_timestamp(self.end_times[row])
+        return {
+            "id": self.task_ids[row],
+            "type": _TASK_TYPES[self.task_types[row]].value,
+            "status": _STATUSES[self.statuses[row]].value,
+            "plan_id": self.plan_ids[row] or None,
+            "start_time": start_time.isoformat() if start_time else None,
+            "end_time": end_time.isoformat() if end_time else None,
+            "sub_tasks": [{"id": self.sub_task_ids[i],
+                           "type": _SUB_TASK_TYPES[self.sub_task_types[i]].value,
+                           "status": _STATUSES[self.sub_task_statuses[i]].value}
+                          for i in range(start, end)]
+        }
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """按任务ID查询归档记录"""
+        row = self._rows.get(task_id)
+        return self._row_dict(row - self._base) if row is not None else None
+
+    def records(self):
+        """按归档顺序遍历全部记录"""
+        for row in range(len(self.task_ids)):
+            yield self._row_dict(row)
+
+
+class TaskIndex:
+    """任务的创建顺序索引，以及按任务类型、涉及仓库、状态和执行时段的二级索引
+
+    任务序号按创建顺序递增，作为分页游标；类型、仓库和状态索引是递增的序号列表，可从
+    任意游标二分定位。空闲是绝大多数任务（待执行和已完成）的状态，只为其余状态建索引。
+    执行时段索引把已结束的任务登记到与其 [开始, 结束] 相交的每个时间桶，已开始未结束的
+    任务单独登记；时间桶中可能残留任务重新执行前的旧时段，查询时在任务记录上再次过滤。
+    被删除的任务留空位，空位集中在开头时整体丢弃，内存占用随归档上限有界。
+    类型和仓库索引只追加，状态索引和未结束任务表修改时以新对象替换，丢弃开头时各索引
+    也以新对象替换，因此 view() 取得的只读视图不受后续修改影响（时间桶只会多出候选任务）。
+    """
+
+    def __init__(self):
+        self.order: List[Optional[str]] = []  # order[序号 - base] 为任务ID，已删除为 None
+        self.base = 0
+        self.seq: Dict[str, int] = {}
+        self.by_type: Dict[TaskType, List[int]] = {}
+        self.by_warehouse: Dict[str, List[int]] = {}
+        self.by_status: Dict[ResourceStatus, List[int]] = {}  # 非空闲状态 -> 序号列表
+        self.time_buckets: Dict[int, List[int]] = {}  # 时间桶 -> 执行时段与之相交的已结束任务序号
+        self.bucket_range: Tuple[int, int] = (0, -1)  # 已登记的最早和最晚时间桶
+        self.running: Dict[int, float] = {}  # 已开始未结束的任务序号 -> 开始时间戳
+        self._states: Dict[str, Tuple[ResourceStatus, float, float]] = {}  # 已登记的 (状态, 开始, 结束)
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self.seq)
+
+    def add(self, task: Task):
+        if task.id in self.seq:
+            return
+        seq = self.base + len(self.order)
+        self.order.append(task.id)
+        self.seq[task.id] = seq
+        self.by_type.setdefault(task.task_type, []).append(seq)
+        for warehouse_id in _task_warehouses(task):
+            self.by_warehouse.setdefault(warehouse_id, []).append(seq)
+        self.update(task)
+
+    @staticmethod
+    def _bucket(timestamp: float) -> int:
+        return int(timestamp // TASK_TIME_BUCKET_SECONDS)
+
+    def update(self, task: Task):
+        """登记任务状态和执行时段的变化"""
+        seq = self.seq.get(task.id)
+        if seq is None:
+            return
+        state = (task.status, _timestamp(task.start_time), _timestamp(task.end_time))
+        old_status, old_start, old_end = self._states.get(task.id, (ResourceStatus.IDLE, math.nan, math.nan))
+        self._states[task.id] = state
+        status, start, end = state
+        if status != old_status:
+            self._set_status(seq, old_status, status)
+        if (start, end) == (old_start, old_end) or (math.isnan(start) and math.isnan(old_start)
+                                                    and math.isnan(end) and math.isnan(old_end)):
+            return
+        running = not math.isnan(start) and math.isnan(end)
+        if running or seq in self.running:
+            self.running = dict(self.running)
+            if running:
+                self.running[seq] = start
+            else:
+                del self.running[seq]
+        if not math.isnan(start) and not math.isnan(end):
+            first, last = self._bucket(start), self._bucket(max(start, end))
+            for bucket in range(first, last + 1):
+                self.time_buckets.setdefault(bucket, []).append(seq)
+            low, high = self.bucket_range
+            self.bucket_range = (first, last) if low > high else (min(low, first), max(high, last))
+
+    def _set_status(self, seq: int, old_status: Optional[ResourceStatus], status: Optional[ResourceStatus]):
+        """把序号从旧状态的索引移到新状态的索引（空闲状态不建索引）"""
+        if old_status is not None and old_status != ResourceStatus.IDLE:
+            members = self.by_status.get(old_status, [])
+            position = bisect_left(members, seq)
+            if position < len(members) and members[position] == seq:
+                self.by_status[old_status] = members[:position] + members[position + 1:]
+        if status is not None and status != ResourceStatus.IDLE:
+            members = self.by_status.get(status, [])
+            position = bisect_left(members, seq)
+            self.by_status[status] = members[:position] + [seq] + members[position:]
+
+    def non_idle(self):
+        """遍历状态不是空闲的任务 (任务ID, 状态)"""
+        for status, members in self.by_status.items():
+            for seq in members:
+                yield self.order[seq - self.base], status
+
+    def remove(self, task_id: str):
+        seq = self.seq.pop(task_id, None)
+        if seq is None:
+            return
+        self.order[seq - self.base] = None
+        status = self._states.pop(task_id, (None,))[0]
+        self._set_status(seq, status, None)
+        if seq in self.running:
+            self.running = {key: value for key, value in self.running.items() if key != seq}
+        self._removed += 1
+        if self._removed > len(self.order) // 2:
+            self._compact()
+
+    def _compact(self):
+        """丢弃开头的空位"""
+        count = 0
+        while count < len(self.order) and self.order[count] is None:
+            count += 1
+        if not count:
+            return
+        self.order = self.order[count:]
+        self._removed -= count
+        self.base += count
+        for indexes in (self.by_type, self.by_warehouse, self.by_status):
+            for key, index in indexes.items():
+                indexes[key] = index[bisect_left(index, self.base):]
+        time_buckets = {}
+        for bucket, index in self.time_buckets.items():
+            index = [seq for seq in index if seq >= self.base]
+            if index:
+                time_buckets[bucket] = index
+        self.time_buckets = time_buckets
+        self.bucket_range = (min(time_buckets), max(time_buckets)) if time_buckets else (0, -1)
+
+    def view(self) -> 'TaskIndexView':
+        """当前索引的只读视图"""
+        return TaskIndexView(self.order, self.base, len(self.order),
+                             {key: (index, len(index)) for key, index in self.by_type.items()},
+                             {key: (index, len(index)) for key, index in self.by_warehouse.items()},
+                             {key: (index, len(index)) for key, index in self.by_status.items()},
+                             self.time_buckets, self.bucket_range, self.running)
+
+    def scan(self, task_type: Optional[TaskType] = None, warehouse_id: Optional[str] = None,
+             cursor: Optional[int] = None, descending: bool = False, status: Optional[ResourceStatus] = None,
+             start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """从游标开始按序号遍历 (序号, 任务ID)"""
+        return self.view().scan(task_type, warehouse_id, cursor, descending, status, start, end)
+
+
+class TaskIndexView:
+    """TaskIndex 在某一时刻的只读视图：引用索引列表并记住当时的长度"""
+
+    __slots__ = ("order", "base", "length", "by_type", "by_warehouse", "by_status", "time_buckets",
+                 "bucket_range", "running")
+
+    def __init__(self, order: List[Optional[str]], base: int, length: int,
+                 by_type: Dict[TaskType, Tuple[List[int], int]],
+                 by_warehouse: Dict[str, Tuple[List[int], int]],
+                 by_status: Dict[ResourceStatus, Tuple[List[int], int]],
+                 time_buckets: Dict[int, List[int]], bucket_range: Tuple[int, int], running: Dict[int, float]):
+        self.order = order
+        self.base = base
+        self.length = length
+        self.by_type = by_type
+        self.by_warehouse = by_warehouse
+        self.by_status = by_status
+        self.time_buckets = time_buckets
+        self.bucket_range = bucket_range
+        self.running = running
+
+    def _time_candidates(self, start: Optional[datetime], end: Optional[datetime],
+                         limit: int) -> Optional[List[int]]:
+        """执行时段与 [start, end] 相交的候选任务序号（有序）；候选数超过 limit 时返回 None"""
+        first, last = self.bucket_range
+        if start is not None:
+            first = max(first, TaskIndex._bucket(start.timestamp()))
+        if end is not None:
+            last = min(last, TaskIndex._bucket(end.timestamp()))
+        end_timestamp = end.timestamp() if end is not None else math.inf
+        count = len(self.running)
+        selected = []
+        for bucket in range(first, last + 1):
+            index = self.time_buckets.get(bucket)
+            if index:
+                count += len(index)
+                if count > limit:
+                    return None
+                selected.append(index)
+        candidates = {seq for seq, started in self.running.items() if started <= end_timestamp}
+        for index in selected:
+            candidates.update(index)
+        return sorted(candidates)
+
+    def scan(self, task_type: Optional[TaskType] = None, warehouse_id: Optional[str] = None,
+             cursor: Optional[int] = None, descending: bool = False, status: Optional[ResourceStatus] = None,
+             start: Optional[datetime] = None, end: Optional[datetime] = None):
+        """从游标开始按序号遍历 (序号, 任务ID)
+
+        类型、仓库和非空闲状态条件取最短的索引；有时间窗口且落在窗口内的候选任务更少时
+        改用执行时段索引。候选任务只是可能满足条件，调用方仍需按任务记录过滤。
+        """
+        conditions = [index for index in (
+            self.by_type.get(task_type, ([], 0)) if task_type is not None else None,
+            self.by_warehouse.get(warehouse_id, ([], 0)) if warehouse_id is not None else None,
+            self.by_status.get(status, ([], 0)) if status is not None and status != ResourceStatus.IDLE else None)
+            if index is not None]
+        candidates, length = min(conditions, key=lambda index: index[1], default=(None, 0))
+        if start is not None or end is not None:
+            in_window = self._time_candidates(start, end, length if candidates is not None else self.length)
+            if in_window is not None:
+                candidates, length = in_window, len(in_window)
+        if candidates is None:
+            candidates, length = range(self.base, self.base + self.length), self.length
+        # 其余索引条件按二分查找校验成员关系
+        others = [index for index in conditions if index[0] is not candidates]
+        
+        if descending:
+            stop = bisect_right(candidates, cursor, 0, length) if cursor is not None else length
+            positions = range(stop - 1, -1, -1)
+        else:
+            first = bisect_left(candidates, cursor, 0, length) if cursor is not None else 0
+            positions = range(first, length)
+        for position in positions:
+            seq = candidates[position]
+            if not self.base <= seq < self.base + self.length:
+                continue
+            if any(not self._contains(index, seq) for index in others):
+                continue
+            task_id = self.order[seq - self.base]
+            if task_id is not None:
+                yield seq, task_id
+
+    @staticmethod
+    def _contains(index: Tuple[List[int], int], seq: int) -> bool:
+        members, length = index
+        position = bisect_left(members, seq, 0, length)
+        return position < length and members[position] == seq
+
+
+def _filter_tasks(scanned, get_task: Callable[[str], Optional[Dict[str, Any]]],
+                  status: Optional[ResourceStatus], start: Optional[datetime], end: Optional[datetime],
+                  limit: int, descending: bool) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """在索引扫描结果上按状态和时间窗口过滤，返回 (任务列表, 下一页游标)"""
+    results = []
+    for seq, task_id in scanned:
+        task = get_task(task_id)
+        if task is None:
+            continue
+        if status is not None and task["status"] != status.value:
+            continue
+        if start is not None or end is not None:
+            if task["start_time"] is None:
+                continue
+            if end is not None and datetime.fromisoformat(task["start_time"]) > end:
+                continue
+            if start is not None and task["end_time"] is not None \
+                    and datetime.fromisoformat(task["end_time"]) < start:
+                continue
+        results.append(task)
+        if len(results) >= limit:
+            return results, seq - 1 if descending else seq + 1
+    return results, None
+
+
+class ChangeLog:
+    """按版本递增的实体变更记录 (版本, 集合, 实体ID, 是否删除)
+
+    只追加；超过 max_entries 时保留较新的一半并以新列表替换，已取得的只读视图不受影响。
+    早于 floor 的增量查询无法回答，需要全量同步。
+    """
+
+    def __init__(self, max_entries: int = CHANGE_LOG_LIMIT):
+        self.entries: List[Tuple[int, str, str, bool]] = []
+        self.floor = 0
+        self.max_entries = max_entries
+
+    def append(self, version: int, collection: str, entity_id: str, removed: bool = False):
+        self.entries.append((version, collection, entity_id, removed))
+        if len(self.entries) > self.max_entries:
+            keep = self.max_entries // 2
+            self.floor = self.entries[-keep - 1][0]
+            self.entries = self.entries[-keep:]
+
+    def view(self) -> 'ChangeLogView':
+        return ChangeLogView(self.entries, len(self.entries), self.floor)
+
+
+class ChangeLogView:
+    """ChangeLog 在某一时刻的只读视图"""
+
+    __slots__ = ("entries", "length", "floor")
+
+    def __init__(self, entries: List[Tuple[int, str, str, bool]], length: int, floor: int):
+        self.entries = entries
+        self.length = length
+        self.floor = floor
+
+    def since(self, collection: str, since: int, version: int) -> Optional[Tuple[List[str], List[str]]]:
+        """版本 since 之后被创建/修改和被删除的实体ID；无法回答时返回 None"""
+        if since > version or since < self.floor:
+            return None
+        states: Dict[str, bool] = {}
+        for position in range(bisect_left(self.entries, (since + 1,), 0, self.length), self.length):
+            _, entry_collection, entity_id, removed = self.entries[position]
+            if entry_collection == collection:
+                states.pop(entity_id, None)
+                states[entity_id] = removed
+        changed = [entity_id for entity_id, removed in states.items() if not removed]
+        removed = [entity_id for entity_id, removed in states.items() if removed]
+        return changed, removed
+
+
+def _apply_changes(records: Optional[Dict[str, Any]], changes: Optional[Tuple[List[str], List[str]]],
+                   build_one: Callable[[str], Any], build_all: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """按 changes_since 的结果更新记录表：只重建变化的实体，未变化时原样返回
+
+    不修改传入的记录表（它可能已被只读快照引用）；没有上一版本或增量不可用时全量重建。
+    build_one 返回 None 表示实体已不在该表中。
+    """
+    if records is None or changes is None:
+        return build_all()
+    changed_ids, removed_ids = changes
+    if not changed_ids and not removed_ids:
+        return records
+    records = dict(records)
+    for entity_id in changed_ids:
+        record = build_one(entity_id)
+        if record is not None:
+            records[entity_id] = record
+        else:
+            records.pop(entity_id, None)
+    for entity_id in removed_ids:
+        records.pop(entity_id, None)
+    return records
+
+
+class PersistenceStore:
+    """快照加预写日志（WAL）的持久化存储
+
+    每次状态变更追加一条带长度和 CRC 校验的 pickle 记录到当前代的 WAL 文件；生成快照
+    时先切换到新一代 WAL，再原子地写入压缩快照（记录下一代编号），最后删除旧 WAL。
+    恢复时加载快照并只重放不早于快照所记编号的 WAL，末尾写了一半的记录会被截掉。
+    """
+
+    _HEADER = struct.Struct("<II")  # 记录长度, CRC32
+
+    def __init__(self, directory: str, snapshot_interval: int = SNAPSHOT_INTERVAL, fsync: bool = False):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.fsync = fsync
+        self.generation = 1
+        self.records_since_snapshot = 0
+        self._file = None
+        self._pending: Optional[List[bytes]] = None  # 事务中尚未写入的记录
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def _wal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, WAL_FILE_PATTERN.format(generation))
+
+    def _wal_generations(self) -> List[int]:
+        generations = []
+        for name in os.listdir(self.directory):
+            if name.startswith("wal-") and name.endswith(".log"):
+                try:
+                    generations.append(int(name[4:-4]))
+                except ValueError:
+                    continue
+        return sorted(generations)
+
+    def exists(self) -> bool:
+        """目录中是否已有持久化状态"""
+        return os.path.exists(self.snapshot_path) or bool(self._wal_generations())
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._pending is not None
+
+    def append(self, record: tuple) -> bool:
+        """追加一条日志记录，返回是否到了生成快照的时机（事务中总是 False）"""
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self.records_since_snapshot += 1
+        if self._pending is not None:
+            self._pending.append(payload)
+            return False
+        self._write(payload)
+        return self.records_since_snapshot >= self.snapshot_interval
+
+    def _write(self, payload: bytes):
+        if self._file is None:
+            self._file = open(self._wal_path(self.generation), "ab")
+        self._file.write(self._HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def begin(self):
+        """开始事务：之后追加的记录在 commit 时作为一条记录写入"""
+        self._pending = []
+
+    def commit(self) -> bool:
+        """提交事务，恢复时事务内的记录要么全部重放，要么全部丢弃；返回是否到了生成快照的时机"""
+        pending, self._pending = self._pending, None
+        if pending:
+            self._write(pickle.dumps(("batch", pending), protocol=pickle.HIGHEST_PROTOCOL))
+        return self.records_since_snapshot >= self.snapshot_interval
+
+    def write_snapshot(self, state: Dict[str, Any]):
+        """写入快照并清理已被快照覆盖的 WAL"""
+        self.close()
+        if self._pending is not None:
+            self._pending = []  # 快照已包含事务中的变更
+        old_generations = self._wal_generations()
+        self.generation = max(old_generations + [self.generation]) + 1
+        state = dict(state, next_wal_generation=self.generation)
+        data = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        for generation in old_generations:
+            os.remove(self._wal_path(generation))
+        self.records_since_snapshot = 0
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[tuple]]:
+        """读取快照和其后的 WAL 记录"""
+        state = None
+        first_generation = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                state = pickle.loads(zlib.decompress(f.read()))
+            first_generation = state["next_wal_generation"]
+        
+        records: List[tuple] = []
+        generations = [g for g in self._wal_generations() if g >= first_generation]
+        for generation in generations:
+            records.extend(self._read_wal(generation))
+        self.generation = max(generations + [first_generation, 1])
+        self.records_since_snapshot = len(records)
+        return state, records
+
+    def _read_wal(self, generation: int) -> List[tuple]:
+        path = self._wal_path(generation)
+        records = []
+        valid_size = 0
+        with open(path, "rb") as f:
+            data = f.read()
+        while valid_size + self._HEADER.size <= len(data):
+            length, checksum = self._HEADER.unpack_from(data, valid_size)
+            start = valid_size + self._HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            record = pickle.loads(payload)
+            if record[0] == "batch":
+                records.extend(pickle.loads(item) for item in record[1])
+            else:
+                records.append(record)
+            valid_size = start + length
+        if valid_size < len(data):
+            # 截掉崩溃时写了一半的记录
+            with open(path, "r+b") as f:
+                f.truncate(valid_size)
+        return records
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogisticsSystem:
+    """物流调度系统"""
+    
+    RESOURCE_CATEGORIES = ("terminal_cranes", "product_cranes", "frame_trucks", "frames")
+    # 资源类名 / add_* 操作 -> 实体集合名（与 /api/resources 的键一致）
+    _RESOURCE_COLLECTIONS = {"Crane": "cranes", "Frame": "frames", "FrameTruck": "frame_trucks"}
+    _ADDED_COLLECTIONS = {
+        "add_product": "products",
+        "add_terminal_warehouse": "terminal_warehouses",
+        "add_product_warehouse": "product_warehouses",
+        "add_crane": "cranes",
+        "add_frame": "frames",
+        "add_frame_truck": "frame_trucks",
+        "add_ship_plan": "ship_plans"
+    }
+    
+    def __init__(self, grid_size: Tuple[int, int] = (10, 10)):
+        self.grid_size = grid_size
+        self.terminal_warehouses: Dict[str, TerminalWarehouse] = {}
+        self.product_warehouses: Dict[str, ProductWarehouse] = {}
+        self.cranes: Dict[str, Crane] = {}
+        self.frames: Dict[str, Frame] = {}
+        self.frame_trucks: Dict[str, FrameTruck] = {}
+        self.products: Dict[str, Product] = {}
+        self.ship_plans: Dict[str, ShipPlan] = {}
+        self.tasks: Dict[str, Task] = {}
+        self.event_log = EventLog()
+        self.execution_log = self.event_log.records  # 最近日志的环形缓冲区
+        # 资源索引：按类别维护空闲资源（有序）和行车所属仓库类型
+        self.idle_resources: Dict[str, Dict[str, None]] = {category: {} for category in self.RESOURCE_CATEGORIES}
+        self.idle_spatial_index: Dict[str, SpatialIndex] = {category: SpatialIndex(grid_size)
+                                                            for category in self.RESOURCE_CATEGORIES}
+        self.crane_kinds: Dict[str, Optional[str]] = {}  # 行车ID -> "terminal_cranes"/"product_cranes"
+        self._cranes_by_kind: Dict[str, Dict[str, None]] = {"terminal_cranes": {}, "product_cranes": {}}
+        self._cranes_by_warehouse: Dict[str, Dict[str, None]] = {}
+        self.terminal_inventory: Dict[str, int] = {}  # 产品ID -> 全部末端库库存合计
+        self.parking_positions: Dict[str, Position] = {}  # 框架ID -> 停放位置
+        self.path_planner = PathPlanner(grid_size)
+        self.task_queue = TaskQueue(self)  # 尚未开始执行的任务
+        self.task_archive = TaskArchive()  # 已完成任务
+        self.task_index = TaskIndex()  # 活动任务和归档任务的分页索引
+        self.archive_completed_tasks = True
+        self._plan_tasks: Dict[str, List[str]] = {}  # 船运计划ID -> 任务ID
+        self._routes_dirty = True  # 仓库或停放位变化后需重建路径表
+        self.clock = SimulationClock()
+        self._waiting_sub_tasks: List[Tuple[Task, int]] = []  # 等待资源释放的子任务
+        self._handling_due: Dict[str, datetime] = {}  # 框架ID -> 正在进行的装卸子任务的结束时间
+        self._task_callbacks: Dict[str, Callable[[Task, bool], None]] = {}  # 任务ID -> 完成回调
+        self.persistence: Optional[PersistenceStore] = None
+        self.instance_id = uuid.uuid4().hex[:8]  # 区分不同系统实例（重启、重置）的版本号
+        self.version = 0  # 状态版本号，每次变更递增
+        self._status_cache: Tuple[int, Optional[Dict[str, Any]]] = (-1, None)
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []  # 变更事件订阅者
+        self.entity_versions: Dict[str, Dict[str, int]] = {}  # 实体集合 -> {实体ID: 最后修改版本}
+        self.change_log = ChangeLog()  # 按版本排列的变更记录，增量查询只需扫描 since 之后的部分
+        self.reservations = ReservationCalendar()  # 预约任务对资源的未来占用
+    
+    def add_terminal_warehouse(self, warehouse: TerminalWarehouse):
+        """添加末端库"""
+        replaced = self.terminal_warehouses.get(warehouse.id)
+        if replaced is not None:
+            object.__setattr__(replaced, "_inventory_listener", None)
+            for product_id, quantity in replaced.products.items():
+                self._adjust_terminal_inventory(product_id, -quantity)
+        self.terminal_warehouses[warehouse.id] = warehouse
+        for product_id, quantity in warehouse.products.items():
+            self._adjust_terminal_inventory(product_id, quantity)
+        object.__setattr__(warehouse, "_inventory_listener", self._on_inventory_changed)
+        self._reclassify_warehouse_cranes(warehouse.id)
+        self._routes_dirty = True
+        self._journal("add_terminal_warehouse", warehouse)
+    
+    def add_product_warehouse(self, warehouse: ProductWarehouse):
+        """添加成品库"""
+        replaced = self.product_warehouses.get(warehouse.id)
+        if replaced is not None:
+            object.__setattr__(replaced, "_inventory_listener", None)
+        self.product_warehouses[warehouse.id] = warehouse
+        object.__setattr__(warehouse, "_inventory_listener", self._on_inventory_changed)
+        self._reclassify_warehouse_cranes(warehouse.id)
+        self._routes_dirty = True
+        self._journal("add_product_warehouse", warehouse)
+    
+    def _adjust_terminal_inventory(self, product_id: str, delta: int):
+        """更新末端库产品库存合计"""
+        total = self.terminal_inventory.get(product_id, 0) + delta
+        if total:
+            self.terminal_inventory[product_id] = total
+        else:
+            self.terminal_inventory.pop(product_id, None)
+    
+    def _on_inventory_changed(self, warehouse: Warehouse, product_id: str, delta: int):
+        """仓库库存变化回调"""
+        if isinstance(warehouse, TerminalWarehouse):
+            self._adjust_terminal_inventory(product_id, delta)
+        self._journal("inventory", isinstance(warehouse, TerminalWarehouse), warehouse.id, product_id, delta)
+    
+    def add_crane(self, crane: Crane):
+        """添加行车"""
+        self._detach_resource(self.cranes.get(crane.id))
+        self.cranes[crane.id] = crane
+        self._cranes_by_warehouse.setdefault(crane.warehouse_id, {})[crane.id] = None
+        self._reclassify_crane(crane)
+        self._attach_resource(crane)
+        self._journal("add_crane", crane)
+    
+    def add_frame(self, frame: Frame):
+        """添加框架"""
+        self._detach_resource(self.frames.get(frame.id))
+        self.frames[frame.id] = frame
+        if frame.id not in self.parking_positions:
+            self.parking_positions[frame.id] = Position(frame.position.x, frame.position.y)
+            self._routes_dirty = True
+        self._set_idle("frames", frame)
+        self._attach_resource(frame)
+        self._journal("add_frame", frame)
+    
+    def add_frame_truck(self, truck: FrameTruck):
+        """添加框架车头"""
+        self._detach_resource(self.frame_trucks.get(truck.id))
+        self.frame_trucks[truck.id] = truck
+        self._set_idle("frame_trucks", truck)
+        self._attach_resource(truck)
+        self._journal("add_frame_truck", truck)
+    
+    def release_resource(self, collection: str, resource_id: str) -> Optional[ObservableResource]:
+        """移出空闲且未被未完成任务占用的框架或车头（交接给其他系统），返回被移出的资源"""
+        resources = {"frames": self.frames, "frame_trucks": self.frame_trucks}[collection]
+        resource = resources.get(resource_id)
+        if resource is None or resource.status != ResourceStatus.IDLE:
+            return None
+        for task in self.tasks.values():
+            if task.end_time is None and any(resource_id in sub_task.assigned_resources.values()
+                                             for sub_task in task.sub_tasks):
+                return None
+        self._detach_resource(resource)
+        del resources[resource_id]
+        if collection == "frames":
+            self.parking_positions.pop(resource_id, None)
+            self._routes_dirty = True
+        self._journal("release_resource", collection, resource_id)
+        self._mark_removed(collection, resource_id)
+        return resource
+    
+    def _attach_resource(self, resource: ObservableResource):
+        """监听资源字段变化以维护索引"""
+        object.__setattr__(resource, "_listener", self._on_resource_changed)
+    
+    def _detach_resource(self, resource: Optional[ObservableResource]):
+        """移除被同ID资源替换的旧资源的监听和索引"""
+        if resource is None:
+            return
+        object.__setattr__(resource, "_listener", None)
+        if isinstance(resource, Crane):
+            self._cranes_by_warehouse.get(resource.warehouse_id, {}).pop(resource.id, None)
+            kind = self.crane_kinds.pop(resource.id, None)
+            if kind:
+                self._cranes_by_kind[kind].pop(resource.id, None)
+                self._drop_idle(kind, resource.id)
+        else:
+            self._drop_idle(self._resource_category(resource), resource.id)
+    
+    def _set_idle(self, category: str, resource: ObservableResource):
+        """按资源当前状态更新空闲索引和空间索引"""
+        if resource.status == ResourceStatus.IDLE:
+            self.idle_resources[category][resource.id] = None
+            self.idle_spatial_index[category].insert(resource.id, resource.position)
+        else:
+            self._drop_idle(category, resource.id)
+    
+    def _drop_idle(self, category: str, resource_id: str):
+        """从空闲索引和空间索引中移除资源"""
+        self.idle_resources[category].pop(resource_id, None)
+        self.idle_spatial_index[category].remove(resource_id)
+    
+    def _resource_category(self, resource: ObservableResource) -> Optional[str]:
+        """资源所属类别"""
+        if isinstance(resource, Crane):
+            return self.crane_kinds.get(resource.id)
+        if isinstance(resource, FrameTruck):
+            return "frame_trucks"
+        return "frames"
+    
+    def _reclassify_crane(self, crane: Crane):
+        """根据所属仓库重新判断行车类型"""
+        if crane.warehouse_id in self.terminal_warehouses:
+            kind = "terminal_cranes"
+        elif crane.warehouse_id in self.product_warehouses:
+            kind = "product_cranes"
+        else:
+            kind = None
+        
+        old_kind = self.crane_kinds.get(crane.id)
+        if old_kind and old_kind != kind:
+            self._cranes_by_kind[old_kind].pop(crane.id, None)
+            self._drop_idle(old_kind, crane.id)
+        self.crane_kinds[crane.id] = kind
+        if kind:
+            self._cranes_by_kind[kind][crane.id] = None
+            self._set_idle(kind, crane)
+    
+    def _reclassify_warehouse_cranes(self, warehouse_id: str):
+        """仓库加入后重新判断其关联行车的类型"""
+        for crane_id in self._cranes_by_warehouse.get(warehouse_id, {}):
+            self._reclassify_crane(self.cranes[crane_id])
+    
+    def _on_resource_changed(self, resource: ObservableResource, field_name: str,
+                             old_value: Any, new_value: Any):
+        """资源字段变化回调：增量维护空闲索引和行车分类"""
+        self._journal("resource", type(resource).__name__, resource.id, field_name, new_value)
+        if field_name == "status":
+            category = self._resource_category(resource)
+            if category:
+                self._set_idle(category, resource)
+        elif field_name == "position":
+            category = self._resource_category(resource)
+            if category and resource.id in self.idle_resources[category]:
+                self.idle_spatial_index[category].insert(resource.id, new_value)
+        elif field_name == "warehouse_id":
+            self._cranes_by_warehouse.get(old_value, {}).pop(resource.id, None)
+            self._cranes_by_warehouse.setdefault(new_value, {})[resource.id] = None
+            self._reclassify_crane(resource)
+    
+    def add_product(self, product: Product):
+        """添加产品"""
+        self.products[product.id] = product
+        self._journal("add_product", product)
+    
+    def add_ship_plan(self, plan: ShipPlan):
+        """添加船运计划"""
+        self.ship_plans[plan.id] = plan
+        self._journal("add_ship_plan", plan)
+    
+    def get_resource_status(self) -> Dict[str, Dict[str, ResourceStatus]]:
+        """获取所有资源状态"""
+        return {
+            "terminal_cranes": {crane_id: self.cranes[crane_id].status
+                               for crane_id in self._cranes_by_kind["terminal_cranes"]},
+            "product_cranes": {crane_id: self.cranes[crane_id].status
+                              for crane_id in self._cranes_by_kind["product_cranes"]},
+            "frame_trucks": {truck.id: truck.status for truck in self.frame_trucks.values()},
+            "frames": {frame.id: frame.status for frame in self.frames.values()},
+            "storage_positions": {pos_id: "occupied" if pos_id in pw.storage_positions else "available" 
+                                 for pw in self.product_warehouses.values() for pos_id in pw.storage_positions}
+        }
+    
+    @timed_phase("validate_plan")
+    def validate_ship_plan(self, plan_id: str) -> bool:
+        """验证船运计划是否有效"""
+        if plan_id not in self.ship_plans:
+            return False
+        
+        plan = self.ship_plans[plan_id]
+        
+        # 检查末端库是否有足够的产品
+        for product_id, required_qty in plan.products.items():
+            if self.terminal_inventory.get(product_id, 0) < required_qty:
+                return False
+        
+        return True
+    
+    @timed_phase("validate_plans")
+    def validate_ship_plans(self, plan_ids: List[str]) -> Dict[str, Any]:
+        """批量验证船运计划
+        
+        每个计划单独对照末端库库存验证，同时汇总整批计划的需求，
+        按产品报告整批执行时的缺口数量。
+        """
+        plans: Dict[str, bool] = {}
+        demand: Dict[str, int] = {}
+        
+        for plan_id in plan_ids:
+            plan = self.ship_plans.get(plan_id)
+            if plan is None:
+                plans[plan_id] = False
+                continue
+            valid = True
+            for product_id, required_qty in plan.products.items():
+                demand[product_id] = demand.get(product_id, 0) + required_qty
+                if self.terminal_inventory.get(product_id, 0) < required_qty:
+                    valid = False
+            plans[plan_id] = valid
+        
+        shortfalls = {product_id: required_qty - self.terminal_inventory.get(product_id, 0)
+                      for product_id, required_qty in demand.items()
+                      if required_qty > self.terminal_inventory.get(product_id, 0)}
+        
+        return {
+            "plans": plans,
+            "demand": demand,
+            "shortfalls": shortfalls,
+            "feasible": all(plans.values()) and not shortfalls
+        }
+    
+    @timed_phase("find_resources")
+    def find_available_resources(self) -> Dict[str, List[str]]:
+        """查找可用资源"""
+        return {category: list(self.idle_resources[category]) for category in self.RESOURCE_CATEGORIES}
+    
+    def find_nearest_idle(self, category: str, position: Position, k: int = 1) -> List[str]:
+        """查找距离指定位置最近的 k 个空闲资源"""
+        return self.idle_spatial_index[category].nearest(position, k)
+    
+    @timed_phase("create_ship_task")
+    def create_ship_transport_task(self, plan_id: str) -> Optional[Task]:
+        """创建船运发货任务"""
+        if not self.validate_ship_plan(plan_id):
+            self.log_event("ERROR", f"船运计划 {plan_id} 验证失败")
+            TASK_CREATION_FAILURES["plan_invalid"].inc()
+            return None
+        
+        plan = self.ship_plans[plan_id]
+        available_resources = self.find_available_resources()
+        
+        # 检查是否有足够的资源
+        if (not available_resources["terminal_cranes"] or 
+            not available_resources["frame_trucks"] or 
+            not available_resources["frames"]):
+            self.log_event("ERROR", "没有足够的资源执行船运任务")
+            TASK_CREATION_FAILURES["insufficient_resources"].inc()
+            return None
+        
+        # 分配资源：优先选择库存可独立满足计划的末端库行车，没有时按多库取货方案从多个末端库装货；
+        # 再按距离选择离末端库最近的框架和离框架最近的车头
+        assigned_crane = self._single_source_crane(plan.products, available_resources["terminal_cranes"])
+        if assigned_crane is None:
+            return self._create_multi_source_ship_task(plan)
+        source_warehouse = self.terminal_warehouses[self.cranes[assigned_crane].warehouse_id]
+        assigned_frame = self.find_nearest_idle("frames", source_warehouse.position)[0]
+        assigned_truck = self.find_nearest_idle("frame_trucks", self.frames[assigned_frame].position)[0]
+        
+        # 成品库行车空闲时由离末端库最近的成品库行车卸货，否则沿用末端库行车
+        unload_crane = assigned_crane
+        if available_resources["product_cranes"]:
+            unload_crane = self.find_nearest_idle("product_cranes", source_warehouse.position)[0]
+        
+        return self._build_ship_task(plan, assigned_crane, assigned_truck, assigned_frame, unload_crane)
+    
+    def _single_source_crane(self, products: Dict[str, int], cranes: List[str]) -> Optional[str]:
+        """第一台所属末端库库存能独立满足 products 的行车"""
+        return next((crane_id for crane_id in cranes
+                     if all(self.terminal_warehouses[self.cranes[crane_id].warehouse_id].products.get(product_id, 0)
+                            >= quantity for product_id, quantity in products.items())), None)
+    
+    def _source_flow(self, products: Dict[str, int],
+                     target: Optional[Position]) -> Optional[Tuple[float, Dict[str, Dict[str, int]]]]:
+        """以最小费用流把需求分配到各末端库
+        
+        网络为 源点 -> 产品（容量为需求） -> 末端库（容量为库存） -> 汇点，每件货物的费用为
+        产品重量乘以末端库到目的地的距离，行车全部忙碌的末端库另加 SOURCING_BUSY_CRANE_PENALTY。
+        没有行车的末端库不参与。返回 (总费用, 末端库ID -> 取货清单)，库存不足时返回 None。
+        """
+        demand = [(product_id, quantity) for product_id, quantity in products.items() if quantity > 0]
+        warehouses = [warehouse for warehouse in self.terminal_warehouses.values()
+                      if self._cranes_by_warehouse.get(warehouse.id)
+                      and any(warehouse.products.get(product_id, 0) > 0 for product_id, _ in demand)]
+        sink = 1 + len(demand) + len(warehouses)
+        edges: List[Tuple[int, int, int, float]] = []
+        edge_keys: List[Tuple[str, str]] = []  # 产品 -> 末端库的边对应的 (末端库ID, 产品ID)
+        for i, (product_id, quantity) in enumerate(demand):
+            edges.append((0, 1 + i, quantity, 0.0))
+            edge_keys.append(("", ""))
+        for j, warehouse in enumerate(warehouses):
+            distance = self.travel_distance(warehouse.position, target) if target is not None else 0.0
+            if not any(crane_id in self.idle_resources["terminal_cranes"]
+                       for crane_id in self._cranes_by_warehouse[warehouse.id]):
+                distance += SOURCING_BUSY_CRANE_PENALTY
+            for i, (product_id, _) in enumerate(demand):
+                stock = warehouse.products.get(product_id, 0)
+                if stock > 0:
+                    product = self.products.get(product_id)
+                    unit_weight = product.weight if product is not None else 1.0
+                    edges.append((1 + i, 1 + len(demand) + j, stock, distance * unit_weight))
+                    edge_keys.append((warehouse.id, product_id))
+            edges.append((1 + len(demand) + j, sink, sum(quantity for _, quantity in demand), 0.0))
+            edge_keys.append(("", ""))
+        
+        required = sum(quantity for _, quantity in demand)
+        flow, cost, edge_flows = solve_min_cost_flow(sink + 1, edges, 0, sink, required)
+        if flow < required:
+            return None
+        allocation: Dict[str, Dict[str, int]] = {}
+        for (warehouse_id, product_id), amount in zip(edge_keys, edge_flows):
+            if warehouse_id and amount > 0:
+                allocation.setdefault(warehouse_id, {})[product_id] = amount
+        return cost, allocation
+    
+    def source_ship_products(self, products: Dict[str, int]) -> Optional[Tuple[Dict[str, Dict[str, int]], str]]:
+        """多库取货优化：为一批货物选择末端库和目的成品库
+        
+        对每个候选成品库（有空闲行车的成品库，都没有时为全部成品库）求解一次最小费用流，
+        取总费用最小的方案。返回 (末端库ID -> 取货清单, 卸货行车ID)；没有成品库行车时卸货行车
+        为空字符串，库存不足时返回 None。
+        """
+        candidates: Dict[str, str] = {}  # 成品库ID -> 卸货行车
+        for crane_id in self.idle_resources["product_cranes"]:
+            candidates.setdefault(self.cranes[crane_id].warehouse_id, crane_id)
+        if not candidates:
+            for warehouse_id in self.product_warehouses:
+                candidates[warehouse_id] = next(iter(self._cranes_by_warehouse.get(warehouse_id, {})), "")
+        if not candidates:
+            result = self._source_flow(products, None)
+            return (result[1], "") if result else None
+        
+        best = None
+        for warehouse_id, crane_id in candidates.items():
+            result = self._source_flow(products, self.product_warehouses[warehouse_id].position)
+            if result is not None and (best is None or result[0] < best[0]):
+                best = (result[0], result[1], crane_id)
+        return (best[1], best[2]) if best else None
+    
+    def _loading_stops(self, allocation: Dict[str, Dict[str, int]],
+                       start: Position) -> List[Tuple[str, Dict[str, int]]]:
+        """把各末端库的取货清单排成装货顺序（从 start 出发的最近邻路线），每站选一台行车（优先空闲）"""
+        stops = []
+        remaining = dict(allocation)
+        position = start
+        while remaining:
+            warehouse_id = min(remaining, key=lambda warehouse_id: self.travel_distance(
+                position, self.terminal_warehouses[warehouse_id].position))
+            cranes = list(self._cranes_by_warehouse[warehouse_id])
+            crane_id = next((crane_id for crane_id in cranes if crane_id in self.idle_resources["terminal_cranes"]),
+                            cranes[0])
+            stops.append((crane_id, remaining.pop(warehouse_id)))
+            position = self.terminal_warehouses[warehouse_id].position
+        return stops
+    
+    def _create_multi_source_ship_task(self, plan: ShipPlan) -> Optional[Task]:
+        """没有单个末端库能满足计划时，按多库取货方案创建一次装多站货的船运任务"""
+        sourcing = self.source_ship_products(plan.products)
+        if sourcing is None:
+            self.log_event("ERROR", f"船运计划 {plan.id} 无法由有行车的末端库组合满足")
+            TASK_CREATION_FAILURES["insufficient_resources"].inc()
+            return None
+        allocation, unload_crane = sourcing
+        # 框架取离取货量（按重量）最大的末端库最近的，车头取离框架最近的
+        main_source = max(allocation, key=lambda warehouse_id: load_size(allocation[warehouse_id], self.products)[0])
+        assigned_frame = self.find_nearest_idle("frames", self.terminal_warehouses[main_source].position)[0]
+        assigned_truck = self.find_nearest_idle("frame_trucks", self.frames[assigned_frame].position)[0]
+        stops = self._loading_stops(allocation, self.frames[assigned_frame].position)
+        self.log_event("INFO", f"船运计划 {plan.id} 从 {len(stops)} 个末端库取货: "
+                               f"{', '.join(self.cranes[crane_id].warehouse_id for crane_id, _ in stops)}")
+        return self._build_ship_task(plan, stops[0][0], assigned_truck, assigned_frame,
+                                     unload_crane or stops[-1][0], stops=stops)
+    
+    def _pack_plan(self, plan: ShipPlan, frame_ids: List[str],
+                   products: Optional[Dict[str, int]] = None) -> Optional[List[Dict[str, int]]]:
+        """按候选框架中最大的载重和容积把计划（或其中的 products）拆分为多趟装载，单件超限时返回 None"""
+        max_weight, max_volume = max(frame_load_limits(self.frames[frame_id]) for frame_id in frame_ids)
+        try:
+            return pack_frame_loads(plan.products if products is None else products, self.products,
+                                    max_weight, max_volume)
+        except ValueError as exc:
+            self.log_event("ERROR", f"船运计划 {plan.id} 无法装箱: {exc}")
+            TASK_CREATION_FAILURES["oversized_item"].inc()
+            return None
+    
+    def _frame_can_carry(self, frame_id: str, products: Dict[str, int]) -> bool:
+        weight, volume = load_size(products, self.products)
+        max_weight, max_volume = frame_load_limits(self.frames[frame_id])
+        return weight <= max_weight + 1e-9 and volume <= max_volume + 1e-9
+    
+    @timed_phase("create_ship_trips")
+    def create_ship_transport_trips(self, plan_id: str) -> List[Task]:
+        """按框架载重和容积把船运计划拆分为多趟运输并行执行
+        
+        计划装得下一个框架时与 create_ship_transport_task 相同（任务ID不变）；否则每趟一个
+        船运任务（ID 为 ship_task_{计划ID}_{趟次}），依次分配离末端库最近且装得下该趟货物的
+        空闲框架、离框架最近的空闲车头，末端库的多台空闲行车和成品库行车轮流装卸。
+        趟数多于空闲框架或车头时复用已分配的资源，这些趟次在资源释放后依次执行。
+        """
+        if not self.validate_ship_plan(plan_id):
+            self.log_event("ERROR", f"船运计划 {plan_id} 验证失败")
+            TASK_CREATION_FAILURES["plan_invalid"].inc()
+            return []
+        
+        plan = self.ship_plans[plan_id]
+        available = self.find_available_resources()
+        if not available["terminal_cranes"] or not available["frame_trucks"] or not available["frames"]:
+            self.log_event("ERROR", "没有足够的资源执行船运任务")
+            TASK_CREATION_FAILURES["insufficient_resources"].inc()
+            return []
+        
+        loads = self._pack_plan(plan, available["frames"])
+        if loads is None:
+            return []
+        
+        # 末端库：与 create_ship_transport_task 相同，优先由单个末端库供货；没有时按多库取货方案
+        # 分别对每个末端库的取货清单装箱，每趟只在一个末端库装货。同一末端库的空闲行车轮流装货
+        first_crane = self._single_source_crane(plan.products, available["terminal_cranes"])
+        if first_crane is not None:
+            trip_loads = [(self.cranes[first_crane].warehouse_id, load) for load in loads]
+        else:
+            sourcing = self.source_ship_products(plan.products)
+            if sourcing is None:
+                self.log_event("ERROR", f"船运计划 {plan_id} 无法由有行车的末端库组合满足")
+                TASK_CREATION_FAILURES["insufficient_resources"].inc()
+                return []
+            trip_loads = []
+            for warehouse_id, products in sourcing[0].items():
+                trip_loads += [(warehouse_id, load) for load in self._pack_plan(plan, available["frames"], products)]
+            loads = [load for _, load in trip_loads]
+        source_warehouse = self.terminal_warehouses[trip_loads[0][0]]
+        loading_cranes = {warehouse_id: [crane_id for crane_id in self._cranes_by_warehouse[warehouse_id]
+                                         if crane_id in self.idle_resources["terminal_cranes"]]
+                                        or list(self._cranes_by_warehouse[warehouse_id])
+                          for warehouse_id, _ in trip_loads}
+        unload_cranes = self.find_nearest_idle("product_cranes", source_warehouse.position, len(loads))
+        frames = self.find_nearest_idle("frames", source_warehouse.position, len(available["frames"]))
+        
+        frame_trips: Dict[str, int] = {}
+        truck_trips: Dict[str, int] = {}
+        tasks = []
+        for k, (warehouse_id, load) in enumerate(trip_loads):
+            # 优先使用尚未分配的最近框架，全部分配后复用趟数最少的框架
+            candidates = [frame_id for frame_id in frames if self._frame_can_carry(frame_id, load)]
+            frame_id = min(candidates, key=lambda frame_id: frame_trips.get(frame_id, 0))
+            frame_trips[frame_id] = frame_trips.get(frame_id, 0) + 1
+            trucks = self.find_nearest_idle("frame_trucks", self.frames[frame_id].position,
+                                            len(available["frame_trucks"]))
+            truck_id = min(trucks, key=lambda truck_id: truck_trips.get(truck_id, 0))
+            truck_trips[truck_id] = truck_trips.get(truck_id, 0) + 1
+            crane_id = loading_cranes[warehouse_id][k % len(loading_cranes[warehouse_id])]
+            unload_crane = unload_cranes[k % len(unload_cranes)] if unload_cranes else crane_id
+            trip = (k + 1, len(loads)) if len(loads) > 1 else None
+            tasks.append(self._build_ship_task(plan, crane_id, truck_id, frame_id, unload_crane, load, trip))
+        
+        if len(loads) > 1:
+            self.log_event("INFO", f"船运计划 {plan_id} 拆分为 {len(loads)} 趟，使用 {len(frame_trips)} 个框架")
+        return tasks
+    
+    @timed_phase("build_ship_task")
+    def _build_ship_task(self, plan: ShipPlan, assigned_crane: str, assigned_truck: str,
+                         assigned_frame: str, unload_crane: str, products: Optional[Dict[str, int]] = None,
+                         trip: Optional[Tuple[int, int]] = None,
+                         stops: Optional[List[Tuple[str, Dict[str, int]]]] = None,
+                         details: Optional[Dict[str, Any]] = None) -> Task:
+        """按已分配的资源构建船运任务及其子任务
+        
+        products 为本趟装载的货物（默认整个计划），trip 为 (趟次, 总趟数)，拆分运输时任务ID带趟次后缀。
+        stops 为多库取货时依次装货的 (末端库行车, 取货清单)，每站生成一对运输和装货子任务，
+        第二站起的子任务ID带 _stop{站次} 后缀；默认只在 assigned_crane 所属末端库装全部货物。
+        details 为附加到主任务详情的字段。
+        """
+        if products is None:
+            products = plan.products
+        if stops is None:
+            stops = [(assigned_crane, products)]
+        else:
+            products = {}
+            for _, stop_products in stops:
+                for product_id, quantity in stop_products.items():
+                    products[product_id] = products.get(product_id, 0) + quantity
+        source_warehouse = self.terminal_warehouses[self.cranes[assigned_crane].warehouse_id]
+        target_warehouse = self.product_warehouses.get(self.cranes[unload_crane].warehouse_id)
+        if target_warehouse is None:
+            target_warehouse = next(iter(self.product_warehouses.values()), None)
+        target_position = target_warehouse.position if target_warehouse else source_warehouse.position
+        
+        # 创建主任务
+        task = Task(
+            id=self._unique_task_id(f"ship_task_{plan.id}" if trip is None else f"ship_task_{plan.id}_{trip[0]}"),
+            task_type=TaskType.SHIP_TRANSPORT,
+            details={"plan_id": plan.id}
+        )
+        if trip is not None:
+            task.details.update(trip=trip[0], trips=trip[1])
+        if details:
+            task.details.update(details)
+        
+        # 创建子任务
+        # 1. 框架车头拉框
+        pull_task = SubTask(
+            id=f"pull_{task.id}",
+            task_type=SubTaskType.FRAME_PULLING,
+            assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
+            details={"source_pos": self._position_tuple(self.frames[assigned_frame].position), 
+                    "target_pos": self._position_tuple(self.frame_trucks[assigned_truck].position)}
+        )
+        
+        # 2. (新增) 运输到末端库，3. 末端库装货：多库取货时每个末端库各一对
+        loading_tasks = []
+        position = self.frames[assigned_frame].position
+        for k, (stop_crane, stop_products) in enumerate(stops):
+            suffix = "" if k == 0 else f"_stop{k + 1}"
+            stop_warehouse = self.terminal_warehouses[self.cranes[stop_crane].warehouse_id]
+            loading_tasks.append(SubTask(
+                id=f"transport_to_terminal_{task.id}{suffix}",
+                task_type=SubTaskType.TRANSPORT,
+                assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
+                details=self._transport_details(position, stop_warehouse.position)
+            ))
+            loading_tasks.append(SubTask(
+                id=f"load_{task.id}{suffix}",
+                task_type=SubTaskType.TERMINAL_LOADING,
+                assigned_resources={"crane": stop_crane, "frame": assigned_frame},
+                details={"source_warehouse_id": stop_warehouse.id, "products": stop_products}
+            ))
+            position = stop_warehouse.position
+        
+        # 4. 运输到成品库
+        transport_to_product_task = SubTask(
+            id=f"transport_to_product_{task.id}",
+            task_type=SubTaskType.TRANSPORT,
+            assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
+            details=self._transport_details(position, target_position)
+        )
+        
+        # 5. 成品库卸货
+        unloading_task = SubTask(
+            id=f"unload_{task.id}",
+            task_type=SubTaskType.PRODUCT_UNLOADING,
+            assigned_resources={"crane": unload_crane, "frame": assigned_frame},
+            details={"target_warehouse_id": target_warehouse.id if target_warehouse else "",
+                     "products": products}
+        )
+        
+        # 6. 空框架定位
+        frame_parking_pos = self._find_parking_position(assigned_frame)
+        positioning_task = SubTask(
+            id=f"position_{task.id}",
+            task_type=SubTaskType.FRAME_POSITIONING,
+            assigned_resources={"frame_truck": assigned_truck, "frame": assigned_frame},
+            details=self._transport_details(target_position, frame_parking_pos)
+        )
+        
+        task.sub_tasks = [pull_task, *loading_tasks, transport_to_product_task, unloading_task, positioning_task]
+        self._register_task(task)
+        
+        self.log_event("INFO", f"创建船运任务 {task.id}，分配资源：行车{assigned_crane}, 车头{assigned_truck}, 框架{assigned_frame}")
+        
+        return task
+    
+    def _plan_urgency(self, plan: ShipPlan) -> float:
+        """计划紧急度：优先级数值越小越紧急，距截止时间的松弛越小越紧急"""
+        slack = (plan.deadline - self.clock.now).total_seconds()
+        return (1 + SLACK_REFERENCE / max(slack, SLACK_FLOOR)) / max(plan.priority, 1)
+    
+    def _assign_batch(self, costs: List[List[Optional[float]]], urgencies: List[float]) -> List[int]:
+        """带"不服务"选项的最小费用指派
+        
+        costs[i][j] 为计划 i 使用资源 j 的代价（None 表示不可行）。每个计划另有一列
+        专属的"不服务"虚拟资源，其代价高于全部可行代价之和并按紧急度放大，因此优先
+        服务尽可能多的计划，资源不足时先放弃不紧急的计划。返回每个计划分配的资源下标，未分配为 -1。
+        """
+        if not costs:
+            return []
+        columns = len(costs[0])
+        weighted = [[c * urgencies[i] if c is not None else None for c in row] for i, row in enumerate(costs)]
+        skip_base = 1.0 + sum(max((c for c in row if c is not None), default=0.0) for row in weighted)
+        lowest_urgency = min(urgencies)
+        matrix = []
+        for i, row in enumerate(weighted):
+            skip = [skip_base * urgencies[i] / lowest_urgency if k == i else INFEASIBLE_COST
+                    for k in range(len(costs))]
+            matrix.append([c if c is not None else INFEASIBLE_COST for c in row] + skip)
+        assignment = solve_assignment(matrix)
+        return [j if j < columns and costs[i][j] is not None else -1
+                for i, j in enumerate(assignment)]
+    
+    @timed_phase("schedule_batch")
+    def schedule_ship_plans(self, plan_ids: Optional[List[str]] = None,
+                            split_oversized: bool = False) -> List[Task]:
+        """批量调度船运计划
+        
+        对一批待处理计划统一求解最小费用指派，依次为计划分配末端库行车、框架、车头和
+        成品库行车，代价为行驶距离乘以计划紧急度，然后一次性创建全部任务。
+        plan_ids 为空时调度所有尚未创建任务的计划。
+        
+        split_oversized 为 True 时先按空闲框架中最大的载重和容积把每个计划拆分为多趟，
+        每趟作为指派问题中的一行，只能分配装得下该趟货物的框架；按紧急度依次接纳计划，
+        直到趟数用完空闲的末端库行车、框架或车头，计划的所有趟次都分配到资源时才创建任务。
+        """
+        if plan_ids is None:
+            plan_ids = [plan_id for plan_id in self.ship_plans if plan_id not in self._plan_tasks]
+        
+        validation = self.validate_ship_plans(plan_ids)
+        for plan_id, valid in validation["plans"].items():
+            if not valid:
+                self.log_event("ERROR", f"船运计划 {plan_id} 验证失败")
+                TASK_CREATION_FAILURES["plan_invalid"].inc()
+        plans = [self.ship_plans[plan_id] for plan_id, valid in validation["plans"].items() if valid]
+        if not plans:
+            return []
+        
+        available = self.find_available_resources()
+        
+        # 每一行是一趟运输：(计划, 装载, 趟次)，不拆分时每个计划一行
+        trips: List[Tuple[ShipPlan, Dict[str, int], Optional[Tuple[int, int]]]] = []
+        unserved_plans = set()
+        budget = (min(len(available[category]) for category in ("terminal_cranes", "frames", "frame_trucks"))
+                  if split_oversized else math.inf)
+        for plan in sorted(plans, key=self._plan_urgency, reverse=True) if split_oversized else plans:
+            loads = self._pack_plan(plan, available["frames"]) if split_oversized and available["frames"] else [None]
+            if loads is None:
+                continue
+            if len(loads) > budget:
+                unserved_plans.add(plan.id)
+                continue
+            budget -= len(loads)
+            trips.extend((plan, load if load is not None else plan.products,
+                          (k + 1, len(loads)) if len(loads) > 1 else None) for k, load in enumerate(loads))
+        urgencies = [self._plan_urgency(plan) for plan, _, _ in trips]
+        
+        # 1. 末端库行车：仓库库存需能独立满足本趟装载，代价为到最近成品库的距离
+        def haul_distance(warehouse: Warehouse) -> float:
+            return min((self.travel_distance(warehouse.position, pw.position)
+                        for pw in self.product_warehouses.values()), default=0.0)
+        
+        cranes = available["terminal_cranes"]
+        crane_warehouses = [self.terminal_warehouses[self.cranes[crane_id].warehouse_id] for crane_id in cranes]
+        haul = [haul_distance(warehouse) for warehouse in crane_warehouses]
+        crane_costs = [[haul[j] if all(warehouse.products.get(product_id, 0) >= quantity
+                                        for product_id, quantity in load.items()) else None
+                        for j, warehouse in enumerate(crane_warehouses)]
+                       for _, load, _ in trips]
+        crane_choice = self._assign_batch(crane_costs, urgencies)
+        served = [i for i, j in enumerate(crane_choice) if j >= 0]
+        
+        # 2. 框架：代价为框架到末端库的距离，拆分运输时排除装不下本趟货物的框架
+        frames = available["frames"]
+        sources = {i: crane_warehouses[crane_choice[i]] for i in served}
+        frame_choice = self._assign_batch(
+            [[self.travel_distance(self.frames[frame_id].position, sources[i].position)
+              if not split_oversized or self._frame_can_carry(frame_id, trips[i][1]) else None
+              for frame_id in frames]
+             for i in served], [urgencies[i] for i in served])
+        frame_of = {i: frames[j] for i, j in zip(served, frame_choice) if j >= 0}
+        served = list(frame_of)
+        
+        # 3. 车头：代价为车头到框架的距离
+        trucks = available["frame_trucks"]
+        truck_choice = self._assign_batch(
+            [[self.travel_distance(self.frame_trucks[truck_id].position, self.frames[frame_of[i]].position)
+              for truck_id in trucks] for i in served], [urgencies[i] for i in served])
+        truck_of = {i: trucks[j] for i, j in zip(served, truck_choice) if j >= 0}
+        served = [i for i in served if i in truck_of]
+        
+        # 计划的部分趟次未分配到资源时整个计划都不创建任务
+        unserved_plans.update(trips[i][0].id for i in set(range(len(trips))) - set(served))
+        served = [i for i in served if trips[i][0].id not in unserved_plans]
+        
+        # 4. 成品库行车：代价为末端库到成品库的距离，不足时由末端库行车卸货
+        product_cranes = available["product_cranes"]
+        unload_choice = self._assign_batch(
+            [[self.travel_distance(sources[i].position,
+                                   self.product_warehouses[self.cranes[crane_id].warehouse_id].position)
+              for crane_id in product_cranes] for i in served], [urgencies[i] for i in served])
+        
+        tasks = []
+        for i, j in zip(served, unload_choice):
+            plan, load, trip = trips[i]
+            crane_id = cranes[crane_choice[i]]
+            unload_crane = product_cranes[j] if j >= 0 else crane_id
+            task = self._build_ship_task(plan, crane_id, truck_of[i], frame_of[i], unload_crane, load, trip)
+            tasks.append(task)
+        
+        for plan in plans:
+            if plan.id in unserved_plans:
+                self.log_event("ERROR", f"没有足够的资源执行船运计划 {plan.id}")
+                TASK_CREATION_FAILURES["insufficient_resources"].inc()
+        return tasks
+    
+    def _in_service(self, resource_type: str, resource_id: str) -> bool:
+        resource = self._get_resource(resource_type, resource_id)
+        return resource is not None and resource.status not in (ResourceStatus.MAINTENANCE,
+                                                                ResourceStatus.UNAVAILABLE)
+    
+    def find_first_window(self, resource_type: str, duration: timedelta, after: Optional[datetime] = None,
+                          before: Optional[datetime] = None,
+                          resource_ids: Optional[List[str]] = None) -> Optional[Tuple[datetime, str]]:
+        """在预约日历中查找某类资源最早的空闲时段
+        
+        resource_type 为 "crane"、"frame" 或 "frame_truck"，resource_ids 为空时考虑该类全部在役资源。
+        例如 find_first_window("frame_truck", timedelta(minutes=20), after=今天14点) 返回
+        任意车头 14 点后第一个 20 分钟空闲时段的 (开始时间, 车头ID)，没有时返回 None。
+        """
+        if resource_ids is None:
+            collection = {"crane": self.cranes, "frame": self.frames, "frame_truck": self.frame_trucks}[resource_type]
+            resource_ids = [resource_id for resource_id in collection if self._in_service(resource_type, resource_id)]
+        after = max(after or self.clock.now, self.clock.now)
+        return self.reservations.first_window(resource_type, resource_ids, after, duration, before)
+    
+    def _earliest_common_start(self, requirements: List[Tuple[str, List[str], float, float]], after: datetime,
+                               before: Optional[datetime]) -> Optional[Tuple[datetime, List[str]]]:
+        """多个资源需求同时满足的最早开始时间
+        
+        requirements 为 (资源类型, 可选资源ID, 相对开始时间的偏移秒数, 占用秒数)，每项需求在候选
+        资源中任选一个。从 after 开始，若某项需求在 开始时间+偏移 处没有空闲时段，就把开始时间推迟到
+        它最早的空闲时段，再重新检查全部需求；开始时间只增不减，因此最多推迟到跨过所有相关预约为止。
+        返回 (开始时间, 每项需求选中的资源ID)，任务无法在 before 之前完成时返回 None。
+        """
+        total = max((offset + duration for _, _, offset, duration in requirements), default=0.0)
+        start = after
+        while True:
+            if before is not None and start + timedelta(seconds=total) > before:
+                return None
+            chosen = []
+            for resource_type, resource_ids, offset, duration in requirements:
+                window = self.reservations.first_window(resource_type, resource_ids,
+                                                        start + timedelta(seconds=offset),
+                                                        timedelta(seconds=duration))
+                if window is None:
+                    return None
+                if window[0] > start + timedelta(seconds=offset):
+                    start = window[0] - timedelta(seconds=offset)
+                    break
+                chosen.append(window[1])
+            else:
+                return start, chosen
+    
+    def _live_holds(self) -> List[Tuple[str, str, datetime, datetime]]:
+        """正在执行且没有预约的任务对资源的预计占用 (资源类型, 资源ID, 开始, 结束)
+        
+        从当前时刻起按剩余子任务的估算耗时依次排开，正在进行的子任务扣除已用时间。
+        """
+        holds = []
+        now = self.clock.now
+        for task in self.tasks.values():
+            if task.status != ResourceStatus.BUSY or task.details.get("reservations"):
+                continue
+            start = now
+            for sub_task in task.sub_tasks:
+                if sub_task.end_time is not None:
+                    continue
+                duration = self.estimate_sub_task_duration(sub_task)
+                if sub_task.start_time is not None:
+                    duration = max(0.0, duration - (now - sub_task.start_time).total_seconds())
+                end = start + timedelta(seconds=duration)
+                for resource_type, resource_id in sub_task.assigned_resources.items():
+                    holds.append((resource_type, resource_id, start, end))
+                start = end
+        return holds
+    
+    def _hold_free_parts(self, resource_type: str, resource_id: str, start: datetime, end: datetime,
+                         owner: str):
+        """在 [start, end) 中未被预约的部分登记 owner 的预约"""
+        for reservation in self.reservations.reservations(resource_type, resource_id, None, end):
+            if reservation.end <= start:
+                continue
+            if reservation.start > start:
+                self.reservations.reserve(resource_type, resource_id, start, reservation.start, owner)
+            start = max(start, reservation.end)
+        if start < end:
+            self.reservations.reserve(resource_type, resource_id, start, end, owner)
+    
+    def _nearest_in_service(self, resource_type: str, resources: Dict[str, Any], position: Position,
+                            k: int) -> List[str]:
+        return heapq.nsmallest(k, (resource_id for resource_id in resources
+                                   if self._in_service(resource_type, resource_id)),
+                               key=lambda resource_id: resources[resource_id].position.distance_to(position))
+    
+    @timed_phase("book_ship_plan")
+    def book_ship_plan(self, plan_id: str, earliest: Optional[datetime] = None,
+                       auto_start: bool = True) -> Optional[Task]:
+        """把船运计划预约到资源日历中最早可行的未来时段
+        
+        与 create_ship_transport_task 不同，不要求资源此刻空闲：对每个库存能独立满足计划的
+        末端库，取离它最近的若干框架和离框架最近的若干车头组合，按当前位置估算各子任务耗时，
+        求出车头（拉框和运往末端库、运往成品库和定位两段，中间装货时可被其他任务使用）、框架
+        （整个任务）、末端库行车（装货）和最近成品库行车（卸货）同时空闲的最早开始时间，
+        选择完工最早且不晚于计划截止时间的方案。预约写入 reservations，并记录在任务详情的
+        scheduled_start、reservations 和 auto_start 中；auto_start 为 True 时在开始时间自动提交任务。
+        找不到截止时间前的时段时返回 None。
+        
+        正在执行的未预约任务（直接提交或并行执行的任务）按剩余子任务的估算耗时临时占用日历，
+        查找结束后撤销；已创建但尚未提交的未预约任务没有开始时间，不计入日历。
+        """
+        if not self.validate_ship_plan(plan_id):
+            self.log_event("ERROR", f"船运计划 {plan_id} 验证失败")
+            TASK_CREATION_FAILURES["plan_invalid"].inc()
+            return None
+        plan = self.ship_plans[plan_id]
+        after = max(earliest or self.clock.now, self.clock.now)
+        frames_in_service = [frame_id for frame_id in self.frames if self._in_service("frame", frame_id)]
+        for resource_type, resource_id, start, end in self._live_holds():
+            self._hold_free_parts(resource_type, resource_id, start, end, LIVE_HOLD_OWNER)
+        
+        best = None  # (完工时间, 开始时间, 资源, 需求)
+        try:
+            for warehouse in self.terminal_warehouses.values():
+                if not all(warehouse.products.get(product_id, 0) >= quantity
+                           for product_id, quantity in plan.products.items()):
+                    continue
+                loading_cranes = [crane_id for crane_id in self._cranes_by_warehouse.get(warehouse.id, {})
+                                  if self._in_service("crane", crane_id)]
+                if not loading_cranes or not frames_in_service:
+                    continue
+                target = min(self.product_warehouses.values(),
+                             key=lambda pw: (not self._cranes_by_warehouse.get(pw.id),
+                                             self.travel_distance(warehouse.position, pw.position)),
+                             default=None)
+                unload_cranes = [crane_id for crane_id in self._cranes_by_warehouse.get(target.id, {})
+                                 if self._in_service("crane", crane_id)] if target else []
+                target_position = target.position if target else warehouse.position
+                load_time = self._handling_time(plan.products, self.cranes[loading_cranes[0]])
+                unload_time = (self._handling_time(plan.products, self.cranes[unload_cranes[0]])
+                               if unload_cranes else load_time)
+                to_product = self.travel_distance(warehouse.position, target_position)
+            
+                for frame_id in self._nearest_in_service("frame", self.frames, warehouse.position, BOOKING_CANDIDATES):
+                    frame = self.frames[frame_id]
+                    parking = self._find_parking_position(frame_id)
+                    for truck_id in self._nearest_in_service("frame_truck", self.frame_trucks, frame.position,
+                                                             BOOKING_CANDIDATES):
+                        truck = self.frame_trucks[truck_id]
+                        approach = (self._travel_time(self.travel_distance(truck.position, frame.position), truck)
+                                    + FRAME_COUPLING_TIME
+                                    + self._travel_time(self.travel_distance(frame.position, warehouse.position),
+                                                        truck))
+                        haul = (self._travel_time(to_product, truck) + unload_time
+                                + self._travel_time(self.travel_distance(target_position, parking), truck))
+                        total = approach + load_time + haul
+                        requirements = [
+                            ("frame", [frame_id], 0.0, total),
+                            ("frame_truck", [truck_id], 0.0, approach),
+                            ("frame_truck", [truck_id], approach + load_time, haul),
+                            ("crane", loading_cranes, approach, load_time),
+                        ]
+                        if unload_cranes:
+                            requirements.append(("crane", unload_cranes,
+                                                 approach + load_time + self._travel_time(to_product, truck),
+                                                 unload_time))
+                        found = self._earliest_common_start(requirements, after, plan.deadline)
+                        if found is None:
+                            continue
+                        finish = found[0] + timedelta(seconds=total)
+                        if best is None or finish < best[0]:
+                            best = (finish, found[0], found[1], requirements)
+        finally:
+            self.reservations.cancel(LIVE_HOLD_OWNER)
+        
+        if best is None:
+            self.log_event("ERROR", f"船运计划 {plan_id} 在截止时间 {plan.deadline} 前没有可预约的时段")
+            TASK_CREATION_FAILURES["no_slot"].inc()
+            return None
+        
+        finish, start, chosen, requirements = best
+        frame_id, truck_id, crane_id = chosen[0], chosen[1], chosen[3]
+        unload_crane = chosen[4] if len(chosen) > 4 else crane_id
+        windows = [(resource_type, resource_id, start + timedelta(seconds=offset),
+                    start + timedelta(seconds=offset + duration))
+                   for (resource_type, _, offset, duration), resource_id in zip(requirements, chosen)]
+        task = self._build_ship_task(plan, crane_id, truck_id, frame_id, unload_crane,
+                                     details={"scheduled_start": start, "reservations": windows,
+                                              "auto_start": auto_start})
+        for window in windows:
+            self.reservations.reserve(*window, owner=task.id)
+        if auto_start:
+            self.clock.schedule_at(start, lambda: self._start_booked_task(task.id), f"start {task.id}")
+        self.log_event("INFO", f"船运计划 {plan_id} 预约在 {start.isoformat(timespec='seconds')} 开始，"
+                               f"预计 {finish.isoformat(timespec='seconds')} 完成")
+        return task
+    
+    def _start_booked_task(self, task_id: str):
+        """预约时段开始时提交任务（已被手动提交或删除的任务跳过）"""
+        task = self.tasks.get(task_id)
+        if task is not None and task.start_time is None:
+            self.submit_task(task_id)
+    
+    def _unique_task_id(self, base: str) -> str:
+        """生成未被活动任务或归档任务占用的任务ID，重复时依次追加 _r2、_r3……"""
+        task_id, run = base, 1
+        while task_id in self.tasks or task_id in self.task_archive:
+            run += 1
+            task_id = f"{base}_r{run}"
+        return task_id
+    
+    def _register_task(self, task: Task):
+        """登记新任务并加入待执行队列"""
+        self.tasks[task.id] = task
+        plan_id = task.details.get("plan_id")
+        if plan_id:
+            task_ids = self._plan_tasks.setdefault(plan_id, [])
+            if task.id not in task_ids:
+                task_ids.append(task.id)
+        self.task_queue.push(task.id)
+        self.task_index.add(task)
+        TASKS_CREATED[task.task_type].inc()
+        self._journal("task", task)
+    
+    def _archive_task(self, task: Task):
+        """把已完成任务移出活动任务表，写入列式归档"""
+        if task.id in self.task_archive:
+            # 归档中已有同ID的记录时保留在活动任务表中，避免丢失这次执行的结果
+            self.log_event("WARNING", "任务 %s 已存在归档记录，保留在活动任务表中", task.id, task_id=task.id)
+            return
+        dropped = self.task_archive.append(task)
+        self.tasks.pop(task.id, None)
+        self._journal("archive_task", task.id)
+        for dropped_id in dropped:
+            self.task_index.remove(dropped_id)
+            self._mark_removed("tasks", dropped_id)
+    
+    def _find_warehouse_crane(self, warehouse_id: str) -> Optional[Crane]:
+        """查找仓库关联的行车"""
+        crane_id = next(iter(self._cranes_by_warehouse.get(warehouse_id, {})), None)
+        return self.cranes[crane_id] if crane_id else None
+    
+    @timed_phase("build_internal_transfer_task")
+    def create_internal_transfer_task(self, source_warehouse_id: str, 
+                                    target_warehouse_id: str, 
+                                    products: Dict[str, int]) -> Optional[Task]:
+        """创建内转任务"""
+        self.log_event("INFO", f"创建内转任务: 从 {source_warehouse_id} 到 {target_warehouse_id}")
+
+        # 创建主任务
+        task = Task(
+            id=self._unique_task_id(f"internal_{source_warehouse_id}_{target_warehouse_id}"),
+            task_type=TaskType.INTERNAL_TRANSFER,
+            details={
+                'source_warehouse_id': source_warehouse_id,
+                'target_warehouse_id': target_warehouse_id,
+                'products': products
+            }
+        )
+
+        # 分配资源
+        source_warehouse = self.terminal_warehouses.get(source_warehouse_id)
+        target_warehouse = self.product_warehouses.get(target_warehouse_id)
+        
+        # 假设每个仓库有且仅有一个关联的行车
+        source_crane = self._find_warehouse_crane(source_warehouse_id)
+        target_crane = self._find_warehouse_crane(target_warehouse_id)
+
+        if not all([source_warehouse, target_warehouse, source_crane, target_crane]):
+            self.log_event("ERROR", "创建内转任务失败: 找不到仓库或关联的行车")
+            TASK_CREATION_FAILURES["warehouse_or_crane_missing"].inc()
             return None
 
         # 创建子任务
@@ -443,8 +3108,7 @@ class LogisticsSystem:
             details={
                 'source_warehouse_id': source_warehouse.id,
                 'target_warehouse_id': target_warehouse.id,
-                'source_position': source_warehouse.position.__dict__,
-                'target_position': target_warehouse.position.__dict__
+                **self._transport_details(source_warehouse.position, target_warehouse.position)
             }
         ))
 
@@ -460,102 +3124,1204 @@ class LogisticsSystem:
         ))
 
         task.sub_tasks = sub_tasks
-        self.tasks[task.id] = task
+        self._register_task(task)
         return task
     
-    def execute_task(self, task_id: str) -> bool:
-        """执行任务"""
-        if task_id not in self.tasks:
-            return False
+    def create_outbound_transfer_task(self, source_warehouse_id: str, target_warehouse_id: str,
+                                      handoff_position: Position, products: Dict[str, int],
+                                      task_id: Optional[str] = None) -> Optional[Task]:
+        """创建跨系统内转的出库段：车头拉框到末端库装货，再运到交接点
+
+        目标仓库属于其他系统，本段只校验源仓库。完成后车头挂着框架停在交接点，
+        由调用方把车头和框架交接给目标仓库所在的系统。task_id 为调用方指定的任务ID。
+        """
+        source_warehouse = self.terminal_warehouses.get(source_warehouse_id)
+        source_crane = self._find_warehouse_crane(source_warehouse_id)
+        if source_warehouse is None or source_crane is None:
+            self.log_event("ERROR", "创建出库段失败: 找不到仓库 %s 或关联的行车", source_warehouse_id)
+            TASK_CREATION_FAILURES["warehouse_or_crane_missing"].inc()
+            return None
+        frame_ids = self.find_nearest_idle("frames", source_warehouse.position)
+        if not frame_ids:
+            self.log_event("ERROR", "创建出库段失败: 没有空闲框架")
+            TASK_CREATION_FAILURES["insufficient_resources"].inc()
+            return None
+        frame = self.frames[frame_ids[0]]
+        truck_ids = self.find_nearest_idle("frame_trucks", frame.position)
+        if not truck_ids:
+            self.log_event("ERROR", "创建出库段失败: 没有空闲车头")
+            TASK_CREATION_FAILURES["insufficient_resources"].inc()
+            return None
+        truck_id = truck_ids[0]
         
-        task = self.tasks[task_id]
-        task.status = ResourceStatus.BUSY
-        task.start_time = datetime.now()
+        task = Task(
+            id=self._unique_task_id(task_id or f"outbound_{source_warehouse_id}_{target_warehouse_id}"),
+            task_type=TaskType.INTERNAL_TRANSFER,
+            details={
+                'source_warehouse_id': source_warehouse_id,
+                'target_warehouse_id': target_warehouse_id,
+                'handoff_position': self._position_tuple(handoff_position),
+                'products': products
+            }
+        )
+        carrier = {"frame_truck": truck_id, "frame": frame.id}
+        task.sub_tasks = [
+            SubTask(id=f"pull_{task.id}", task_type=SubTaskType.FRAME_PULLING, assigned_resources=dict(carrier),
+                    details={"source_pos": self._position_tuple(frame.position),
+                             "target_pos": self._position_tuple(self.frame_trucks[truck_id].position)}),
+            SubTask(id=f"transport_to_terminal_{task.id}", task_type=SubTaskType.TRANSPORT,
+                    assigned_resources=dict(carrier),
+                    details=self._transport_details(frame.position, source_warehouse.position)),
+            SubTask(id=f"load_{task.id}", task_type=SubTaskType.TERMINAL_LOADING,
+                    assigned_resources={"crane": source_crane.id, "frame": frame.id},
+                    details={"source_warehouse_id": source_warehouse_id, "products": products}),
+            SubTask(id=f"transport_to_handoff_{task.id}", task_type=SubTaskType.TRANSPORT,
+                    assigned_resources=dict(carrier),
+                    details=self._transport_details(source_warehouse.position, handoff_position))
+        ]
+        self._register_task(task)
+        self.log_event("INFO", "创建出库段 %s，分配资源：行车%s, 车头%s, 框架%s",
+                       task.id, source_crane.id, truck_id, frame.id)
+        return task
+    
+    def create_inbound_transfer_task(self, source_warehouse_id: str, target_warehouse_id: str,
+                                     handoff_position: Position, products: Dict[str, int],
+                                     frame_truck_id: str, task_id: Optional[str] = None) -> Optional[Task]:
+        """创建跨系统内转的入库段：交接来的车头把挂着的框架从交接点运到成品库卸货，再停放空框架
+
+        task_id 为调用方指定的任务ID。
+        """
+        target_warehouse = self.product_warehouses.get(target_warehouse_id)
+        target_crane = self._find_warehouse_crane(target_warehouse_id)
+        truck = self.frame_trucks.get(frame_truck_id)
+        frame = self.frames.get(truck.attached_frame_id) if truck else None
+        if target_warehouse is None or target_crane is None or frame is None:
+            self.log_event("ERROR", "创建入库段失败: 找不到仓库 %s、关联的行车或车头挂接的框架", target_warehouse_id)
+            TASK_CREATION_FAILURES["warehouse_or_crane_missing"].inc()
+            return None
         
-        self.log_event("INFO", f"开始执行任务 {task_id}")
+        task = Task(
+            id=self._unique_task_id(task_id or f"inbound_{source_warehouse_id}_{target_warehouse_id}"),
+            task_type=TaskType.INTERNAL_TRANSFER,
+            details={
+                'source_warehouse_id': source_warehouse_id,
+                'target_warehouse_id': target_warehouse_id,
+                'handoff_position': self._position_tuple(handoff_position),
+                'products': products
+            }
+        )
+        carrier = {"frame_truck": truck.id, "frame": frame.id}
+        task.sub_tasks = [
+            SubTask(id=f"transport_from_handoff_{task.id}", task_type=SubTaskType.TRANSPORT,
+                    assigned_resources=dict(carrier),
+                    details=self._transport_details(handoff_position, target_warehouse.position)),
+            SubTask(id=f"unload_{task.id}", task_type=SubTaskType.PRODUCT_UNLOADING,
+                    assigned_resources={"crane": target_crane.id, "frame": frame.id},
+                    details={"target_warehouse_id": target_warehouse_id, "products": products}),
+            SubTask(id=f"position_{task.id}", task_type=SubTaskType.FRAME_POSITIONING,
+                    assigned_resources=dict(carrier),
+                    details=self._transport_details(target_warehouse.position,
+                                                    self._find_parking_position(frame.id)))
+        ]
+        self._register_task(task)
+        self.log_event("INFO", "创建入库段 %s，分配资源：行车%s, 车头%s, 框架%s",
+                       task.id, target_crane.id, truck.id, frame.id)
+        return task
+    
+    def _find_parking_position(self, frame_id: str) -> Position:
+        """查找空框架的停放位置（框架加入系统时的原始位置）"""
+        parking = self.parking_positions.get(frame_id)
+        if parking is None:
+            parking = self.frames[frame_id].position
+        return Position(parking.x, parking.y)
+    
+    def _get_resource(self, resource_type: str, resource_id: str):
+        """按资源类型查找资源对象"""
+        if resource_type == "crane":
+            return self.cranes.get(resource_id)
+        elif resource_type == "frame_truck":
+            return self.frame_trucks.get(resource_id)
+        elif resource_type == "frame":
+            return self.frames.get(resource_id)
+        return None
+    
+    @staticmethod
+    def _as_position(value: Any) -> Optional[Position]:
+        """将子任务详情中的位置（Position、(x, y) 或 dict）统一为 Position"""
+        if value is None or isinstance(value, Position):
+            return value
+        if isinstance(value, dict):
+            return Position(value["x"], value["y"])
+        return Position(value[0], value[1])
+    
+    @staticmethod
+    def _position_tuple(position: Position) -> Tuple[int, int]:
+        """子任务详情中位置的紧凑表示"""
+        return (position.x, position.y)
+    
+    def precompute_routes(self) -> int:
+        """以仓库占地为障碍，预计算仓库与框架停放位之间的路径表"""
+        warehouses = list(self.terminal_warehouses.values()) + list(self.product_warehouses.values())
+        self.path_planner.set_blocked((wh.position.x, wh.position.y) for wh in warehouses)
+        landmarks = [(wh.position.x, wh.position.y) for wh in warehouses]
+        landmarks += [(pos.x, pos.y) for pos in self.parking_positions.values()]
+        self._routes_dirty = False
+        return self.path_planner.precompute(landmarks)
+    
+    def plan_route(self, source: Position, target: Position) -> Tuple[float, List[Position]]:
+        """规划两点之间绕开仓库的路径，返回 (网格距离, 途经位置)"""
+        if self._routes_dirty:
+            self.precompute_routes()
+        distance, cells = self.path_planner.route((source.x, source.y), (target.x, target.y))
+        if math.isinf(distance):
+            # 被障碍完全隔断时按直线距离估算
+            return source.distance_to(target), [source, target]
+        return distance, [Position(x, y) for x, y in cells]
+    
+    def travel_distance(self, source: Position, target: Position) -> float:
+        """两点之间的行驶距离（网格单位）"""
+        return self.plan_route(source, target)[0]
+    
+    def _transport_details(self, source: Position, target: Position) -> Dict[str, Any]:
+        """运输类子任务的详情：起止位置、路径和行驶距离"""
+        distance, route = self.plan_route(source, target)
+        return {
+            "source_position": self._position_tuple(source),
+            "target_position": self._position_tuple(target),
+            "route": tuple(self._position_tuple(pos) for pos in route),
+            "distance": distance
+        }
+    
+    def _travel_time(self, distance: float, truck: Optional[FrameTruck]) -> float:
+        """按网格距离和车头速度计算行驶耗时（秒）"""
+        speed = truck.speed if truck and truck.speed > 0 else DEFAULT_TRANSPORT_SPEED
+        return distance * GRID_CELL_LENGTH / speed
+    
+    def estimate_sub_task_duration(self, sub_task: SubTask) -> float:
+        """估算子任务耗时（秒）"""
+        resources = sub_task.assigned_resources
+        truck = self.frame_trucks.get(resources.get("frame_truck", ""))
         
-        for sub_task in task.sub_tasks:
-            if not self.execute_sub_task(sub_task):
-                task.status = ResourceStatus.UNAVAILABLE
-                self.log_event("ERROR", f"任务 {task_id} 执行失败")
-                return False
+        if sub_task.task_type == SubTaskType.FRAME_PULLING:
+            frame = self.frames.get(resources.get("frame", ""))
+            distance = self.travel_distance(truck.position, frame.position) if truck and frame else 0.0
+            return self._travel_time(distance, truck) + FRAME_COUPLING_TIME
         
-        task.status = ResourceStatus.IDLE
-        task.end_time = datetime.now()
-        self.log_event("INFO", f"任务 {task_id} 执行完成")
+        if sub_task.task_type in (SubTaskType.TRANSPORT, SubTaskType.FRAME_POSITIONING):
+            source = self._as_position(sub_task.details.get("source_position"))
+            target = self._as_position(sub_task.details.get("target_position"))
+            if source is None and truck:
+                source = truck.position
+            if source is None or target is None:
+                return 0.0
+            duration = self._travel_time(self.travel_distance(source, target), truck)
+            frame = self.frames.get(resources.get("frame", ""))
+            if truck and frame and truck.attached_frame_id != frame.id:
+                # 框架装卸期间车头去执行了其他任务的子任务：先回到框架处重新挂接
+                duration += (self._travel_time(self.travel_distance(truck.position, frame.position), truck)
+                             + FRAME_COUPLING_TIME)
+            return duration
         
+        return self._handling_time(sub_task.details.get("products", {}), self.cranes.get(resources.get("crane", "")))
+    
+    def _handling_time(self, products: Dict[str, int], crane: Optional[Crane]) -> float:
+        """装卸货耗时（秒）：按货物总重和行车单次起重量计算吊运次数"""
+        weight = sum(self.products[product_id].weight * quantity
+                     for product_id, quantity in products.items()
+                     if product_id in self.products)
+        if crane and crane.load_capacity > 0:
+            cycles = max(1, math.ceil(weight / crane.load_capacity))
+        else:
+            cycles = 1
+        return cycles * CRANE_CYCLE_TIME
+    
+    def _sub_task_resources_ready(self, sub_task: SubTask) -> Optional[bool]:
+        """检查子任务资源：全部空闲返回 True，有资源忙碌返回 False，资源不存在返回 None"""
+        for resource_type, resource_id in sub_task.assigned_resources.items():
+            resource = self._get_resource(resource_type, resource_id)
+            if resource is None:
+                return None
+            if resource.status != ResourceStatus.IDLE:
+                return False
         return True
     
-    def execute_sub_task(self, sub_task: SubTask) -> bool:
-        """执行子任务"""
+    def _begin_sub_task(self, sub_task: SubTask) -> float:
+        """占用子任务资源并返回子任务耗时"""
+        duration = self.estimate_sub_task_duration(sub_task)
+        SUB_TASK_SIMULATED_DURATIONS[sub_task.task_type].observe(duration)
         sub_task.status = ResourceStatus.BUSY
-        sub_task.start_time = datetime.now()
-        
-        # 更新资源状态
-        for resource_type, resource_id in sub_task.assigned_resources.items():
-            if resource_type == "crane":
-                self.cranes[resource_id].status = ResourceStatus.BUSY
-            elif resource_type == "frame_truck":
-                self.frame_trucks[resource_id].status = ResourceStatus.BUSY
-            elif resource_type == "frame":
-                self.frames[resource_id].status = ResourceStatus.BUSY
-        
-        # 模拟任务执行
-        import time
-        time.sleep(0.1)  # 模拟任务执行时间
-        
-        # 恢复资源状态
+        sub_task.start_time = self.clock.now
+        sub_task.end_time = None
         for resource_type, resource_id in sub_task.assigned_resources.items():
-            if resource_type == "crane":
-                self.cranes[resource_id].status = ResourceStatus.IDLE
-            elif resource_type == "frame_truck":
-                self.frame_trucks[resource_id].status = ResourceStatus.IDLE
-            elif resource_type == "frame":
-                self.frames[resource_id].status = ResourceStatus.IDLE
+            self._get_resource(resource_type, resource_id).status = ResourceStatus.BUSY
+        return duration
+    
+    def _end_sub_task(self, sub_task: SubTask):
+        """完成子任务：移动车头和框架，释放资源"""
+        resources = sub_task.assigned_resources
+        truck = self.frame_trucks.get(resources.get("frame_truck", ""))
+        frame = self.frames.get(resources.get("frame", ""))
+        
+        if sub_task.task_type == SubTaskType.FRAME_PULLING:
+            if truck and frame:
+                truck.position = Position(frame.position.x, frame.position.y)
+                truck.attached_frame_id = frame.id
+        elif sub_task.task_type in (SubTaskType.TRANSPORT, SubTaskType.FRAME_POSITIONING):
+            if truck and frame:
+                truck.attached_frame_id = frame.id
+            target = self._as_position(sub_task.details.get("target_position"))
+            if target is not None:
+                for resource in (truck, frame):
+                    if resource:
+                        resource.position = Position(target.x, target.y)
+            if sub_task.task_type == SubTaskType.FRAME_POSITIONING and truck:
+                truck.attached_frame_id = ""
+        
+        for resource_type, resource_id in resources.items():
+            self._get_resource(resource_type, resource_id).status = ResourceStatus.IDLE
         
         sub_task.status = ResourceStatus.IDLE
-        sub_task.end_time = datetime.now()
+        sub_task.end_time = self.clock.now
+        
+        self.log_event("INFO", "子任务 %s (%s) 执行完成", sub_task.id, sub_task.task_type.value,
+                       sub_task_id=sub_task.id)
+    
+    def _start_sub_task(self, task: Task, index: int):
+        """启动任务的第 index 个子任务，资源忙碌时进入等待队列"""
+        if index >= len(task.sub_tasks):
+            task.status = ResourceStatus.IDLE
+            task.end_time = self.clock.now
+            self.log_event("INFO", "任务 %s 执行完成", task.id, task_id=task.id)
+            self._journal_task_state(task)
+            self._finish_task(task, True)
+            if self.archive_completed_tasks:
+                self._archive_task(task)
+            return
+        
+        sub_task = task.sub_tasks[index]
+        ready = self._sub_task_resources_ready(sub_task)
+        if ready is None:
+            sub_task.status = ResourceStatus.UNAVAILABLE
+            task.status = ResourceStatus.UNAVAILABLE
+            self.log_event("ERROR", f"任务 {task.id} 执行失败：子任务 {sub_task.id} 的资源不存在")
+            self._journal_task_state(task)
+            self._finish_task(task, False)
+            return
+        if not ready or not self._may_borrow_truck(task, index):
+            self._waiting_sub_tasks.append((task, index))
+            self._journal_task_state(task)
+            return
+        
+        duration = self._begin_sub_task(sub_task)
+        frame_id = sub_task.assigned_resources.get("frame")
+        if frame_id and "frame_truck" not in sub_task.assigned_resources:
+            self._handling_due[frame_id] = self.clock.now + timedelta(seconds=duration)
+        self._journal_task_state(task)
+        self.clock.schedule(duration, lambda: self._complete_sub_task(task, index),
+                            f"complete {sub_task.id}")
+    
+    def _may_borrow_truck(self, task: Task, index: int) -> bool:
+        """车头挂着其他任务正在装卸的框架时，判断本任务能否借用车头
+        
+        本任务会连续占用车头直到下一个不用车头的子任务，借用只在车头能在对方框架装卸完成前
+        驶回并重新挂接时允许，否则借用会推迟对方任务、拉长总完工时间，本任务继续等待。
+        对方框架不在装卸中（例如在等待行车）时车头本来就空闲，允许借用。
+        """
+        sub_task = task.sub_tasks[index]
+        truck = self.frame_trucks.get(sub_task.assigned_resources.get("frame_truck", ""))
+        if truck is None or not truck.attached_frame_id \
+                or truck.attached_frame_id == sub_task.assigned_resources.get("frame"):
+            return True
+        attached = self.frames.get(truck.attached_frame_id)
+        due = self._handling_due.get(truck.attached_frame_id)
+        if attached is None or due is None or due <= self.clock.now:
+            return True
+        
+        busy = self.estimate_sub_task_duration(sub_task)
+        position = truck.position
+        for k in range(index, len(task.sub_tasks)):
+            step = task.sub_tasks[k]
+            if "frame_truck" not in step.assigned_resources:
+                break
+            if k > index:
+                busy += self._travel_time(step.details.get("distance", 0.0), truck)
+            if step.task_type == SubTaskType.FRAME_PULLING:
+                frame = self.frames.get(step.assigned_resources.get("frame", ""))
+                position = frame.position if frame else position
+            else:
+                position = self._as_position(step.details.get("target_position")) or position
+        busy += self._travel_time(self.travel_distance(position, attached.position), truck) + FRAME_COUPLING_TIME
+        return busy <= (due - self.clock.now).total_seconds()
+    
+    @timed_phase("sub_task_completion")
+    def _complete_sub_task(self, task: Task, index: int):
+        """子任务完成事件：释放资源，启动后续子任务并唤醒等待中的子任务"""
+        self._end_sub_task(task.sub_tasks[index])
+        self._start_sub_task(task, index + 1)
+        
+        waiting, self._waiting_sub_tasks = self._waiting_sub_tasks, []
+        for waiting_task, waiting_index in waiting:
+            self._start_sub_task(waiting_task, waiting_index)
+    
+    def _finish_task(self, task: Task, success: bool):
+        """任务结束时通知提交方"""
+        TASKS_FINISHED[success].inc()
+        self.reservations.cancel(task.id)
+        callback = self._task_callbacks.pop(task.id, None)
+        if callback is not None:
+            callback(task, success)
+    
+    def submit_task(self, task_id: str,
+                    on_complete: Optional[Callable[[Task, bool], None]] = None) -> bool:
+        """提交任务到仿真时钟，任务在 run_simulation 推进时执行"""
+        if task_id not in self.tasks:
+            return False
         
-        self.log_event("INFO", f"子任务 {sub_task.id} ({sub_task.task_type.value}) 执行完成")
+        task = self.tasks[task_id]
+        self.task_queue.remove(task_id)
+        if on_complete is not None:
+            self._task_callbacks[task_id] = on_complete
+        task.status = ResourceStatus.BUSY
+        task.start_time = self.clock.now
+        task.end_time = None
         
+        self.log_event("INFO", "开始执行任务 %s", task_id, task_id=task_id)
+        self._start_sub_task(task, 0)
         return True
     
-    def log_event(self, level: str, message: str):
-        """记录事件日志"""
-        self.execution_log.append({
-            "timestamp": datetime.now().isoformat(),
-            "level": level,
-            "message": message
-        })
-        print(f"[{level}] {message}")
+    def run_simulation(self, until: Optional[datetime] = None) -> int:
+        """推进仿真时钟，返回处理的事件数"""
+        return self.clock.run(until=until)
+    
+    def execute_task(self, task_id: str) -> bool:
+        """执行任务（推进仿真时钟直到任务结束）"""
+        if not self.submit_task(task_id):
+            return False
+        
+        task = self.tasks[task_id]
+        self.clock.run(stop_condition=lambda: task.status != ResourceStatus.BUSY)
+        
+        if task.status == ResourceStatus.BUSY:
+            # 事件队列已空但任务仍在等待资源，资源不会再被释放
+            self._abort_waiting_task(task)
+        
+        if task.status != ResourceStatus.IDLE:
+            self.log_event("ERROR", f"任务 {task_id} 执行失败")
+            return False
+        return True
+    
+    def _abort_waiting_task(self, task: Task):
+        """放弃在事件队列耗尽后仍等待资源的任务：移出等待队列，任务和等待中的子任务标记为不可用"""
+        remaining = []
+        for waiting_task, index in self._waiting_sub_tasks:
+            if waiting_task is task:
+                task.sub_tasks[index].status = ResourceStatus.UNAVAILABLE
+            else:
+                remaining.append((waiting_task, index))
+        self._waiting_sub_tasks = remaining
+        task.status = ResourceStatus.UNAVAILABLE
+        self._journal_task_state(task)
+        self._finish_task(task, False)
+    
+    def execute_sub_task(self, sub_task: SubTask) -> bool:
+        """执行子任务（推进仿真时钟至子任务完成）"""
+        if not self._sub_task_resources_ready(sub_task):
+            return False
+        
+        duration = self._begin_sub_task(sub_task)
+        self.clock.schedule(duration, lambda: self._end_sub_task(sub_task), f"complete {sub_task.id}")
+        self.clock.run(stop_condition=lambda: sub_task.end_time is not None)
+        return True
+    
+    def execute_tasks(self, task_ids: List[str], max_concurrent_tasks: int = 10,
+                      pipelined: bool = False) -> Dict[str, bool]:
+        """并行执行多个任务，互不冲突的任务在仿真时间上同时进行
+        
+        pipelined 为 True 时任务只在整个执行期间独占框架，行车和车头按子任务占用，
+        框架装卸货期间车头可以去执行其他任务的子任务；为 False（默认）时任务独占全部资源。
+        """
+        executor = ParallelTaskExecutor(self, max_concurrent_tasks, pipelined)
+        return executor.execute_tasks(task_ids)
+    
+    def log_event(self, level: str, message: str, *args, **fields):
+        """记录事件日志，message 可使用 % 占位符延迟格式化"""
+        if self.event_log.enabled(level):
+            record = self.event_log.emit(level, message, args, sim_time=self.clock.now.isoformat(), **fields)
+            self.version += 1  # 最近日志是系统状态的一部分
+            if self._subscribers:
+                self._publish({"type": "log", "record": record})
     
     def get_system_status(self) -> Dict[str, Any]:
-        """获取系统状态"""
-        return {
+        """获取系统状态，同一版本内复用上次构建的结果
+
+        版本变化时按 changes_since 只更新上次构建以来有实体变化的部分，未变化的部分与
+        上一版本共享（返回的状态不会再被修改）。
+        """
+        cached_version, previous = self._status_cache
+        if cached_version == self.version:
+            return previous
+        started = time.perf_counter()
+        version = self.version
+        changes = {collection: self.changes_since(collection, cached_version) if previous else None
+                   for collection in ("terminal_warehouses", "product_warehouses", "cranes",
+                                      "frames", "frame_trucks", "tasks")}
+        
+        def changed(*collections) -> bool:
+            return any(changes[collection] is None or changes[collection][0] or changes[collection][1]
+                       for collection in collections)
+        
+        def warehouse_section(kind: str, warehouses: Dict[str, Warehouse]):
+            def build(warehouse_id):
+                warehouse = warehouses.get(warehouse_id)
+                return {"position": str(warehouse.position), "products": dict(warehouse.products)} \
+                    if warehouse is not None else None
+            return _apply_changes(previous["warehouses"][kind] if previous else None,
+                                  changes[f"{kind}_warehouses"], build,
+                                  lambda: {warehouse_id: build(warehouse_id) for warehouse_id in warehouses})
+        
+        def status_section(category: str, section_changes, entities, members):
+            def build(resource_id):
+                return entities[resource_id].status.value if resource_id in members else None
+            return _apply_changes(previous["resources"][category] if previous else None, section_changes,
+                                  build, lambda: {resource_id: build(resource_id) for resource_id in members})
+        
+        # 行车的类别随所属仓库变化，仓库有变化时整体重建
+        crane_changes = None if changed("terminal_warehouses", "product_warehouses") else changes["cranes"]
+        resources = {
+            category: status_section(category, crane_changes, self.cranes, self._cranes_by_kind[category])
+            for category in ("terminal_cranes", "product_cranes")
+        }
+        resources.update({
+            "frame_trucks": status_section("frame_trucks", changes["frame_trucks"], self.frame_trucks,
+                                           self.frame_trucks),
+            "frames": status_section("frames", changes["frames"], self.frames, self.frames),
+            "storage_positions": previous["resources"]["storage_positions"]
+            if previous and not changed("product_warehouses") else
+            {pos_id: "occupied" if pos_id in pw.storage_positions else "available"
+             for pw in self.product_warehouses.values() for pos_id in pw.storage_positions},
+        })
+        if previous and not changed("tasks"):
+            active_tasks, completed_task_count = previous["active_tasks"], previous["completed_task_count"]
+        else:
+            active_tasks = {task_id: status.value for task_id, status in self.task_index.non_idle()
+                            if task_id in self.tasks}
+            completed_task_count = len(self.task_archive) + sum(
+                1 for task in self.tasks.values() if task.end_time is not None)
+        status = {
+            "version": version,
             "warehouses": {
-                "terminal": {wh.id: {"position": str(wh.position), "products": wh.products} 
-                           for wh in self.terminal_warehouses.values()},
-                "product": {wh.id: {"position": str(wh.position), "products": wh.products} 
-                          for wh in self.product_warehouses.values()}
+                "terminal": warehouse_section("terminal", self.terminal_warehouses),
+                "product": warehouse_section("product", self.product_warehouses)
             },
-            "resources": self.get_resource_status(),
-            "active_tasks": {task.id: task.status.value for task in self.tasks.values() 
-                           if task.status != ResourceStatus.IDLE},
-            "recent_logs": self.execution_log[-10:]  # 最近10条日志
+            "resources": resources,
+            "active_tasks": active_tasks,
+            "completed_task_count": completed_task_count,
+            "recent_logs": self.event_log.recent(10)  # 最近10条日志
         }
+        self._status_cache = (version, status)
+        STATUS_BUILD_DURATION.observe(time.perf_counter() - started)
+        return status
+    
+    def metric_gauges(self) -> List[Tuple[str, str, Dict[str, Any], float]]:
+        """当前的仪表盘指标：各类空闲资源数、待执行队列深度、活动任务数、等待资源的子任务数和状态版本号"""
+        gauges = [("logistics_idle_resources", "空闲资源数", {"category": category}, len(resources))
+                  for category, resources in self.idle_resources.items()]
+        gauges += [
+            ("logistics_task_queue_depth", "待执行任务队列深度", {}, len(self.task_queue)),
+            ("logistics_active_tasks", "活动（未归档）任务数", {}, len(self.tasks)),
+            ("logistics_waiting_sub_tasks", "等待资源释放的子任务数", {}, len(self._waiting_sub_tasks)),
+            ("logistics_state_version", "系统状态版本号", {}, self.version),
+        ]
+        return gauges
     
     def optimize_task_scheduling(self) -> List[str]:
-        """优化任务调度（简单的优先级排序）"""
-        # 根据任务类型和紧急程度排序
-        pending_tasks = [task for task in self.tasks.values() if task.status == ResourceStatus.IDLE]
+        """优化任务调度：按当前调度策略返回待执行任务的顺序"""
+        return self.task_queue.ordered()
+    
+    def set_scheduling_policy(self, policy) -> None:
+        """设置调度策略，可传入策略名（edf/weighted_slack/priority_class）或策略函数"""
+        if isinstance(policy, str):
+            policy = SCHEDULING_POLICIES[policy]
+        self.task_queue.set_policy(policy)
+    
+    def pop_next_task(self) -> Optional[str]:
+        """取出最优先的待执行任务ID"""
+        return self.task_queue.pop()
+    
+    def update_ship_plan(self, plan_id: str, deadline: Optional[datetime] = None,
+                         priority: Optional[int] = None) -> bool:
+        """修改船运计划的截止时间或优先级，并调整相关任务在队列中的位置"""
+        plan = self.ship_plans.get(plan_id)
+        if plan is None:
+            return False
+        if deadline is not None:
+            plan.deadline = deadline
+        if priority is not None:
+            plan.priority = priority
+        for task_id in self._plan_tasks.get(plan_id, []):
+            self.task_queue.update(task_id)
+        self._journal("update_ship_plan", plan_id, deadline, priority)
+        return True
+    
+    def _journal(self, op: str, *args):
+        """记录一次状态变更：推进版本号，通知订阅者并追加到预写日志"""
+        self.version += 1
+        entity = self._changed_entity(op, args)
+        if entity is not None:
+            self._touch(*entity)
+        if self._subscribers:
+            event = self._change_event(op, args)
+            if event is not None:
+                self._publish(event)
+        if self.persistence is None:
+            return
+        if self.persistence.append((op, args)):
+            self.save_snapshot()
+    
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        """订阅状态变更事件，事件为带 type 和 version 字段的可 JSON 序列化字典"""
+        self._subscribers.append(listener)
+    
+    def unsubscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        """取消订阅"""
+        if listener in self._subscribers:
+            self._subscribers.remove(listener)
+    
+    def _publish(self, event: Dict[str, Any]):
+        event["version"] = self.version
+        for listener in list(self._subscribers):
+            listener(event)
+    
+    def _change_event(self, op: str, args: tuple) -> Optional[Dict[str, Any]]:
+        """把预写日志记录转换为推送给前端的变更事件"""
+        if op == "resource":
+            type_name, resource_id, field_name, value = args
+            collection = self._RESOURCE_COLLECTIONS[type_name]
+            category = self.crane_kinds.get(resource_id) if type_name == "Crane" else collection
+            return {"type": "resource", "collection": collection, "category": category,
+                    "id": resource_id, "field": field_name, "value": _json_value(value)}
+        if op == "inventory":
+            is_terminal, warehouse_id, product_id, delta = args
+            warehouses = self.terminal_warehouses if is_terminal else self.product_warehouses
+            return {"type": "inventory",
+                    "collection": "terminal_warehouses" if is_terminal else "product_warehouses",
+                    "id": warehouse_id, "product_id": product_id, "delta": delta,
+                    "quantity": warehouses[warehouse_id].products.get(product_id, 0)}
+        if op == "task":
+            return {"type": "task", "task": task_to_dict(args[0])}
+        if op == "task_state":
+            task = self.tasks.get(args[0])
+            return {"type": "task", "task": task_to_dict(task)} if task is not None else None
+        if op.startswith("add_"):
+            return {"type": "entity_added", "kind": op[4:], "id": args[0].id}
+        if op == "release_resource":
+            return {"type": "entity_removed", "collection": args[0], "id": args[1]}
+        return None
+    
+    def _changed_entity(self, op: str, args: tuple) -> Optional[Tuple[str, str]]:
+        """预写日志记录所修改的实体（集合名, 实体ID）"""
+        if op == "resource":
+            return self._RESOURCE_COLLECTIONS[args[0]], args[1]
+        if op == "inventory":
+            return ("terminal_warehouses" if args[0] else "product_warehouses"), args[1]
+        if op == "task":
+            return "tasks", args[0].id
+        if op in ("task_state", "archive_task"):
+            return "tasks", args[0]
+        if op == "update_ship_plan":
+            return "ship_plans", args[0]
+        if op in self._ADDED_COLLECTIONS:
+            return self._ADDED_COLLECTIONS[op], args[0].id
+        return None
+    
+    def _touch(self, collection: str, entity_id: str):
+        """把实体的最后修改版本更新为当前版本"""
+        self.entity_versions.setdefault(collection, {})[entity_id] = self.version
+        self.change_log.append(self.version, collection, entity_id)
+    
+    def _mark_removed(self, collection: str, entity_id: str):
+        """记录实体被删除"""
+        self.entity_versions.get(collection, {}).pop(entity_id, None)
+        self.change_log.append(self.version, collection, entity_id, removed=True)
+    
+    def changes_since(self, collection: str, since: int) -> Optional[Tuple[List[str], List[str]]]:
+        """版本 since 之后被创建/修改和被删除的实体ID
+
+        耗时与变更数成正比。since 超出当前版本或早于已丢弃的变更记录时返回 None，
+        调用方应改为全量同步。
+        """
+        return self.change_log.view().since(collection, since, self.version)
+    
+    def get_task_dict(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """活动任务或归档任务的 API 表示"""
+        task = self.tasks.get(task_id)
+        return task_to_dict(task) if task is not None else self.task_archive.get(task_id)
+    
+    def query_tasks(self, status: Optional[ResourceStatus] = None, task_type: Optional[TaskType] = None,
+                    warehouse_id: Optional[str] = None, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, cursor: Optional[int] = None, limit: int = 100,
+                    descending: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """按条件分页查询任务（含归档任务），返回 (任务列表, 下一页游标)
+
+        任务按创建顺序排列，游标为任务序号。类型、仓库、非空闲状态和时间窗口（与 [start, end]
+        有交集的已开始任务）走索引，取候选最少的一个，其余条件在候选任务上过滤。
+        """
+        return _filter_tasks(self.task_index.scan(task_type, warehouse_id, cursor, descending, status, start, end),
+                             self.get_task_dict, status, start, end, limit, descending)
+    
+    def _journal_task_state(self, task: Task):
+        """记录任务及其子任务的执行状态"""
+        self.task_index.update(task)
+        self._journal("task_state", task.id, task.status, task.start_time, task.end_time,
+                      tuple((sub_task.status, sub_task.start_time, sub_task.end_time)
+                            for sub_task in task.sub_tasks))
+    
+    def _snapshot_state(self) -> Dict[str, Any]:
+        """系统状态的可序列化视图"""
+        return {
+            "grid_size": self.grid_size,
+            "products": list(self.products.values()),
+            "terminal_warehouses": list(self.terminal_warehouses.values()),
+            "product_warehouses": list(self.product_warehouses.values()),
+            "cranes": list(self.cranes.values()),
+            "frames": list(self.frames.values()),
+            "frame_trucks": list(self.frame_trucks.values()),
+            "ship_plans": list(self.ship_plans.values()),
+            "tasks": list(self.tasks.values()),
+            "task_archive": self.task_archive,
+            "plan_tasks": self._plan_tasks,
+            "task_index": self.task_index,
+            "parking_positions": self.parking_positions,
+            "clock": self.clock.now,
+            "version": self.version
+        }
+    
+    def save_snapshot(self):
+        """生成快照并清理旧的预写日志"""
+        if self.persistence is not None:
+            self.persistence.write_snapshot(self._snapshot_state())
+    
+    @contextmanager
+    def transaction(self):
+        """把一组变更作为一条预写日志记录原子写入，崩溃恢复时要么全部生效，要么全部丢弃"""
+        store = self.persistence
+        if store is None or store.in_transaction:
+            yield
+            return
+        store.begin()
+        try:
+            yield
+        finally:
+            if store.commit():
+                self.save_snapshot()
+    
+    def enable_persistence(self, directory: str, snapshot_interval: int = SNAPSHOT_INTERVAL,
+                           fsync: bool = False):
+        """开启持久化：以当前状态写入快照，之后的变更写入预写日志"""
+        self.persistence = PersistenceStore(directory, snapshot_interval, fsync)
+        self.save_snapshot()
+    
+    @classmethod
+    def restore(cls, directory: str, snapshot_interval: int = SNAPSHOT_INTERVAL,
+                fsync: bool = False) -> 'LogisticsSystem':
+        """从最新快照和其后的预写日志恢复系统"""
+        store = PersistenceStore(directory, snapshot_interval, fsync)
+        state, records = store.load()
+        system = cls(grid_size=state["grid_size"]) if state else cls()
+        if state:
+            system._load_state(state)
+        for record in records:
+            system._apply_journal_record(*record)
+        system.persistence = store
+        system._recover_interrupted_tasks()
+        system._rearm_booked_tasks()
+        return system
+    
+    def _load_state(self, state: Dict[str, Any]):
+        for product in state["products"]:
+            self.add_product(product)
+        for warehouse in state["terminal_warehouses"]:
+            self.add_terminal_warehouse(warehouse)
+        for warehouse in state["product_warehouses"]:
+            self.add_product_warehouse(warehouse)
+        for crane in state["cranes"]:
+            self.add_crane(crane)
+        self.parking_positions.update(state["parking_positions"])
+        for frame in state["frames"]:
+            self.add_frame(frame)
+        for truck in state["frame_trucks"]:
+            self.add_frame_truck(truck)
+        for plan in state["ship_plans"]:
+            self.add_ship_plan(plan)
+        for task in state["tasks"]:
+            self._restore_task(task)
+        self.task_archive = state["task_archive"]
+        self.task_index = state["task_index"]
+        self._plan_tasks = state["plan_tasks"]
+        self.clock.now = state["clock"]
+        self.version = max(self.version, state.get("version", 0))
+    
+    def _restore_task(self, task: Task):
+        self.tasks[task.id] = task
+        self.task_index.add(task)
+        plan_id = task.details.get("plan_id")
+        if plan_id and task.id not in self._plan_tasks.setdefault(plan_id, []):
+            self._plan_tasks[plan_id].append(task.id)
+        if task.start_time is None:
+            self.task_queue.push(task.id)
+        if task.end_time is None:
+            for window in task.details.get("reservations", ()):
+                self.reservations.reserve(*window, owner=task.id)
+    
+    def _apply_journal_record(self, op: str, args: tuple):
+        """重放一条预写日志记录"""
+        if op.startswith("add_"):
+            getattr(self, op)(*args)
+        elif op == "resource":
+            type_name, resource_id, field_name, value = args
+            resources = {"Crane": self.cranes, "Frame": self.frames, "FrameTruck": self.frame_trucks}[type_name]
+            if resource_id in resources:
+                setattr(resources[resource_id], field_name, value)
+        elif op == "inventory":
+            is_terminal, warehouse_id, product_id, delta = args
+            warehouses = self.terminal_warehouses if is_terminal else self.product_warehouses
+            warehouse = warehouses.get(warehouse_id)
+            if warehouse is not None:
+                quantity = warehouse.products.get(product_id, 0) + delta
+                if quantity:
+                    warehouse.products[product_id] = quantity
+                else:
+                    warehouse.products.pop(product_id, None)
+                self._on_inventory_changed(warehouse, product_id, delta)
+        elif op == "task":
+            self._restore_task(args[0])
+        elif op == "task_state":
+            task_id, status, start_time, end_time, sub_states = args
+            task = self.tasks.get(task_id)
+            if task is None:
+                return
+            task.status, task.start_time, task.end_time = status, start_time, end_time
+            for sub_task, (sub_status, sub_start, sub_end) in zip(task.sub_tasks, sub_states):
+                sub_task.status, sub_task.start_time, sub_task.end_time = sub_status, sub_start, sub_end
+            self.task_index.update(task)
+            if start_time is not None:
+                self.task_queue.remove(task_id)
+            if end_time is not None:
+                self.reservations.cancel(task_id)
+            latest = max((t for t in (start_time, end_time) if t is not None), default=None)
+            if latest is not None and latest > self.clock.now:
+                self.clock.now = latest
+        elif op == "archive_task":
+            task = self.tasks.get(args[0])
+            if task is not None:
+                self._archive_task(task)
+        elif op == "update_ship_plan":
+            self.update_ship_plan(*args)
+        elif op == "release_resource":
+            self.release_resource(*args)
+    
+    def _rearm_booked_tasks(self):
+        """恢复后为尚未开始的自动开始预约任务重新安排开始事件（开始时间已过的任务立即提交）"""
+        for task in self.tasks.values():
+            if task.start_time is None and task.details.get("auto_start") and "scheduled_start" in task.details:
+                self.clock.schedule_at(task.details["scheduled_start"],
+                                       lambda task_id=task.id: self._start_booked_task(task_id),
+                                       f"start {task.id}")
+    
+    def _recover_interrupted_tasks(self):
+        """重启前正在执行的任务无法继续：标记为失败，释放其占用的资源并取消预约"""
+        for task in self.tasks.values():
+            if task.status != ResourceStatus.BUSY:
+                continue
+            for sub_task in task.sub_tasks:
+                if sub_task.status == ResourceStatus.BUSY:
+                    for resource_type, resource_id in sub_task.assigned_resources.items():
+                        resource = self._get_resource(resource_type, resource_id)
+                        if resource is not None:
+                            resource.status = ResourceStatus.IDLE
+                    sub_task.status = ResourceStatus.UNAVAILABLE
+            task.status = ResourceStatus.UNAVAILABLE
+            self.reservations.cancel(task.id)
+            self.log_event("ERROR", f"任务 {task.id} 在重启时被中断")
+            self._journal_task_state(task)
+
+
+@dataclass
+class ResourceLock:
+    """资源锁：记录持有者和按 FIFO 排队的等待任务"""
+    owner: Optional[str] = None
+    waiters: deque = field(default_factory=deque)
+
+
+class ParallelTaskExecutor:
+    """并行任务执行器
+
+    每个任务在开始前锁定需要在整个执行期间独占的资源，锁按 (资源类型, 资源ID)
+    的全局顺序逐个获取，因此不会出现循环等待（死锁）。持有全部锁的任务提交到仿真
+    时钟执行。
+
+    流水线模式（pipelined=True）下任务只锁定装载货物的框架；行车和车头在各自的子任务开始时
+    占用、结束时释放，忙碌时子任务进入系统的等待队列。例如框架在末端库装货时，车头可以先去为
+    另一个任务拉框，再回来重新挂接；只有车头能在装货结束前回来时才借出（见
+    LogisticsSystem._may_borrow_truck）。子任务等待车头或行车时只持有已锁定的框架，而占用车头
+    或行车的子任务从不等待框架，因此不会形成循环等待。非流水线模式下任务锁定全部子任务的
+    assigned_resources，只有互不共享行车、车头和框架的任务才并行推进。
+    """
+
+    TASK_SCOPED_RESOURCES = ("frame",)  # 流水线模式下任务整个执行期间独占的资源类型
+
+    def __init__(self, system: LogisticsSystem, max_concurrent_tasks: int = 10, pipelined: bool = False):
+        self.system = system
+        self.max_concurrent_tasks = max(1, max_concurrent_tasks)
+        self.pipelined = pipelined
+        self.locks: Dict[Tuple[str, str], ResourceLock] = {}
+        self.results: Dict[str, bool] = {}
+        self._lock_plans: Dict[str, List[Tuple[str, str]]] = {}
+        self._lock_progress: Dict[str, int] = {}
+        self._pending: deque = deque()
+        self._active: set = set()
+
+    def task_resources(self, task: Task) -> List[Tuple[str, str]]:
+        """任务需要锁定的资源，按全局加锁顺序排列"""
+        return sorted({(resource_type, resource_id)
+                       for sub_task in task.sub_tasks
+                       for resource_type, resource_id in sub_task.assigned_resources.items()
+                       if not self.pipelined or resource_type in self.TASK_SCOPED_RESOURCES})
+
+    def submit(self, task_id: str) -> bool:
+        """提交任务，超过并发上限的任务排队等待"""
+        if task_id not in self.system.tasks or task_id in self._lock_plans:
+            return False
+        self._lock_plans[task_id] = self.task_resources(self.system.tasks[task_id])
+        self._lock_progress[task_id] = 0
+        if len(self._active) < self.max_concurrent_tasks:
+            self._activate(task_id)
+        else:
+            self._pending.append(task_id)
+        return True
+
+    def _activate(self, task_id: str):
+        self._active.add(task_id)
+        self._acquire_locks(task_id)
+
+    def _acquire_locks(self, task_id: str):
+        """按顺序获取任务的资源锁，遇到被占用的锁时排队等待"""
+        keys = self._lock_plans[task_id]
+        index = self._lock_progress[task_id]
+        while index < len(keys):
+            lock = self.locks.setdefault(keys[index], ResourceLock())
+            if lock.owner is not None:
+                lock.waiters.append(task_id)
+                self._lock_progress[task_id] = index
+                return
+            lock.owner = task_id
+            index += 1
+        self._lock_progress[task_id] = index
+        self.system.submit_task(task_id, on_complete=self._on_task_complete)
+
+    def _on_task_complete(self, task: Task, success: bool):
+        self.results[task.id] = success
+        self._release_locks(task.id)
+        self._active.discard(task.id)
+        if self._pending:
+            self._activate(self._pending.popleft())
+
+    def _release_locks(self, task_id: str):
+        """释放任务持有的锁，并将每个锁直接交给队首的等待任务"""
+        handed_over = []
+        for key in reversed(self._lock_plans.pop(task_id)):
+            lock = self.locks[key]
+            if lock.waiters:
+                next_task_id = lock.waiters.popleft()
+                lock.owner = next_task_id
+                self._lock_progress[next_task_id] += 1
+                handed_over.append(next_task_id)
+            else:
+                lock.owner = None
+        del self._lock_progress[task_id]
+        for next_task_id in handed_over:
+            self._acquire_locks(next_task_id)
+
+    def execute_tasks(self, task_ids: List[str]) -> Dict[str, bool]:
+        """提交并执行一批任务，返回任务ID -> 是否成功"""
+        for task_id in task_ids:
+            if not self.submit(task_id):
+                self.results[task_id] = False
+        while self._active or self._pending:
+            self.system.clock.run(stop_condition=lambda: not self._active and not self._pending)
+            # 事件队列已空：已提交但仍在等待资源的任务不会再被唤醒（例如车头处于维护状态），
+            # 标记失败并释放其锁，让排队的任务继续执行
+            stalled = [self.system.tasks[task_id] for task_id in self._active
+                       if self._lock_progress[task_id] == len(self._lock_plans[task_id])
+                       and self.system.tasks[task_id].status == ResourceStatus.BUSY]
+            if not stalled:
+                break
+            for task in stalled:
+                self.system._abort_waiting_task(task)
+        for task_id in task_ids:
+            self.results.setdefault(task_id, False)
+        return {task_id: self.results[task_id] for task_id in task_ids}
+
+
+class SystemSnapshot:
+    """某一版本系统状态的不可变只读视图
+
+    由写线程在每条命令执行后发布，发布后不再修改，读请求可在任意线程并发使用。
+    资源和任务记录按集合增量重建：只有发生变化的集合才复制并更新变化的实体，
+    未变化的集合在相邻版本之间共享；任务索引和变更记录以只读视图引用。
+    资源分页索引（按ID排序的全部实体、按状态和所属仓库分组的实体）同样按变化的实体
+    增量更新，修改时替换列表而不原地修改，因此可在相邻版本之间共享。
+    """
+
+    RESOURCE_COLLECTIONS = ("terminal_warehouses", "product_warehouses", "cranes",
+                            "frames", "frame_trucks", "products")
+
+    def __init__(self, instance_id: str, version: int, status: Dict[str, Any],
+                 resources: Dict[str, Dict[str, Dict[str, Any]]], tasks: Dict[str, Dict[str, Any]],
+                 task_index: TaskIndexView, change_log: ChangeLogView,
+                 entity_versions: Dict[str, Dict[str, int]],
+                 resource_indexes: Dict[str, Dict[Tuple[str, Any], List[str]]],
+                 gauges: List[Tuple[str, str, Dict[str, Any], float]]):
+        self.instance_id = instance_id
+        self.version = version
+        self.status = status
+        self.resources = resources
+        self.tasks = tasks
+        self.entity_versions = entity_versions
+        self.task_index = task_index
+        self.change_log = change_log
+        self.resource_indexes = resource_indexes
+        self.gauges = gauges
+
+    @classmethod
+    def capture(cls, system: LogisticsSystem, previous: Optional['SystemSnapshot'] = None) -> 'SystemSnapshot':
+        """在写线程中为系统当前版本生成快照，尽量复用上一版本快照中未变化的部分"""
+        if previous is not None and previous.instance_id != system.instance_id:
+            previous = None
+        changes = {collection: system.changes_since(collection, previous.version) if previous else None
+                   for collection in cls.RESOURCE_COLLECTIONS + ("tasks",)}
+        resources, resource_indexes = {}, {}
+        for collection in cls.RESOURCE_COLLECTIONS:
+            entities = getattr(system, collection)
+            records = _apply_changes(
+                previous.resources[collection] if previous else None, changes[collection],
+                lambda entity_id: resource_to_dict(entities[entity_id]) if entity_id in entities else None,
+                lambda: {entity_id: resource_to_dict(entity) for entity_id, entity in entities.items()})
+            resources[collection] = records
+            resource_indexes[collection] = cls._updated_index(
+                previous.resource_indexes[collection] if previous else None, changes[collection],
+                previous.resources[collection] if previous else None, records)
         
-        def task_priority(task):
-            if task.task_type == TaskType.SHIP_TRANSPORT:
-                return 1  # 船运任务优先级高
-            return 2
+        def all_tasks():
+            tasks = {record["id"]: record for record in system.task_archive.records()}
+            tasks.update((task_id, task_to_dict(task)) for task_id, task in system.tasks.items())
+            return tasks
+        tasks = _apply_changes(previous.tasks if previous else None, changes["tasks"],
+                               system.get_task_dict, all_tasks)
         
-        pending_tasks.sort(key=task_priority)
-        return [task.id for task in pending_tasks]
+        entity_versions = {}
+        for collection, collection_changes in changes.items():
+            current = system.entity_versions.get(collection, {})
+            entity_versions[collection] = _apply_changes(
+                previous.entity_versions[collection] if previous else None, collection_changes,
+                current.get, lambda: dict(current))
+        return cls(system.instance_id, system.version, system.get_system_status(), resources, tasks,
+                   system.task_index.view(), system.change_log.view(), entity_versions, resource_indexes,
+                   system.metric_gauges())
+
+    @staticmethod
+    def _index_keys(record: Optional[Dict[str, Any]]) -> set:
+        """记录所属的分页索引：全部实体 ("", None)，以及 ("status", 状态)、("warehouse_id", 仓库ID)"""
+        if record is None:
+            return set()
+        keys = {("", None)}
+        for name in ("status", "warehouse_id"):
+            if name in record:
+                keys.add((name, record[name]))
+        return keys
+
+    @classmethod
+    def _updated_index(cls, index: Optional[Dict[Tuple[str, Any], List[str]]],
+                       changes: Optional[Tuple[List[str], List[str]]],
+                       old_records: Optional[Dict[str, Dict[str, Any]]],
+                       records: Dict[str, Dict[str, Any]]) -> Dict[Tuple[str, Any], List[str]]:
+        """按变化的实体更新分页索引，被修改的列表整体替换"""
+        if index is None or changes is None:
+            index = {}
+            for entity_id in sorted(records):
+                for key in cls._index_keys(records[entity_id]):
+                    index.setdefault(key, []).append(entity_id)
+            return index
+        changed_ids, removed_ids = changes
+        if not changed_ids and not removed_ids:
+            return index
+        index = dict(index)
+        for entity_id in itertools.chain(changed_ids, removed_ids):
+            old_keys = cls._index_keys(old_records.get(entity_id))
+            new_keys = cls._index_keys(records.get(entity_id))
+            for key in old_keys - new_keys:
+                members = index.get(key, [])
+                position = bisect_left(members, entity_id)
+                if position < len(members) and members[position] == entity_id:
+                    index[key] = members[:position] + members[position + 1:]
+                    if not index[key]:
+                        del index[key]
+            for key in new_keys - old_keys:
+                members = index.get(key, [])
+                position = bisect_left(members, entity_id)
+                index[key] = members[:position] + [entity_id] + members[position:]
+        return index
+
+    @property
+    def etag(self) -> str:
+        return f"{self.instance_id}-{self.version}"
+
+    def entity_etag(self, collection: str, entity_id: str) -> str:
+        """单个实体的 ETag：实体最后修改版本不变时保持不变（恢复前创建、尚未修改的实体版本记为 0）"""
+        return f"{self.instance_id}-{collection}-{entity_id}-{self.entity_versions[collection].get(entity_id, 0)}"
+
+    def changes_since(self, collection: str, since: int) -> Optional[Tuple[List[str], List[str]]]:
+        """同 LogisticsSystem.changes_since，只包含本快照版本之前的变更"""
+        return self.change_log.since(collection, since, self.version)
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self.tasks.get(task_id)
+
+    def query_tasks(self, status: Optional[ResourceStatus] = None, task_type: Optional[TaskType] = None,
+                    warehouse_id: Optional[str] = None, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, cursor: Optional[int] = None, limit: int = 100,
+                    descending: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """同 LogisticsSystem.query_tasks，基于本快照的任务索引视图"""
+        return _filter_tasks(self.task_index.scan(task_type, warehouse_id, cursor, descending, status, start, end),
+                             self.tasks.get, status, start, end, limit, descending)
+
+    def query_resources(self, collection: str, status: Optional[ResourceStatus] = None,
+                        warehouse_id: Optional[str] = None, cursor: Optional[str] = None,
+                        limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """按条件分页查询资源、仓库或产品，返回 (API 表示列表, 下一页游标)
+
+        实体按ID排序，游标为上一页最后一个ID。仓库条件对行车按所属仓库、对仓库按ID匹配；
+        状态和所属仓库条件取较短的分页索引，另一个条件在记录上过滤。
+        """
+        records = self.resources[collection]
+        index = self.resource_indexes[collection]
+        if warehouse_id is not None and collection in ("terminal_warehouses", "product_warehouses"):
+            candidates = [warehouse_id] if warehouse_id in records else []
+        else:
+            options = [index.get(("", None), [])]
+            if status is not None:
+                options.append(index.get(("status", status.value), []))
+            if warehouse_id is not None:
+                options.append(index.get(("warehouse_id", warehouse_id), []))
+            candidates = min(options, key=len)
+        results = []
+        for position in range(bisect_right(candidates, cursor) if cursor is not None else 0, len(candidates)):
+            record = records[candidates[position]]
+            if status is not None and record.get("status") != status.value:
+                continue
+            if warehouse_id is not None and record.get("warehouse_id", record["id"]) != warehouse_id:
+                continue
+            results.append(record)
+            if len(results) >= limit:
+                return results, record["id"]
+        return results, None
+
+
+class SystemActor:
+    """单写者命令循环
+
+    所有修改都作为命令 ``command(system)`` 提交到队列，由唯一的写线程按顺序执行；
+    每条命令执行后若状态版本变化，就先发布新的 SystemSnapshot 再返回结果，因此调用方
+    随后读取的快照一定包含自己的修改。读请求只使用 ``snapshot``，不需要加锁。
+    系统的变更事件在命令执行期间缓存，快照发布后再分发给 ``subscribe`` 的监听者。
+    命令在写线程中运行，不能再同步调用 ``call``。
+    """
+
+    def __init__(self, system: LogisticsSystem):
+        self.system = system
+        self._snapshot = SystemSnapshot.capture(system)
+        self._commands: queue.Queue = queue.Queue()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._pending_events: List[Dict[str, Any]] = []
+        system.subscribe(self._buffer_event)
+        self._thread = threading.Thread(target=self._run, name="logistics-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def snapshot(self) -> SystemSnapshot:
+        """最新发布的只读快照"""
+        return self._snapshot
+
+    def submit(self, command: Callable[[LogisticsSystem], Any]) -> Future:
+        """提交命令，返回其结果的 Future"""
+        future: Future = Future()
+        self._commands.put((command, future))
+        return future
+
+    def call(self, command: Callable[[LogisticsSystem], Any], timeout: Optional[float] = None) -> Any:
+        """提交命令并等待结果，命令抛出的异常会在调用方重新抛出"""
+        return self.submit(command).result(timeout)
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        """订阅变更事件（在写线程中、对应快照发布之后调用）；替换系统时收到 reset 事件"""
+        self._listeners.append(listener)
+
+    def replace_system(self, factory: Callable[[LogisticsSystem], LogisticsSystem]) -> LogisticsSystem:
+        """在写线程中用 factory(旧系统) 的返回值替换系统；之前排队的命令仍作用于旧系统
+
+        旧系统的事件日志不再使用，替换后写完剩余日志并停止其后台线程。
+        """
+        def command(old_system):
+            old_system.unsubscribe(self._buffer_event)
+            self.system = factory(old_system)
+            if self.system.event_log is not old_system.event_log:
+                old_system.event_log.close()
+            self.system.subscribe(self._buffer_event)
+            self._pending_events = [{"type": "reset", "instance_id": self.system.instance_id,
+                                     "version": self.system.version}]
+            return self.system
+        return self.call(command)
+
+    def _buffer_event(self, event: Dict[str, Any]):
+        self._pending_events.append(event)
+
+    def stop(self):
+        """处理完已排队的命令后停止写线程"""
+        self._commands.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._commands.get()
+            if item is None:
+                return
+            command, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = command(self.system)
+            except Exception as e:
+                self._publish()
+                future.set_exception(e)
+            else:
+                self._publish()
+                future.set_result(result)
+
+    def _dispatch_events(self):
+        events, self._pending_events = self._pending_events, []
+        for event in events:
+            for listener in list(self._listeners):
+                listener(event)
+
+    def _publish(self):
+        system, snapshot = self.system, self._snapshot
+        if system.instance_id != snapshot.instance_id or system.version != snapshot.version:
+            try:
+                self._snapshot = SystemSnapshot.capture(system, snapshot)
+            except Exception as e:
+                # 快照失败不能让写线程退出，下一条命令后会重新生成
+                system.log_event("ERROR", "生成只读快照失败: %s", e)
+        self._dispatch_events()
 
 
 # 测试用例
@@ -0,0 +1,331 @@
+"""
+HTTP 负载生成与轨迹回放
+HTTP Load Generator
+
+对本地运行的 app.py 实例回放请求轨迹并统计各接口的延迟分位数和吞吐量。轨迹为 NDJSON，
+每行一个请求 {"offset", "method", "path", "body", "chain"}，来源有两种：
+1. 服务端录制：以环境变量 LOGISTICS_TRACE_FILE=trace.ndjson 启动 app.py，真实请求会被追加到该文件
+2. 合成：按控制室（状态、资源、任务分页查询）和系统集成（添加产品、库存调整、创建船运计划和任务、
+   执行任务）的混合比例生成，到达间隔服从指数分布
+
+用法：
+    python load_generator.py synth --requests 2000 --rate 200 --output trace.ndjson
+    python load_generator.py replay trace.ndjson --url http://127.0.0.1:5000 --concurrency 16
+    python load_generator.py run --requests 2000 --rate 0 --concurrency 32     # 合成后立即回放
+"""
+
+import argparse
+import http.client
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_URL = "http://127.0.0.1:5000"
+DEFAULT_CONCURRENCY = 8
+REQUEST_TIMEOUT = 30.0
+RECORDED_WRITE_CHAIN = "recorded-writes"  # 服务端录制的轨迹没有依赖信息，其中的写请求都放在这条链上
+
+# 路径中的实体ID归并为占位符，使同一接口的请求汇总到一起
+_PATH_PATTERNS = [(re.compile(r"^/api/tasks/[^/]+$"), "/api/tasks/<task_id>")]
+
+
+@dataclass
+class TraceRequest:
+    """轨迹中的一个请求；offset 为相对轨迹开始的秒数
+
+    chain 相同的请求有先后依赖（如先创建船运计划再创建任务），回放时按轨迹顺序串行发出。
+    """
+    offset: float
+    method: str
+    path: str
+    body: Optional[str] = None
+    chain: Optional[str] = None
+
+
+@dataclass
+class RequestResult:
+    endpoint: str
+    latency: float  # 秒
+    status: int  # 0 表示连接失败或超时
+    started: float  # 开环时为计划发出时间，闭环时为实际发出时间（相对回放开始的秒数）
+
+
+def load_trace(path: str) -> List[TraceRequest]:
+    """读取 NDJSON 轨迹（兼容服务端录制的额外字段），按 offset 排序
+
+    没有 chain 字段的行来自服务端录制：其中的写请求（如先创建计划再创建任务）可能互相依赖，
+    统一放到 RECORDED_WRITE_CHAIN 上按录制顺序串行回放，GET 请求仍并发发出。
+    """
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            method = record["method"]
+            if "chain" in record:
+                chain = record["chain"]
+            else:
+                chain = RECORDED_WRITE_CHAIN if method != "GET" else None
+            requests.append(TraceRequest(float(record.get("offset", 0.0)), method, record["path"],
+                                         record.get("body"), chain))
+    requests.sort(key=lambda request: request.offset)
+    return requests
+
+
+def save_trace(requests: List[TraceRequest], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(asdict(request), ensure_ascii=False) + "\n")
+
+
+# 合成负载：名称 -> 权重；每种请求由 _synthetic_requests 生成（部分为有先后依赖的一组请求）
+DEFAULT_MIX: Dict[str, int] = {
+    "system_status": 30,
+    "resources": 10,
+    "resource_page": 10,
+    "task_page": 15,
+    "task_delta": 5,
+    "add_product": 8,
+    "update_inventory": 12,
+    "ship_plan": 8,
+    "execute_task": 2,
+}
+
+
+def _synthetic_requests(kind: str, n: int, rng: random.Random,
+                        created_tasks: List[Tuple[str, str]]) -> List[tuple]:
+    """生成一种合成请求，返回 [(方法, 路径, 请求体, 依赖链)]；使用 app.py 默认初始化数据中的仓库和产品
+
+    created_tasks 为已生成创建请求的 (任务ID, 依赖链)，执行任务的请求与创建它的请求在同一依赖链上。
+    """
+    if kind == "system_status":
+        return [("GET", "/api/system_status", None, None)]
+    if kind == "resources":
+        return [("GET", "/api/resources", None, None)]
+    if kind == "resource_page":
+        collection = rng.choice(["frames", "frame_trucks", "cranes", "products"])
+        return [("GET", f"/api/resources?type={collection}&limit=50", None, None)]
+    if kind == "task_page":
+        return [("GET", "/api/tasks?order=desc&limit=50&fields=id,type,status,plan_id,sub_task_count", None, None)]
+    if kind == "task_delta":
+        return [("GET", f"/api/tasks?since={rng.randint(0, 50)}", None, None)]
+    if kind == "add_product":
+        return [("POST", "/api/add_product", {"id": f"LP{n:06d}", "name": f"负载产品{n}",
+                                              "weight": round(rng.uniform(1, 10), 1),
+                                              "volume": round(rng.uniform(1, 10), 1)}, None)]
+    if kind == "update_inventory":
+        return [("POST", "/api/update_warehouse_product",
+                 {"warehouse_id": "TW001", "product_id": rng.choice(["P001", "P002"]), "quantity": 1}, None)]
+    if kind == "ship_plan":
+        plan_id = f"LSP{n:06d}"
+        created_tasks.append((f"ship_task_{plan_id}", plan_id))
+        return [("POST", "/api/create_ship_plan", {"id": plan_id, "products": {"P001": 1}, "priority": 1}, plan_id),
+                ("POST", "/api/create_ship_transport_task", {"plan_id": plan_id}, plan_id)]
+    if kind == "execute_task":
+        if not created_tasks:
+            return [("GET", "/api/system_status", None, None)]
+        task_id, chain = created_tasks.pop(0)
+        return [("POST", "/api/execute_task", {"task_id": task_id}, chain)]
+    raise ValueError(f"未知的请求类型: {kind}")
+
+
+def synthesize(count: int, rate: float = 100.0, mix: Optional[Dict[str, int]] = None,
+               seed: int = 0) -> List[TraceRequest]:
+    """按混合比例生成 count 个请求；rate 为平均到达率（请求/秒），0 表示全部在时刻 0 到达"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = list(mix), list(mix.values())
+    created_tasks: List[Tuple[str, str]] = []
+    requests: List[TraceRequest] = []
+    offset = 0.0
+    n = 0
+    while len(requests) < count:
+        kind = rng.choices(kinds, weights)[0]
+        for method, path, body, chain in _synthetic_requests(kind, n, rng, created_tasks):
+            requests.append(TraceRequest(round(offset, 6), method, path,
+                                         json.dumps(body, ensure_ascii=False) if body is not None else None, chain))
+        n += 1
+        if rate > 0:
+            offset += rng.expovariate(rate)
+    return requests[:count]
+
+
+def endpoint_of(method: str, path: str) -> str:
+    """统计用的接口名：方法 + 去掉查询串并归并实体ID后的路径"""
+    path = path.split("?", 1)[0]
+    for pattern, replacement in _PATH_PATTERNS:
+        if pattern.match(path):
+            path = replacement
+            break
+    return f"{method} {path}"
+
+
+def replay(requests: List[TraceRequest], url: str = DEFAULT_URL, concurrency: int = DEFAULT_CONCURRENCY,
+           speed: float = 1.0, timeout: float = REQUEST_TIMEOUT) -> List[RequestResult]:
+    """用 concurrency 个线程并发回放请求
+
+    speed > 0 时按 offset / speed 的时间点发出请求（开环，保留轨迹中的到达节奏），延迟从计划发出时间
+    算起，线程忙或等待依赖造成的推迟也计入延迟，避免协调遗漏（coordinated omission）低估尾延迟；
+    speed = 0 时每个线程收到响应后立即发下一个请求（闭环，测最大吞吐），延迟从实际发出时间算起。
+    同一依赖链上的请求等前一个请求收到响应后才发出。
+    """
+    target = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if target.scheme == "https" else http.client.HTTPConnection
+    base_path = target.path.rstrip("/")
+    results: List[RequestResult] = []
+    results_lock = threading.Lock()
+    next_index = iter(range(len(requests)))
+    index_lock = threading.Lock()
+    # 依赖链上前一个请求的完成事件；请求按下标顺序领取，等待的总是已被领取的更早请求，不会死锁
+    done = [threading.Event() if request.chain is not None else None for request in requests]
+    previous: List[Optional[int]] = []
+    chain_tail: Dict[str, int] = {}
+    for index, request in enumerate(requests):
+        previous.append(chain_tail.get(request.chain) if request.chain is not None else None)
+        if request.chain is not None:
+            chain_tail[request.chain] = index
+    start = time.perf_counter()
+
+    def worker():
+        connection = connection_class(target.hostname, target.port, timeout=timeout)
+        local = []
+        while True:
+            with index_lock:
+                index = next(next_index, None)
+            if index is None:
+                break
+            request = requests[index]
+            scheduled = start + request.offset / speed if speed > 0 else None
+            if scheduled is not None:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if previous[index] is not None:
+                done[previous[index]].wait()
+            headers = {"Content-Type": "application/json"} if request.body is not None else {}
+            body = request.body.encode("utf-8") if request.body is not None else None
+            sent = time.perf_counter() if scheduled is None else scheduled
+            try:
+                connection.request(request.method, base_path + request.path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = 0
+            if done[index] is not None:
+                done[index].set()
+            local.append(RequestResult(endpoint_of(request.method, request.path),
+                                       time.perf_counter() - sent, status, sent - start))
+        connection.close()
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, name=f"load-{i}", daemon=True)
+               for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """最近秩分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * percent / 100.0))
+    return sorted_values[rank - 1]
+
+
+def _summary(results: List[RequestResult], duration: float) -> Dict[str, float]:
+    latencies = sorted(result.latency * 1000 for result in results)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for result in results if result.status == 0 or result.status >= 400),
+        "throughput_rps": round(len(results) / duration, 2) if duration > 0 else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 3),
+        "p95_ms": round(_percentile(latencies, 95), 3),
+        "p99_ms": round(_percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def build_report(results: List[RequestResult]) -> Dict[str, object]:
+    """按接口汇总延迟分位数（毫秒）、错误数（连接失败或 HTTP 4xx/5xx）和吞吐量"""
+    duration = max((result.started + result.latency for result in results), default=0.0)
+    endpoints: Dict[str, List[RequestResult]] = {}
+    for result in results:
+        endpoints.setdefault(result.endpoint, []).append(result)
+    return {
+        "duration_s": round(duration, 3),
+        "overall": _summary(results, duration),
+        "endpoints": {endpoint: _summary(endpoint_results, duration)
+                      for endpoint, endpoint_results in sorted(endpoints.items())},
+    }
+
+
+def print_report(report: Dict[str, object]):
+    print(f"总耗时 {report['duration_s']}s")
+    header = f"{'接口':48s} {'请求数':>8s} {'错误':>6s} {'吞吐/s':>9s} {'p50ms':>9s} {'p95ms':>9s} {'p99ms':>9s}"
+    print(header)
+    rows = list(report["endpoints"].items()) + [("合计", report["overall"])]
+    for endpoint, stats in rows:
+        print(f"{endpoint:48s} {stats['requests']:>8d} {stats['errors']:>6d} {stats['throughput_rps']:>9.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP 负载生成与轨迹回放")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_synth_arguments(command):
+        command.add_argument("--requests", type=int, default=1000, help="请求数")
+        command.add_argument("--rate", type=float, default=100.0, help="平均到达率（请求/秒），0 为同时到达")
+        command.add_argument("--seed", type=int, default=0)
+
+    def add_replay_arguments(command):
+        command.add_argument("--url", default=DEFAULT_URL, help="被测实例地址")
+        command.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="并发连接数")
+        command.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，0 为不等待")
+        command.add_argument("--report", help="把报告另存为 JSON")
+
+    synth = commands.add_parser("synth", help="生成合成轨迹")
+    add_synth_arguments(synth)
+    synth.add_argument("--output", required=True, help="轨迹输出路径")
+
+    replay_command = commands.add_parser("replay", help="回放轨迹文件")
+    replay_command.add_argument("trace", help="NDJSON 轨迹文件（录制或合成）")
+    add_replay_arguments(replay_command)
+
+    run = commands.add_parser("run", help="生成合成负载并立即回放")
+    add_synth_arguments(run)
+    add_replay_arguments(run)
+
+    args = parser.parse_args(argv)
+    if args.command == "synth":
+        save_trace(synthesize(args.requests, args.rate, seed=args.seed), args.output)
+        print(f"已生成 {args.requests} 个请求: {args.output}")
+        return 0
+
+    requests = load_trace(args.trace) if args.command == "replay" else synthesize(args.requests, args.rate,
+                                                                                   seed=args.seed)
+    report = build_report(replay(requests, args.url, args.concurrency, args.speed))
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,14 +6,35 @@
 // 全局变量
 const API_BASE_URL = '';
 let systemResources = {};
+let systemStatus = { resources: {} };
+let recentLogs = [];
+let eventSource = null;
+// 任务表分页：按创建时间倒序，只请求表格显示的字段
+const TASK_PAGE_SIZE = 50;
+const TASK_TABLE_FIELDS = 'id,type,status,sub_task_count,start_time,end_time';
+// 可视化任务选择器只列出最近的任务
+const TASK_SELECT_LIMIT = 100;
+let taskPage = { cursor: null, previous: [], nextCursor: null, items: [] };
+let knownTaskIds = new Set();
+
+// 事件合并渲染：同一时间窗口内的多个变更事件只触发一次重绘
+const RENDER_DELAY_MS = 100;
+const RECENT_LOG_COUNT = 10;
+let pendingRenders = new Set();
+let renderTimer = null;
 
 // DOM加载完成后执行
 document.addEventListener('DOMContentLoaded', function() {
     // 初始化导航
     initNavigation();
     
-    // 加载系统资源
-    loadSystemResources();
+    // 初始化任务表翻页
+    initTaskPager();
+    
+    // 订阅服务器变更事件；浏览器不支持时退回一次性加载
+    if (!connectEventStream()) {
+        loadSystemResources();
+    }
     
     // 刷新状态按钮
     const refreshBtn = document.getElementById('refresh-status');
@@ -58,6 +79,137 @@ function initNavigation() {
     });
 }
 
+/**
+ * 连接服务器事件流
+ */
+function connectEventStream() {
+    if (!window.EventSource) return false;
+    
+    eventSource = new EventSource(`${API_BASE_URL}/api/events`);
+    eventSource.onmessage = function(e) {
+        applyChangeEvent(JSON.parse(e.data));
+    };
+    return true;
+}
+
+/**
+ * 事件流是否可用（可用时操作后无需重新拉取全量数据）
+ */
+function eventStreamActive() {
+    return eventSource !== null && eventSource.readyState === EventSource.OPEN;
+}
+
+/**
+ * 全量加载资源、状态和任务
+ */
+function reloadAll() {
+    loadSystemResources();
+    updateSystemStatus();
+    loadTasks();
+}
+
+/**
+ * 应用一条变更事件
+ */
+function applyChangeEvent(event) {
+    switch (event.type) {
+        case 'hello':
+        case 'reset':
+        case 'resync':
+            // 新连接、系统重置或事件积压时重新全量加载
+            reloadAll();
+            break;
+        case 'entity_added':
+            // 船运计划不在资源视图中展示
+            if (event.kind !== 'ship_plan') {
+                scheduleRender('reload-resources');
+            }
+            break;
+        case 'entity_removed':
+            // 框架或车头交接给其他分区
+            scheduleRender('reload-resources');
+            break;
+        case 'resource': {
+            const resource = (systemResources[event.collection] || {})[event.id];
+            if (resource) {
+                resource[event.field] = event.value;
+                scheduleRender('resources');
+            }
+            if (event.field === 'status' && event.category) {
+                const statuses = systemStatus.resources[event.category] || (systemStatus.resources[event.category] = {});
+                statuses[event.id] = event.value;
+                scheduleRender('status');
+            }
+            break;
+        }
+        case 'inventory': {
+            const warehouse = (systemResources[event.collection] || {})[event.id];
+            if (warehouse) {
+                if (event.quantity > 0) {
+                    warehouse.products[event.product_id] = event.quantity;
+                } else {
+                    delete warehouse.products[event.product_id];
+                }
+                scheduleRender('resources');
+            }
+            break;
+        }
+        case 'task': {
+            const index = taskPage.items.findIndex(task => task.id === event.task.id);
+            if (index >= 0) {
+                taskPage.items[index] = Object.assign({}, event.task, { sub_task_count: event.task.sub_tasks.length });
+                scheduleRender('task-table');
+            } else if (!knownTaskIds.has(event.task.id)) {
+                // 新任务：出现在第一页和选择器中
+                scheduleRender('task-list');
+            }
+            scheduleRender('task-stats');
+            break;
+        }
+        case 'log':
+            recentLogs.push(event.record);
+            recentLogs = recentLogs.slice(-RECENT_LOG_COUNT);
+            scheduleRender('logs');
+            break;
+    }
+}
+
+/**
+ * 登记需要重绘的部分
+ */
+function scheduleRender(part) {
+    pendingRenders.add(part);
+    if (!renderTimer) {
+        renderTimer = setTimeout(flushRenders, RENDER_DELAY_MS);
+    }
+}
+
+/**
+ * 执行合并后的重绘
+ */
+function flushRenders() {
+    const parts = pendingRenders;
+    pendingRenders = new Set();
+    renderTimer = null;
+    
+    if (parts.has('reload-resources')) {
+        loadSystemResources();
+    } else if (parts.has('resources')) {
+        renderSystemResources();
+    }
+    if (parts.has('task-stats')) {
+        updateSystemStatus();
+    } else if (parts.has('status')) {
+        updateResourceStatusChart(systemStatus);
+    }
+    if (parts.has('task-list')) {
+        loadTasks();
+    } else if (parts.has('task-table')) {
+        populateTaskTable(taskPage.items);
+    }
+    if (parts.has('logs')) updateSystemLogs(recentLogs);
+}
+
 /**
  * 加载系统资源
  */
@@ -66,17 +218,29 @@ function loadSystemResources() {
         .then(response => response.json())
         .then(data => {
             systemResources = data;
-            updateResourceCounts();
-            updateWarehouseSelectors();
-            updateProductSelectors();
-            updateWarehouseInventorySelector();
-            populateResourceTables();
+            renderSystemResources();
         })
         .catch(error => {
             console.error('加载系统资源失败:', error);
         });
 }
 
+/**
+ * 渲染资源相关的全部视图
+ */
+function renderSystemResources() {
+    updateResourceCounts();
+    updateWarehouseSelectors();
+    updateProductSelectors();
+    updateWarehouseInventorySelector();
+    populateResourceTables();
+    
+    // 平面布局在 visualization.js 中实现，模拟进行中时不覆盖
+    if (typeof drawLayout === 'function' && !(typeof simulationInProgress !== 'undefined' && simulationInProgress)) {
+        drawLayout();
+    }
+}
+
 /**
  * 更新资源计数
  */
@@ -104,8 +268,11 @@ function updateSystemStatus() {
     fetch(`${API_BASE_URL}/api/system_status`)
         .then(response => response.json())
         .then(data => {
+            systemStatus = data;
+            recentLogs = data.recent_logs;
             updateResourceStatusChart(data);
             updateSystemLogs(data.recent_logs);
+            updateTaskStats(data);
         })
         .catch(error => {
             console.error('更新系统状态失败:', error);
@@ -487,15 +654,75 @@ function populateResourceTables() {
 }
 
 /**
- * 加载任务列表
+ * 加载任务列表（当前页和可视化选择器）
  */
 function loadTasks() {
-    fetch(`${API_BASE_URL}/api/tasks`)
+    loadTaskPage(taskPage.cursor);
+    loadTaskSelectOptions();
+}
+
+/**
+ * 加载一页任务
+ */
+function loadTaskPage(cursor) {
+    const cursorParam = cursor !== null ? `&cursor=${cursor}` : '';
+    fetch(`${API_BASE_URL}/api/tasks?order=desc&limit=${TASK_PAGE_SIZE}&fields=${TASK_TABLE_FIELDS}${cursorParam}`)
         .then(response => response.json())
         .then(data => {
-            updateTaskStats(data);
-            populateTaskTable(data);
-            updateVisualizationTaskSelect(data);
+            taskPage.cursor = cursor;
+            taskPage.items = data.items;
+            taskPage.nextCursor = data.next_cursor;
+            data.items.forEach(task => knownTaskIds.add(task.id));
+            populateTaskTable(taskPage.items);
+            updateTaskPager();
+        })
+        .catch(error => {
+            console.error('加载任务列表失败:', error);
+        });
+}
+
+/**
+ * 初始化任务表翻页按钮
+ */
+function initTaskPager() {
+    const prevBtn = document.getElementById('tasks-prev-page');
+    const nextBtn = document.getElementById('tasks-next-page');
+    if (prevBtn) {
+        prevBtn.addEventListener('click', function() {
+            if (taskPage.previous.length > 0) {
+                loadTaskPage(taskPage.previous.pop());
+            }
+        });
+    }
+    if (nextBtn) {
+        nextBtn.addEventListener('click', function() {
+            if (taskPage.nextCursor !== null) {
+                taskPage.previous.push(taskPage.cursor);
+                loadTaskPage(taskPage.nextCursor);
+            }
+        });
+    }
+}
+
+/**
+ * 更新翻页按钮状态
+ */
+function updateTaskPager() {
+    const prevBtn = document.getElementById('tasks-prev-page');
+    const nextBtn = document.getElementById('tasks-next-page');
+    if (prevBtn) prevBtn.disabled = taskPage.previous.length === 0;
+    if (nextBtn) nextBtn.disabled = taskPage.nextCursor === null;
+}
+
+/**
+ * 加载可视化选择器中的任务（只取ID和类型）
+ */
+function loadTaskSelectOptions() {
+    fetch(`${API_BASE_URL}/api/tasks?order=desc&limit=${TASK_SELECT_LIMIT}&fields=id,type`)
+        .then(response => response.json())
+        .then(data => {
+            data.items.forEach(task => knownTaskIds.add(task.id));
+            updateVisualizationTaskSelect(data.items);
         })
         .catch(error => {
             console.error('加载任务列表失败:', error);
@@ -505,12 +732,11 @@ function loadTasks() {
 /**
  * 更新任务统计
  */
-function updateTaskStats(tasks) {
-    const activeTasks = Object.values(tasks).filter(task => task.status !== '空闲').length;
-    const completedTasks = Object.values(tasks).filter(task => task.end_time).length;
-    
-    document.getElementById('active-tasks').textContent = activeTasks;
-    document.getElementById('completed-tasks').textContent = completedTasks;
+function updateTaskStats(status) {
+    const activeTasks = document.getElementById('active-tasks');
+    const completedTasks = document.getElementById('completed-tasks');
+    if (activeTasks) activeTasks.textContent = Object.keys(status.active_tasks || {}).length;
+    if (completedTasks) completedTasks.textContent = status.completed_task_count || 0;
 }
 
 /**
@@ -532,7 +758,7 @@ function populateTaskTable(tasks) {
             <td>${task.id}</td>
             <td>${task.type}</td>
             <td>${task.status}</td>
-            <td>${task.sub_tasks.length}</td>
+            <td>${task.sub_task_count}</td>
             <td>${startTime}</td>
             <td>${endTime}</td>
             <td>
@@ -612,9 +838,11 @@ function executeTask(taskId) {
     .then(data => {
         if (data.success) {
             alert('任务执行成功');
-            updateSystemLogs(data.logs);
-            loadTasks();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                updateSystemLogs(data.logs);
+                loadTasks();
+                loadSystemResources();
+            }
         } else {
             alert('任务执行失败');
         }
@@ -654,9 +882,10 @@ function resetSystem() {
     .then(data => {
         if (data.success) {
             alert('系统已重置');
-            loadSystemResources();
-            updateSystemStatus();
-            loadTasks();
+            // 事件流会收到 reset 事件并自动重新加载
+            if (!eventStreamActive()) {
+                reloadAll();
+            }
         } else {
             alert('系统重置失败');
         }
@@ -0,0 +1,272 @@
+"""
+调度器性能基准测试
+Scheduler Micro-benchmark Suite
+
+用参数化的合成厂区（仓库、行车、框架、车头、产品种类、船运计划数量可调）在不同规模下
+测量核心调度操作的耗时，结果写入机器可读的 JSON 文件，并可与基线文件对比发现性能回退。
+
+用法：
+    python scheduler_benchmark.py                         # 运行全部规模并与基线对比
+    python scheduler_benchmark.py --sizes small,medium    # 只运行部分规模
+    python scheduler_benchmark.py --update-baseline       # 用本次结果覆盖基线
+    python scheduler_benchmark.py --output result.json    # 另存本次结果
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from factory_logistics_system import (
+    LogisticsSystem, Product, TerminalWarehouse, ProductWarehouse, Crane, Frame, FrameTruck, ShipPlan, Position
+)
+
+BASELINE_FILE = "benchmark_baseline.json"
+BASELINE_SCHEMA = 1
+DEFAULT_TOLERANCE = 0.5  # 中位数超过基线的比例上限，超过视为回退
+MIN_REGRESSION_US = 5.0  # 逐次计时项的差值低于该值（微秒）时视为计时噪声
+MIN_REGRESSION_SECONDS = 0.05  # 一次性计时项的差值低于该值（秒）时视为计时噪声
+
+
+@dataclass
+class PlantSpec:
+    """合成厂区规模"""
+    terminal_warehouses: int
+    product_warehouses: int
+    cranes_per_warehouse: int
+    frames: int
+    frame_yards: int  # 框架停放场数量，框架分散停放在这些格子上
+    frame_trucks: int
+    skus: int
+    plans: int
+    samples: int  # 每项操作的计时次数上限
+    seed: int = 0
+
+
+SIZES: Dict[str, PlantSpec] = {
+    "small": PlantSpec(terminal_warehouses=10, product_warehouses=3, cranes_per_warehouse=1,
+                       frames=20, frame_yards=5, frame_trucks=20, skus=50, plans=50, samples=50),
+    "medium": PlantSpec(terminal_warehouses=50, product_warehouses=10, cranes_per_warehouse=1,
+                        frames=200, frame_yards=20, frame_trucks=200, skus=500, plans=500, samples=100),
+    "large": PlantSpec(terminal_warehouses=200, product_warehouses=20, cranes_per_warehouse=2,
+                       frames=1000, frame_yards=40, frame_trucks=1000, skus=2000, plans=2000, samples=100),
+}
+
+
+def generate_plant(spec: PlantSpec) -> LogisticsSystem:
+    """按规模生成合成厂区
+
+    仓库和框架停放场占用互不重叠的格子（路径预计算的地标数为两者之和），车头随机分布；
+    末端库随机备货，船运计划只引用同一末端库中有库存的产品。
+    """
+    rng = random.Random(spec.seed)
+    landmark_count = spec.terminal_warehouses + spec.product_warehouses + spec.frame_yards
+    side = max(10, math.ceil(math.sqrt(landmark_count * 8)))
+    system = LogisticsSystem(grid_size=(side, side))
+    system.event_log.echo = False
+    cells = rng.sample(range(side * side), landmark_count)
+    positions = (Position(cell % side, cell // side) for cell in cells)
+
+    for i in range(spec.skus):
+        system.add_product(Product(f"P{i:05d}", f"产品{i}", round(rng.uniform(1, 20), 1), round(rng.uniform(1, 10), 1)))
+
+    stocked: List[List[str]] = []
+    for i in range(spec.terminal_warehouses):
+        position = next(positions)
+        warehouse = TerminalWarehouse(f"TW{i:05d}", f"末端库{i}", position, 1e9)
+        product_ids = rng.sample(range(spec.skus), min(spec.skus, 20))
+        for product in product_ids:
+            warehouse.add_product(f"P{product:05d}", rng.randint(50, 500))
+        system.add_terminal_warehouse(warehouse)
+        stocked.append(list(warehouse.products))
+        for k in range(spec.cranes_per_warehouse):
+            system.add_crane(Crane(f"C{i:05d}-{k}", f"末端库行车{i}-{k}", position, warehouse_id=warehouse.id))
+    for i in range(spec.product_warehouses):
+        position = next(positions)
+        warehouse = ProductWarehouse(f"PW{i:05d}", f"成品库{i}", position, 1e9)
+        system.add_product_warehouse(warehouse)
+        for k in range(spec.cranes_per_warehouse):
+            system.add_crane(Crane(f"CP{i:05d}-{k}", f"成品库行车{i}-{k}", position, warehouse_id=warehouse.id))
+    yards = [next(positions) for _ in range(spec.frame_yards)]
+    for i in range(spec.frames):
+        yard = yards[i % len(yards)]
+        system.add_frame(Frame(f"F{i:05d}", f"框架{i}", Position(yard.x, yard.y)))
+    for i in range(spec.frame_trucks):
+        system.add_frame_truck(FrameTruck(f"T{i:05d}", f"车头{i}",
+                                          Position(rng.randrange(side), rng.randrange(side))))
+
+    now = system.clock.now
+    for i in range(spec.plans):
+        products = rng.choice(stocked)
+        system.add_ship_plan(ShipPlan(
+            f"SP{i:05d}",
+            {product_id: rng.randint(1, 10) for product_id in rng.sample(products, min(len(products), 3))},
+            now + timedelta(minutes=rng.randint(30, 600)),
+            priority=rng.randint(1, 3)))
+    return system
+
+
+def _measure(operation: Callable[[int], object], samples: int,
+             prepare: Optional[Callable[[int], object]] = None) -> Dict[str, float]:
+    """逐次计时 operation(i)，prepare(i) 在计时之外执行；返回以微秒为单位的统计"""
+    durations = []
+    for i in range(samples):
+        if prepare is not None:
+            prepare(i)
+        start = time.perf_counter_ns()
+        operation(i)
+        durations.append((time.perf_counter_ns() - start) / 1000.0)
+    durations.sort()
+    return {
+        "median_us": round(statistics.median(durations), 3),
+        "p95_us": round(durations[min(len(durations) - 1, math.ceil(len(durations) * 0.95) - 1)], 3),
+        "min_us": round(durations[0], 3),
+        "samples": len(durations),
+    }
+
+
+def run_size(spec: PlantSpec) -> Dict[str, Dict[str, float]]:
+    """在一个规模上运行全部基准项"""
+    build_start = time.perf_counter()
+    system = generate_plant(spec)
+    build_seconds = time.perf_counter() - build_start
+    plan_ids = list(system.ship_plans)
+    samples = min(spec.samples, len(plan_ids))
+    # 路径表在首次规划路径时预计算，单独计时，避免计入第一次创建任务
+    precompute_start = time.perf_counter()
+    system.precompute_routes()
+    precompute_seconds = time.perf_counter() - precompute_start
+
+    results = {
+        "validate_ship_plan": _measure(lambda i: system.validate_ship_plan(plan_ids[i]), samples),
+        "find_available_resources": _measure(lambda i: system.find_available_resources(), samples),
+        "create_ship_transport_task": _measure(lambda i: system.create_ship_transport_task(plan_ids[i]), samples),
+        "optimize_task_scheduling": _measure(lambda i: system.optimize_task_scheduling(), samples),
+    }
+    # 状态按版本缓存：冷查询前先做一次库存变更（不计时）使缓存失效
+    warehouse = next(iter(system.terminal_warehouses.values()))
+    product_id = next(iter(warehouse.products))
+    results["get_system_status"] = _measure(
+        lambda i: system.get_system_status(), samples,
+        prepare=lambda i: warehouse.add_product(product_id, 1))
+    results["get_system_status_cached"] = _measure(lambda i: system.get_system_status(), samples)
+    # 预约日历：每个车头排满一天（15~45 分钟的预约，间隔 0~20 分钟），查询任意车头的最早空闲时段
+    rng = random.Random(spec.seed)
+    day_start = system.clock.now
+    for truck_id in system.frame_trucks:
+        cursor = day_start
+        while cursor < day_start + timedelta(days=1):
+            end = cursor + timedelta(minutes=rng.randint(15, 45))
+            system.reservations.reserve("frame_truck", truck_id, cursor, end, f"bench-{truck_id}-{cursor}")
+            cursor = end + timedelta(minutes=rng.randint(0, 20))
+    query_times = [day_start + timedelta(minutes=rng.randint(0, 24 * 60)) for _ in range(samples)]
+    results["find_first_window"] = _measure(
+        lambda i: system.find_first_window("frame_truck", timedelta(minutes=20), after=query_times[i]), samples)
+    results["generate_plant"] = {"seconds": round(build_seconds, 3)}
+    results["precompute_routes"] = {"seconds": round(precompute_seconds, 3)}
+    system.event_log.close()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict[str, Dict[str, Dict[str, float]]],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """与基线对比耗时（逐次计时项比较中位数，一次性计时项比较总耗时），返回回退项的描述"""
+    regressions = []
+    for size, operations in results.items():
+        for operation, stats in operations.items():
+            reference = baseline.get(size, {}).get(operation) or {}
+            metric, unit, floor = (("median_us", "us", MIN_REGRESSION_US) if "median_us" in stats
+                                   else ("seconds", "s", MIN_REGRESSION_SECONDS))
+            if metric not in reference:
+                continue
+            current, expected = stats[metric], reference[metric]
+            if current > expected * (1 + tolerance) and current - expected > floor:
+                regressions.append(f"{size}/{operation}: {current:g}{unit} > 基线 {expected:g}{unit} "
+                                   f"(+{(current / max(expected, 1e-9) - 1) * 100:.0f}%)")
+    return regressions
+
+
+def run_benchmarks(sizes: List[str]) -> Dict[str, object]:
+    """运行指定规模，返回可直接写入 JSON 的结果文档"""
+    return {
+        "schema": BASELINE_SCHEMA,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": {size: asdict(SIZES[size]) for size in sizes},
+        "results": {size: run_size(SIZES[size]) for size in sizes},
+    }
+
+
+def _print_results(document: Dict[str, object]):
+    for size, operations in document["results"].items():
+        print(f"\n[{size}] {document['sizes'][size]}")
+        for operation, stats in operations.items():
+            if "median_us" in stats:
+                print(f"  {operation:28s} 中位数 {stats['median_us']:>12.1f}us  "
+                      f"p95 {stats['p95_us']:>12.1f}us  样本 {stats['samples']}")
+            else:
+                print(f"  {operation:28s} {stats['seconds']:.3f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="调度器性能基准测试")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="逗号分隔的规模名：" + ", ".join(SIZES))
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基线文件路径")
+    parser.add_argument("--output", help="另存本次结果的路径")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线中对应的规模")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="允许的中位数增幅比例")
+    args = parser.parse_args(argv)
+
+    sizes = [size for size in args.sizes.split(",") if size]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"未知的规模: {', '.join(unknown)}")
+
+    document = run_benchmarks(sizes)
+    _print_results(document)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+
+    if args.update_baseline:
+        if baseline and baseline.get("schema") == BASELINE_SCHEMA:
+            # 只覆盖本次运行的规模，保留其他规模的基线
+            baseline["sizes"].update(document["sizes"])
+            baseline["results"].update(document["results"])
+            baseline.update({key: document[key] for key in ("generated_at", "python", "platform")})
+            document = baseline
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n基线已写入 {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\n没有基线文件 {args.baseline}，使用 --update-baseline 生成")
+        return 0
+    regressions = compare(document["results"], baseline.get("results", {}), args.tolerance)
+    if regressions:
+        print("\n性能回退:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print("\n未发现性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,8 +14,10 @@ document.addEventListener('DOMContentLoaded', function() {
     // 初始化仓库库存表单
     initWarehouseStockForm();
     
-    // 加载任务列表
-    loadTasks();
+    // 加载任务列表（已连接事件流时由 hello 事件触发）
+    if (!eventSource) {
+        loadTasks();
+    }
 });
 
 /**
@@ -169,7 +171,9 @@ function createShipTask(planId) {
     .then(data => {
         if (data.success) {
             alert('船运任务创建成功');
-            loadTasks();
+            if (!eventStreamActive()) {
+                loadTasks();
+            }
         } else {
             alert('船运任务创建失败: ' + (data.message || '未知错误'));
         }
@@ -237,7 +241,9 @@ function createInternalTransferTask() {
             }
             
             // 刷新任务列表
-            loadTasks();
+            if (!eventStreamActive()) {
+                loadTasks();
+            }
         } else {
             alert('内转任务创建失败: ' + (data.message || '未知错误'));
         }
@@ -279,7 +285,9 @@ function updateWarehouseStock() {
         if (data.success) {
             alert('库存更新成功');
             document.getElementById('warehouse-stock-form').reset();
-            loadSystemResources();
+            if (!eventStreamActive()) {
+                loadSystemResources();
+            }
             
             // 如果当前显示的就是这个仓库的库存，刷新显示
             const inventorySelector = document.getElementById('warehouse-inventory-selector');
@@ -57,8 +57,12 @@ function initLayoutVisualization() {
         .attr('width', layoutWidth)
         .attr('height', layoutHeight);
     
-    // 获取系统资源用于布局绘制
-    loadSystemResources();
+    // 资源已加载（事件流保持最新）时直接绘制，否则先获取系统资源
+    if (Object.keys(systemResources).length > 0) {
+        drawLayout();
+    } else if (!eventSource) {
+        loadSystemResources();
+    }
 }
 
 /**
@@ -549,15 +553,15 @@ function startTaskSimulation(taskId) {
         resetSimulation();
     }
     
-    fetch(`${API_BASE_URL}/api/tasks`)
-        .then(response => response.json())
-        .then(tasks => {
-            if (!tasks || !tasks[taskId]) {
+    fetch(`${API_BASE_URL}/api/tasks/${encodeURIComponent(taskId)}`)
+        .then(response => response.ok ? response.json() : null)
+        .then(task => {
+            if (!task) {
                 alert('找不到指定任务');
                 return;
             }
             
-            simulationTask = tasks[taskId];
+            simulationTask = task;
             
             // 绘制任务流程图
             drawTaskFlow(simulationTask);
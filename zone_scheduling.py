@@ -0,0 +1,601 @@
+"""
+厂区分区调度
+Zone-partitioned Scheduling
+
+把厂区网格划分为若干矩形分区，每个分区由一个工作进程持有独立的 LogisticsSystem
+（本区的仓库、行车和车队），调度计算在各进程中并行进行。ZoneCoordinator 负责：
+1. 按位置把仓库、行车、框架和车头路由到分区，产品下发到所有分区
+2. 按库存和空闲资源把船运计划路由到分区，各分区并行求解指派
+3. 分区车队不足时从空闲较多的分区交接框架和车头
+4. 跨区内转拆成出库段和入库段，在分区边界交接车头和框架
+"""
+
+import itertools
+import multiprocessing
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from factory_logistics_system import (
+    LogisticsSystem, Position, Product, TerminalWarehouse, ProductWarehouse, Crane, Frame, FrameTruck,
+    ShipPlan, ResourceStatus, SLACK_REFERENCE, SLACK_FLOOR, FRAME_COUPLING_TIME
+)
+
+
+@dataclass(frozen=True)
+class Zone:
+    """矩形分区，坐标范围为 [x0, x1) × [y0, y1)"""
+    id: str
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    def contains(self, position: Position) -> bool:
+        return self.x0 <= position.x < self.x1 and self.y0 <= position.y < self.y1
+
+    def clamp(self, position: Position) -> Position:
+        """分区内距离 position 最近的网格点（跨区交接点）"""
+        return Position(min(max(position.x, self.x0), self.x1 - 1),
+                        min(max(position.y, self.y0), self.y1 - 1))
+
+    @property
+    def center(self) -> Position:
+        return Position((self.x0 + self.x1 - 1) // 2, (self.y0 + self.y1 - 1) // 2)
+
+
+def partition_grid(grid_size: Tuple[int, int], columns: int, rows: int = 1) -> List[Zone]:
+    """把网格均匀划分为 columns × rows 个分区"""
+    width, height = grid_size
+    columns, rows = max(1, min(columns, width)), max(1, min(rows, height))
+    xs = [width * i // columns for i in range(columns + 1)]
+    ys = [height * j // rows for j in range(rows + 1)]
+    return [Zone(f"Z{j}-{i}", xs[i], ys[j], xs[i + 1], ys[j + 1])
+            for j in range(rows) for i in range(columns)]
+
+
+# ---------------------------------------------------------------------------
+# 工作进程端：命令表中的函数在分区自己的 LogisticsSystem 上执行
+
+def _add_entities(system: LogisticsSystem, method: str, entities: list) -> int:
+    if method not in LogisticsSystem._ADDED_COLLECTIONS:
+        raise ValueError(f"不支持的添加操作: {method}")
+    add = getattr(system, method)
+    for entity in entities:
+        add(entity)
+    return len(entities)
+
+
+def _update_inventory(system: LogisticsSystem, warehouse_id: str, product_id: str, quantity: int) -> bool:
+    warehouse = system.terminal_warehouses.get(warehouse_id) or system.product_warehouses.get(warehouse_id)
+    if warehouse is None:
+        return False
+    if quantity >= 0:
+        return warehouse.add_product(product_id, quantity)
+    return warehouse.remove_product(product_id, -quantity)
+
+
+def _zone_summary(system: LogisticsSystem) -> Dict[str, Any]:
+    """路由和车队平衡所需的分区摘要：可用于装货的末端库库存、成品库数量和各类空闲资源数量"""
+    idle_terminal = {system.cranes[crane_id].warehouse_id
+                     for crane_id in system.idle_resources["terminal_cranes"]}
+    return {
+        "terminal_stock": {warehouse_id: dict(system.terminal_warehouses[warehouse_id].products)
+                           for warehouse_id in idle_terminal},
+        "product_warehouses": len(system.product_warehouses),
+        "idle": {category: len(resources) for category, resources in system.idle_resources.items()},
+        "clock": system.clock.now
+    }
+
+
+def _schedule_plans(system: LogisticsSystem, plans: List[ShipPlan]) -> Dict[str, str]:
+    """添加并批量调度船运计划，返回 计划ID -> 任务ID"""
+    for plan in plans:
+        system.add_ship_plan(plan)
+    return {task.details["plan_id"]: task.id
+            for task in system.schedule_ship_plans([plan.id for plan in plans])}
+
+
+def _internal_transfer(system: LogisticsSystem, source_warehouse_id: str, target_warehouse_id: str,
+                       products: Dict[str, int]) -> Optional[str]:
+    task = system.create_internal_transfer_task(source_warehouse_id, target_warehouse_id, products)
+    return task.id if task else None
+
+
+def _outbound(system: LogisticsSystem, source_warehouse_id: str, target_warehouse_id: str,
+              handoff: Position, products: Dict[str, int], task_id: str) -> Optional[Tuple[str, str, str]]:
+    """创建出库段，返回 (任务ID, 车头ID, 框架ID)"""
+    task = system.create_outbound_transfer_task(source_warehouse_id, target_warehouse_id, handoff, products,
+                                                task_id)
+    if task is None:
+        return None
+    carrier = task.sub_tasks[0].assigned_resources
+    return task.id, carrier["frame_truck"], carrier["frame"]
+
+
+def _inbound(system: LogisticsSystem, legs: List[tuple]) -> List[Optional[str]]:
+    """为交接来的车头批量创建入库段，legs 为 (源仓库, 目标仓库, 交接点, 产品, 车头ID, 任务ID)"""
+    tasks = [system.create_inbound_transfer_task(*leg) for leg in legs]
+    return [task.id if task else None for task in tasks]
+
+
+def _release_idle(system: LogisticsSystem, collection: str, count: int,
+                  target: Zone) -> Tuple[list, datetime]:
+    """交出离目标分区中心最近的 count 个空闲框架或车头，并把它们开到目标分区边界上的最近网格点
+
+    返回 (资源, 全部到达的仿真时间)：车头按自身速度行驶，框架由车头拉过去，另加挂接时间。
+    """
+    released = []
+    ready_at = system.clock.now
+    for resource_id in system.find_nearest_idle(collection, target.center, count * 2):
+        resource = system.release_resource(collection, resource_id)
+        if resource is None:
+            continue
+        arrival = target.clamp(resource.position)
+        seconds = system._travel_time(system.travel_distance(resource.position, arrival),
+                                      resource if isinstance(resource, FrameTruck) else None)
+        if isinstance(resource, Frame):
+            seconds += FRAME_COUPLING_TIME
+        resource.position = arrival
+        ready_at = max(ready_at, system.clock.now + timedelta(seconds=seconds))
+        released.append(resource)
+        if len(released) >= count:
+            break
+    return released, ready_at
+
+
+def _release(system: LogisticsSystem, resources: List[Tuple[str, str]]) -> list:
+    """交出指定的 (集合, ID) 资源，未能交出的位置为 None"""
+    return [system.release_resource(collection, resource_id) for collection, resource_id in resources]
+
+
+def _accept(system: LogisticsSystem, resources: list, ready_at: Optional[datetime] = None) -> int:
+    """接收交接来的框架和车头；ready_at 为资源到达本区的仿真时间，本区时钟先推进到该时间"""
+    if ready_at is not None and ready_at > system.clock.now:
+        system.run_simulation(until=ready_at)
+        system.clock.now = max(system.clock.now, ready_at)
+    for resource in resources:
+        resource.status = ResourceStatus.IDLE
+        if isinstance(resource, Frame):
+            system.add_frame(resource)
+        else:
+            system.add_frame_truck(resource)
+    return len(resources)
+
+
+def _task_result(system: LogisticsSystem, task_id: str) -> Optional[Dict[str, Any]]:
+    return system.get_task_dict(task_id)
+
+
+ZONE_COMMANDS: Dict[str, Callable[..., Any]] = {
+    "add": _add_entities,
+    "update_inventory": _update_inventory,
+    "summary": _zone_summary,
+    "schedule": _schedule_plans,
+    "internal_transfer": _internal_transfer,
+    "outbound": _outbound,
+    "inbound": _inbound,
+    "release_idle": _release_idle,
+    "release": _release,
+    "accept": _accept,
+    "execute_tasks": lambda system, task_ids: system.execute_tasks(task_ids),
+    "task": _task_result,
+    "status": lambda system: system.get_system_status(),
+}
+
+
+class LocalZoneWorker:
+    """在当前进程中运行的分区（调试和单核环境使用），接口与 ZoneProcess 相同"""
+
+    def __init__(self, zone: Zone, grid_size: Tuple[int, int], echo: bool = False):
+        self.zone = zone
+        self.system = LogisticsSystem(grid_size)
+        self.system.event_log.echo = echo
+        self._result: Tuple[bool, Any] = (True, None)
+
+    def send(self, op: str, *args):
+        try:
+            self._result = (True, ZONE_COMMANDS[op](self.system, *args))
+        except Exception as e:
+            self._result = (False, f"{type(e).__name__}: {e}")
+
+    def recv(self) -> Tuple[bool, Any]:
+        return self._result
+
+    def close(self):
+        self.system.event_log.close()
+
+
+def _zone_worker_main(connection, zone: Zone, grid_size: Tuple[int, int], echo: bool):
+    """工作进程主循环：逐条执行协调器发来的命令并回送 (是否成功, 结果或错误信息)"""
+    worker = LocalZoneWorker(zone, grid_size, echo)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        worker.send(*message)
+        connection.send(worker.recv())
+    worker.close()
+    connection.close()
+
+
+class ZoneProcess:
+    """运行在独立工作进程中的分区，命令通过管道收发"""
+
+    def __init__(self, zone: Zone, grid_size: Tuple[int, int], echo: bool = False):
+        self.zone = zone
+        self._connection, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_zone_worker_main, args=(child, zone, grid_size, echo),
+                                                name=f"zone-{zone.id}", daemon=True)
+        self._process.start()
+        child.close()
+
+    def send(self, op: str, *args):
+        self._connection.send((op,) + args)
+
+    def recv(self) -> Tuple[bool, Any]:
+        return self._connection.recv()
+
+    def close(self):
+        try:
+            self._connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+
+
+# ---------------------------------------------------------------------------
+# 协调器端
+
+@dataclass
+class ZoneTransfer:
+    """跨区内转：源分区执行出库段，车头和框架在交接点交给目标分区后执行入库段"""
+    id: str
+    source_zone: str
+    target_zone: str
+    source_warehouse_id: str
+    target_warehouse_id: str
+    handoff: Position
+    products: Dict[str, int]
+    outbound_task_id: str
+    frame_truck_id: str
+    frame_id: str
+    inbound_task_id: Optional[str] = None
+    status: ResourceStatus = ResourceStatus.IDLE
+
+
+class ZoneCoordinator:
+    """分区调度协调器
+
+    每个分区的 LogisticsSystem 只由该分区的工作进程修改，协调器只保存路由所需的
+    实体归属（实体ID -> 分区ID）和仓库位置。发给多个分区的命令先全部发出再统一
+    收取结果，各分区的调度计算因此在多个进程中同时进行。
+    """
+
+    def __init__(self, grid_size: Tuple[int, int], columns: int = 2, rows: int = 1,
+                 zones: Optional[List[Zone]] = None, processes: bool = True, echo: bool = False):
+        self.grid_size = grid_size
+        self.zones = zones or partition_grid(grid_size, columns, rows)
+        worker_class = ZoneProcess if processes else LocalZoneWorker
+        self.workers = {zone.id: worker_class(zone, grid_size, echo) for zone in self.zones}
+        self.entity_zones: Dict[str, Dict[str, str]] = {}  # 实体集合 -> {实体ID: 分区ID}
+        self.warehouse_positions: Dict[str, Position] = {}
+        self.ship_plans: Dict[str, ShipPlan] = {}  # 尚未分配到分区的船运计划
+        self.plan_zones: Dict[str, str] = {}  # 船运计划ID -> 分区ID
+        self.task_zones: Dict[str, str] = {}  # 任务ID -> 分区ID
+        self.transfers: Dict[str, ZoneTransfer] = {}
+        self._transfer_seq = itertools.count(1)
+
+    def __enter__(self) -> 'ZoneCoordinator':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.close()
+
+    def zone_of(self, position: Position) -> Zone:
+        """位置所属分区，网格外的位置归入最近的分区"""
+        for zone in self.zones:
+            if zone.contains(position):
+                return zone
+        return min(self.zones, key=lambda zone: zone.clamp(position).distance_to(position))
+
+    def _call_all(self, calls: Dict[str, tuple]) -> Dict[str, Any]:
+        """向多个分区发出命令 {分区ID: (操作, 参数...)}，全部发出后再收取结果"""
+        for zone_id, (op, *args) in calls.items():
+            self.workers[zone_id].send(op, *args)
+        results = {}
+        for zone_id, (op, *_) in calls.items():
+            success, result = self.workers[zone_id].recv()
+            if not success:
+                raise RuntimeError(f"分区 {zone_id} 执行 {op} 失败: {result}")
+            results[zone_id] = result
+        return results
+
+    def _call(self, zone_id: str, op: str, *args) -> Any:
+        return self._call_all({zone_id: (op,) + args})[zone_id]
+
+    # 实体路由
+
+    def _add(self, zone_id: str, method: str, entity: Any):
+        self._call(zone_id, "add", method, [entity])
+        collection = LogisticsSystem._ADDED_COLLECTIONS[method]
+        self.entity_zones.setdefault(collection, {})[entity.id] = zone_id
+
+    def add_product(self, product: Product):
+        """产品信息下发到所有分区"""
+        self._call_all({zone.id: ("add", "add_product", [product]) for zone in self.zones})
+
+    def add_terminal_warehouse(self, warehouse: TerminalWarehouse):
+        self.warehouse_positions[warehouse.id] = warehouse.position
+        self._add(self.zone_of(warehouse.position).id, "add_terminal_warehouse", warehouse)
+
+    def add_product_warehouse(self, warehouse: ProductWarehouse):
+        self.warehouse_positions[warehouse.id] = warehouse.position
+        self._add(self.zone_of(warehouse.position).id, "add_product_warehouse", warehouse)
+
+    def add_crane(self, crane: Crane):
+        """行车归属其仓库所在的分区"""
+        zone_id = self.warehouse_zone(crane.warehouse_id) or self.zone_of(crane.position).id
+        self._add(zone_id, "add_crane", crane)
+
+    def add_frame(self, frame: Frame):
+        self._add(self.zone_of(frame.position).id, "add_frame", frame)
+
+    def add_frame_truck(self, truck: FrameTruck):
+        self._add(self.zone_of(truck.position).id, "add_frame_truck", truck)
+
+    def add_ship_plan(self, plan: ShipPlan):
+        """船运计划在调度时才按库存和空闲资源分配到分区"""
+        self.ship_plans[plan.id] = plan
+
+    def warehouse_zone(self, warehouse_id: str) -> Optional[str]:
+        return (self.entity_zones.get("terminal_warehouses", {}).get(warehouse_id)
+                or self.entity_zones.get("product_warehouses", {}).get(warehouse_id))
+
+    def update_inventory(self, warehouse_id: str, product_id: str, quantity: int) -> bool:
+        """调整仓库库存，quantity 为负时出库"""
+        zone_id = self.warehouse_zone(warehouse_id)
+        return zone_id is not None and self._call(zone_id, "update_inventory", warehouse_id, product_id, quantity)
+
+    # 船运计划
+
+    def _route_plans(self, plans: List[ShipPlan], summaries: Dict[str, Dict[str, Any]]) -> Dict[str, List[ShipPlan]]:
+        """把计划分配给有空闲末端库行车且库存能独立满足计划的分区，优先剩余行车最多的分区
+
+        船运任务在分区内完成装货、运输和卸货，没有成品库的分区不接收计划，
+        库存只在这类分区的计划不分配。
+        """
+        stock = {zone_id: dict(summary["terminal_stock"]) for zone_id, summary in summaries.items()
+                 if summary["product_warehouses"]}
+        routed: Dict[str, List[ShipPlan]] = {}
+        now = max(summary["clock"] for summary in summaries.values())
+        # 紧急的计划先选分区（紧急度与 LogisticsSystem._plan_urgency 一致）
+        plans = sorted(plans, key=lambda plan: -(1 + SLACK_REFERENCE / max((plan.deadline - now).total_seconds(),
+                                                                           SLACK_FLOOR)) / max(plan.priority, 1))
+        for plan in plans:
+            candidates = [(len(warehouses), zone_id, warehouse_id)
+                          for zone_id, warehouses in stock.items()
+                          for warehouse_id, products in warehouses.items()
+                          if all(products.get(product_id, 0) >= quantity
+                                 for product_id, quantity in plan.products.items())]
+            if not candidates:
+                continue
+            _, zone_id, warehouse_id = max(candidates)
+            # 每台空闲末端库行车一批只服务一个计划
+            del stock[zone_id][warehouse_id]
+            routed.setdefault(zone_id, []).append(plan)
+        return routed
+
+    def _balance_fleet(self, demand: Dict[str, int], summaries: Dict[str, Dict[str, Any]]) -> int:
+        """从空闲框架和车头有富余的分区向不足的分区交接，返回交接的资源数"""
+        moved = 0
+        zones = {zone.id: zone for zone in self.zones}
+        for collection in ("frames", "frame_trucks"):
+            spare = {zone_id: summary["idle"][collection] - demand.get(zone_id, 0)
+                     for zone_id, summary in summaries.items()}
+            for zone_id in [zone_id for zone_id, count in spare.items() if count < 0]:
+                target = zones[zone_id]
+                donors = sorted((zone_id for zone_id, count in spare.items() if count > 0),
+                                key=lambda donor: zones[donor].center.distance_to(target.center))
+                for donor in donors:
+                    if spare[zone_id] >= 0:
+                        break
+                    count = min(spare[donor], -spare[zone_id])
+                    resources, ready_at = self._call(donor, "release_idle", collection, count, target)
+                    self._call(zone_id, "accept", resources, ready_at)
+                    for resource in resources:
+                        self.entity_zones[collection][resource.id] = zone_id
+                    spare[donor] -= len(resources)
+                    spare[zone_id] += len(resources)
+                    moved += len(resources)
+        return moved
+
+    def schedule_ship_plans(self, plan_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        """把待处理的船运计划分配到分区并在各分区并行调度，返回 计划ID -> 任务ID
+
+        分配不到分区（包括库存只在没有成品库的分区）或分区内资源不足的计划留待下次调度。
+        """
+        if plan_ids is None:
+            plan_ids = list(self.ship_plans)
+        plans = [self.ship_plans[plan_id] for plan_id in plan_ids if plan_id in self.ship_plans]
+        if not plans:
+            return {}
+        summaries = self._call_all({zone.id: ("summary",) for zone in self.zones})
+        routed = self._route_plans(plans, summaries)
+        self._balance_fleet({zone_id: len(zone_plans) for zone_id, zone_plans in routed.items()}, summaries)
+
+        scheduled: Dict[str, str] = {}
+        for zone_id, tasks in self._call_all({zone_id: ("schedule", zone_plans)
+                                              for zone_id, zone_plans in routed.items()}).items():
+            for plan_id, task_id in tasks.items():
+                self.ship_plans.pop(plan_id, None)
+                self.plan_zones[plan_id] = zone_id
+                self.task_zones[task_id] = zone_id
+            scheduled.update(tasks)
+        return scheduled
+
+    # 内转
+
+    def create_internal_transfer_task(self, source_warehouse_id: str, target_warehouse_id: str,
+                                      products: Dict[str, int]) -> Optional[str]:
+        """创建内转任务，返回任务ID；跨区内转返回 ZoneTransfer 的ID"""
+        source_zone = self.entity_zones.get("terminal_warehouses", {}).get(source_warehouse_id)
+        target_zone = self.entity_zones.get("product_warehouses", {}).get(target_warehouse_id)
+        if source_zone is None or target_zone is None:
+            return None
+        if source_zone == target_zone:
+            task_id = self._call(source_zone, "internal_transfer", source_warehouse_id, target_warehouse_id, products)
+            if task_id:
+                self.task_zones[task_id] = source_zone
+            return task_id
+
+        target = next(zone for zone in self.zones if zone.id == target_zone)
+        handoff = target.clamp(self.warehouse_positions[source_warehouse_id])
+        # 同一对仓库可以多次跨区内转，ID 带协调器内的序号；出库段和入库段沿用该ID
+        transfer_id = f"transfer_{next(self._transfer_seq)}_{source_warehouse_id}_{target_warehouse_id}"
+        outbound = self._call(source_zone, "outbound", source_warehouse_id, target_warehouse_id, handoff, products,
+                              f"{transfer_id}_outbound")
+        if outbound is None:
+            return None
+        task_id, truck_id, frame_id = outbound
+        transfer = ZoneTransfer(transfer_id, source_zone, target_zone,
+                                source_warehouse_id, target_warehouse_id, handoff, products,
+                                task_id, truck_id, frame_id)
+        self.transfers[transfer.id] = transfer
+        self.task_zones[task_id] = source_zone
+        return transfer.id
+
+    # 执行
+
+    def _execute_grouped(self, task_ids: List[str]) -> Dict[str, bool]:
+        by_zone: Dict[str, List[str]] = {}
+        for task_id in task_ids:
+            by_zone.setdefault(self.task_zones[task_id], []).append(task_id)
+        results: Dict[str, bool] = {}
+        for zone_results in self._call_all({zone_id: ("execute_tasks", ids)
+                                            for zone_id, ids in by_zone.items()}).values():
+            results.update(zone_results)
+        return results
+
+    def _hand_over(self, transfers: List[ZoneTransfer]) -> List[ZoneTransfer]:
+        """把出库段完成后的车头和框架从源分区交给目标分区，返回交接成功的跨区内转"""
+        handed = []
+        for transfer in transfers:
+            outbound = self._call(transfer.source_zone, "task", transfer.outbound_task_id)
+            resources = self._call(transfer.source_zone, "release",
+                                   [("frame_trucks", transfer.frame_truck_id), ("frames", transfer.frame_id)])
+            if None in resources:
+                # 未能交出：把已交出的部分退回源分区
+                self._call(transfer.source_zone, "accept", [r for r in resources if r is not None])
+                transfer.status = ResourceStatus.UNAVAILABLE
+                continue
+            ready_at = datetime.fromisoformat(outbound["end_time"]) if outbound and outbound["end_time"] else None
+            self._call(transfer.target_zone, "accept", resources, ready_at)
+            self.entity_zones.setdefault("frame_trucks", {})[transfer.frame_truck_id] = transfer.target_zone
+            self.entity_zones.setdefault("frames", {})[transfer.frame_id] = transfer.target_zone
+            handed.append(transfer)
+        return handed
+
+    def execute_tasks(self, task_ids: List[str]) -> Dict[str, bool]:
+        """执行任务和跨区内转：各分区并行执行本区任务和出库段，交接后再并行执行入库段"""
+        transfers = [self.transfers[task_id] for task_id in task_ids if task_id in self.transfers]
+        plain = [task_id for task_id in task_ids if task_id not in self.transfers and task_id in self.task_zones]
+        results = {task_id: False for task_id in task_ids}
+
+        for transfer in transfers:
+            transfer.status = ResourceStatus.BUSY
+        executed = self._execute_grouped(plain + [transfer.outbound_task_id for transfer in transfers])
+        results.update((task_id, executed.get(task_id, False)) for task_id in plain)
+
+        for transfer in transfers:
+            if not executed.get(transfer.outbound_task_id):
+                transfer.status = ResourceStatus.UNAVAILABLE
+        handed = self._hand_over([transfer for transfer in transfers if transfer.status == ResourceStatus.BUSY])
+
+        by_zone: Dict[str, List[ZoneTransfer]] = {}
+        for transfer in handed:
+            by_zone.setdefault(transfer.target_zone, []).append(transfer)
+        inbound = self._call_all({zone_id: ("inbound", [(t.source_warehouse_id, t.target_warehouse_id, t.handoff,
+                                                         t.products, t.frame_truck_id, f"{t.id}_inbound")
+                                                        for t in zone_transfers])
+                                  for zone_id, zone_transfers in by_zone.items()})
+        for zone_id, task_ids_created in inbound.items():
+            for transfer, task_id in zip(by_zone[zone_id], task_ids_created):
+                transfer.inbound_task_id = task_id
+                if task_id is None:
+                    transfer.status = ResourceStatus.UNAVAILABLE
+                else:
+                    self.task_zones[task_id] = zone_id
+
+        ready = [transfer for transfer in handed if transfer.inbound_task_id]
+        executed = self._execute_grouped([transfer.inbound_task_id for transfer in ready])
+        for transfer in ready:
+            transfer.status = ResourceStatus.IDLE if executed.get(transfer.inbound_task_id) else ResourceStatus.UNAVAILABLE
+        for transfer in transfers:
+            results[transfer.id] = transfer.status == ResourceStatus.IDLE
+        return results
+
+    def execute_task(self, task_id: str) -> bool:
+        return self.execute_tasks([task_id])[task_id]
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        zone_id = self.task_zones.get(task_id)
+        return self._call(zone_id, "task", task_id) if zone_id else None
+
+    def get_system_status(self) -> Dict[str, Any]:
+        """合并各分区的系统状态，zones 中保留每个分区的版本号"""
+        statuses = self._call_all({zone.id: ("status",) for zone in self.zones})
+        merged: Dict[str, Any] = {
+            "zones": {zone_id: {"version": status["version"]} for zone_id, status in statuses.items()},
+            "warehouses": {"terminal": {}, "product": {}},
+            "resources": {},
+            "active_tasks": {},
+            "completed_task_count": 0,
+            "recent_logs": []
+        }
+        for status in statuses.values():
+            for kind, warehouses in status["warehouses"].items():
+                merged["warehouses"][kind].update(warehouses)
+            for category, resources in status["resources"].items():
+                merged["resources"].setdefault(category, {}).update(resources)
+            merged["active_tasks"].update(status["active_tasks"])
+            merged["completed_task_count"] += status["completed_task_count"]
+            merged["recent_logs"].extend(status["recent_logs"])
+        merged["recent_logs"] = sorted(merged["recent_logs"], key=lambda record: record["timestamp"])[-10:]
+        return merged
+
+
+if __name__ == "__main__":
+    from datetime import timedelta
+
+    with ZoneCoordinator((20, 10), columns=2) as coordinator:
+        coordinator.add_product(Product("P001", "钢材", 10.0, 5.0))
+        west = TerminalWarehouse("TW001", "末端库1", Position(1, 1), 1000.0)
+        west.add_product("P001", 100)
+        coordinator.add_terminal_warehouse(west)
+        coordinator.add_product_warehouse(ProductWarehouse("PW001", "成品库1", Position(18, 8), 2000.0))
+        coordinator.add_crane(Crane("C001", "末端库行车1", Position(1, 1), warehouse_id="TW001"))
+        coordinator.add_crane(Crane("C002", "成品库行车1", Position(18, 8), warehouse_id="PW001"))
+        coordinator.add_product_warehouse(ProductWarehouse("PW002", "成品库2", Position(8, 8), 2000.0))
+        coordinator.add_crane(Crane("C003", "成品库行车2", Position(8, 8), warehouse_id="PW002"))
+        coordinator.add_frame(Frame("F001", "框架1", Position(15, 5)))
+        coordinator.add_frame_truck(FrameTruck("T001", "车头1", Position(15, 4)))
+        coordinator.add_ship_plan(ShipPlan("SP001", {"P001": 10}, datetime.now() + timedelta(hours=2)))
+
+        # 框架和车头在东区，西区的船运计划需要先交接车队
+        tasks = coordinator.schedule_ship_plans()
+        print("船运任务:", tasks)
+        print("执行结果:", coordinator.execute_tasks(list(tasks.values())))
+        transfer_id = coordinator.create_internal_transfer_task("TW001", "PW001", {"P001": 5})
+        print("跨区内转:", transfer_id, coordinator.execute_task(transfer_id))
+        print("资源分布:", coordinator.entity_zones["frames"], coordinator.entity_zones["frame_trucks"])